@@ -1,28 +1,76 @@
+import io
+import struct
+import datetime
 import os
+import re
+import select
+import uuid
+import hashlib
 import json
+import math
+import time
+import asyncio
+import bisect
 import logging
-from contextlib import asynccontextmanager
-from typing import List, Optional
-from fastapi import FastAPI, HTTPException
+import threading
+import functools
+import unicodedata
+import itertools
+import contextvars
+from collections import Counter, OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, contextmanager
+from decimal import Decimal
+from typing import Dict, List, Optional
+from fastapi import FastAPI, HTTPException, Request, Response
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field
 from transformers import AutoTokenizer, AutoModel
 from sentence_transformers import SentenceTransformer
 from llama_cpp import Llama
+from llama_cpp.llama_speculative import LlamaPromptLookupDecoding
 import torch
 import psycopg2
+import psycopg2.pool
+from psycopg2 import sql as psql
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, AsIs, register_adapter
 from psycopg2.extras import RealDictCursor
 import boto3
 import numpy as np
+import orjson
+import snowballstemmer
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+GEN_MODEL_REPO = os.getenv("GEN_MODEL_REPO", "bartowski/Phi-3.5-mini-instruct-GGUF")
+GEN_MODEL_FILE = os.getenv("GEN_MODEL_FILE", "Phi-3.5-mini-instruct-Q4_K_M.gguf")
+EMBED_MODEL_ID = os.getenv("EMBED_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2")
+LEGAL_EMBED_MODEL_ID = os.getenv("LEGAL_EMBED_MODEL_ID", "freelawproject/modernbert-embed-base_finetune_512")
+BATCH_QUERY_MAX = int(os.getenv("BATCH_QUERY_MAX", "64"))  # queries per /embed/batch and /.../search/batch call
+
 # Global variables
-llm = None          # Phi-3.5 Mini GGUF for text generation
+llm = None          # Phi-3.5 Mini GGUF for text generation (first instance of llm_pool)
+llm_pool = None     # pool of Phi-3.5 instances with the generation scheduler
 embedder = None     # all-MiniLM-L6-v2 for product embeddings (384-dim)
 tokenizer = None    # tokenizer for product embedder
-legal_embedder = None  # ModernBERT legal embedder (768-dim)
+product_onnx_embedder = None  # ONNX SentenceTransformer replacing embedder when EMBED_BACKEND selects it
+legal_embedder = None  # ModernBERT legal embedder (768-dim, torch or ONNX SentenceTransformer)
+product_backend = None  # EmbeddingBackend state for the product embedder
+legal_backend = None    # EmbeddingBackend state for the legal embedder
+db_pool = None      # shared PostgreSQL connection pool (created in lifespan)
+embedder_executor = None        # bounded worker queue for the product embedder
+legal_embedder_executor = None  # bounded worker queue for the legal embedder
+embedding_batcher = None        # micro-batcher for product query embeddings
+legal_embedding_batcher = None  # micro-batcher for legal query embeddings
+search_router = None            # filter-aware routing and partial HNSW index manager
+memory_index = None             # in-memory exact vector index for small tables, and BM25 keyword index
+query_embedding_cache = None    # LRU cache of query embeddings, keyed on (model id, text)
+rag_answer_cache = None         # semantic answer cache for /rag
+legal_answer_cache = None       # semantic answer cache for /legal/rag
 
 
 # ============================================================
@@ -33,18 +81,38 @@ class GenerateRequest(BaseModel):
     prompt: str = Field(..., min_length=1, description="Input text prompt for generation")
     max_new_tokens: int = Field(default=100, ge=1, le=500, description="Maximum tokens to generate")
     temperature: float = Field(default=0.7, ge=0.1, le=2.0, description="Sampling temperature (lower = more focused)")
+    stream: bool = Field(default=False, description="Stream tokens as server-sent events as they are generated")
 
     model_config = {"json_schema_extra": {"examples": [{"prompt": "What is employment law?", "max_new_tokens": 100, "temperature": 0.7}]}}
 
+class GenerationStats(BaseModel):
+    prompt_tokens: int = Field(description="Prompt tokens after chat formatting")
+    prompt_tokens_reused: int = Field(description="Prompt tokens served from the cached KV state (no prefill)")
+    prompt_tokens_fresh: int = Field(description="Prompt tokens prefilled for this request")
+    completion_tokens: int = Field(default=0, description="Tokens generated")
+    prefill_ms: float = Field(default=0.0, description="Time to the first generated token (prefill + first sample)")
+    decode_ms: float = Field(default=0.0, description="Time spent generating the remaining tokens")
+    tokens_per_second: Optional[float] = Field(default=None, description="Decode speed after the first token")
+    speculative: bool = Field(default=False, description="Whether prompt-lookup speculative decoding was used")
+    draft_tokens: int = Field(default=0, description="Tokens drafted by prompt lookup")
+    draft_tokens_accepted: int = Field(default=0, description="Drafted tokens accepted by the model (estimated)")
+    draft_acceptance_rate: Optional[float] = Field(default=None, description="draft_tokens_accepted / draft_tokens")
+
 class GenerateResponse(BaseModel):
     generated_text: str = Field(description="Generated text from Phi-3.5 Mini")
     model: str = Field(description="Model identifier used for generation")
+    generation: Optional[GenerationStats] = Field(default=None, description="Token counts and timings for this generation")
 
 class EmbedRequest(BaseModel):
     text: str = Field(..., min_length=1, description="Text to generate an embedding for")
 
     model_config = {"json_schema_extra": {"examples": [{"text": "Wireless bluetooth headphones with noise cancellation"}]}}
 
+class EmbedBatchRequest(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=BATCH_QUERY_MAX, description="Texts to embed, in one forward pass")
+
+    model_config = {"json_schema_extra": {"examples": [{"texts": ["Wireless bluetooth headphones", "Ergonomic office chair"]}]}}
+
 class DocumentRequest(BaseModel):
     content: str = Field(..., min_length=1, description="Document text to store and embed")
     metadata: dict = Field(default={}, description="Optional key-value metadata")
@@ -67,16 +135,35 @@ class RAGRequest(BaseModel):
     query: str = Field(..., min_length=1, description="Natural language question to answer")
     top_k: int = Field(default=3, ge=1, le=10, description="Number of source documents to retrieve")
     max_new_tokens: int = Field(default=200, ge=1, le=500, description="Maximum tokens to generate in the answer")
+    stream: bool = Field(default=False, description="Stream sources, then answer tokens, as server-sent events")
+    fields: Optional[List[str]] = Field(default=None, min_length=1, description="Source fields to return (see IngestedSearchResult); default all. raw_data is only fetched if requested")
 
     model_config = {"json_schema_extra": {"examples": [{"query": "What products are good for working from home?", "top_k": 3, "max_new_tokens": 200}]}}
 
-class IngestedSearchRequest(BaseModel):
-    query: str = Field(..., min_length=1, description="Natural language search query")
+class IngestedSearchOptions(BaseModel):
     top_k: int = Field(default=10, ge=1, le=50, description="Number of results to return")
     category: Optional[str] = Field(default=None, description="Filter by product category")
-    search_field: str = Field(default="content", description="Embedding field to search: 'content' or 'title'")
+    search_field: str = Field(default="content", description="Embedding field to search: 'content', 'title', or 'multi' (fuse both)")
+    field_weights: Optional[Dict[str, float]] = Field(default=None, description="multi: weight per field ('content', 'title'); fields left out or weighted 0 are not searched. Default: equal weights")
+    fusion: str = Field(default="rrf", description="multi: 'rrf' (weighted Reciprocal Rank Fusion) or 'score' (weighted cosine similarity)")
+    candidates: int = Field(default=40, ge=1, le=1000, description="multi: nearest neighbours fetched per field before fusion")
+    fields: Optional[List[str]] = Field(default=None, min_length=1, description="Result fields to return (see IngestedSearchResult); default all. Unrequested columns are not fetched")
+
+class IngestedSearchRequest(IngestedSearchOptions):
+    query: str = Field(..., min_length=1, description="Natural language search query")
+
+    model_config = {"json_schema_extra": {"examples": [
+        {"query": "comfortable running shoes", "top_k": 5, "search_field": "content"},
+        {"query": "comfortable running shoes", "top_k": 5, "search_field": "multi", "field_weights": {"content": 1.0, "title": 0.5}},
+        {"query": "comfortable running shoes", "top_k": 50, "fields": ["id", "title", "similarity"]},
+    ]}}
 
-    model_config = {"json_schema_extra": {"examples": [{"query": "comfortable running shoes", "top_k": 5, "search_field": "content"}]}}
+class IngestedBatchSearchRequest(IngestedSearchOptions):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_QUERY_MAX, description="Search queries; each gets its own top_k results, in the same order")
+
+    model_config = {"json_schema_extra": {"examples": [
+        {"queries": ["comfortable running shoes", "noise cancelling headphones"], "top_k": 5},
+    ]}}
 
 class IngestedSearchResult(BaseModel):
     id: int = Field(description="Record ID")
@@ -85,11 +172,26 @@ class IngestedSearchResult(BaseModel):
     category: Optional[str] = Field(description="Product category")
     tags: Optional[list] = Field(description="Product tags")
     raw_data: dict = Field(description="Full product record data")
-    similarity: float = Field(description="Cosine similarity score (0-1)")
+    similarity: float = Field(description="Cosine similarity score (0-1); the fused score for multi search")
+    field_scores: Optional[Dict[str, float]] = Field(default=None, description="multi: cosine similarity of each searched field")
+
+class ContextSourceStats(BaseModel):
+    index: int = Field(description="Source number as cited in the prompt ([1], [2], ...)")
+    tokens: int = Field(description="Prompt tokens used by this source, header included")
+    included: bool = Field(description="False if the budget ran out before this source")
+    truncated: bool = Field(description="True if the source was cut at a sentence boundary to fit")
+
+class ContextStats(BaseModel):
+    budget: int = Field(description="Context token budget (RAG_CONTEXT_TOKENS)")
+    tokens: int = Field(description="Tokens used by the packed context")
+    sources: List[ContextSourceStats] = Field(description="Token usage per retrieved source, in rank order")
 
 class RAGResponse(BaseModel):
     answer: str = Field(description="Generated answer from Phi-3.5 Mini based on retrieved sources")
     sources: List[IngestedSearchResult] = Field(description="Source product records used to generate the answer")
+    generation: Optional[GenerationStats] = Field(default=None, description="Token counts and timings for this generation")
+    context: Optional[ContextStats] = Field(default=None, description="How the sources were packed into the prompt")
+    cached: bool = Field(default=False, description="True if served from the semantic answer cache (no retrieval or generation)")
 
 
 # ============================================================
@@ -109,19 +211,34 @@ class LegalDocument(BaseModel):
     practice_area: Optional[str] = Field(default=None, description="Practice area: employment, constitutional_law, criminal")
     status: str = Field(default="good_law", description="Shepard's-style status: good_law, questioned, overruled")
 
-class LegalSearchRequest(BaseModel):
-    query: str = Field(..., min_length=1, description="Natural language legal research query")
+class LegalSearchOptions(BaseModel):
     top_k: int = Field(default=10, ge=1, le=100, description="Maximum number of results to return")
-    search_field: str = Field(default="content", description="Search mode: 'content', 'title', 'headnotes', or 'hybrid' (RRF)")
+    search_field: str = Field(default="content", description="Search mode: 'content', 'title', 'headnotes', 'hybrid' (RRF), or 'multi' (fuse all embedding fields)")
     jurisdiction: Optional[str] = Field(default=None, description="Filter by jurisdiction (e.g., 'CA', 'NY', 'US_Supreme_Court', 'Federal_9th_Circuit')")
     doc_type: Optional[str] = Field(default=None, description="Filter by type: 'case_law', 'statute', 'regulation', 'practice_guide'")
     practice_area: Optional[str] = Field(default=None, description="Filter by area: 'employment', 'constitutional_law', 'criminal'")
     status_filter: Optional[str] = Field(default=None, description="Set to 'exclude_overruled' to filter out overruled cases (Shepard's-style)")
     date_from: Optional[str] = Field(default=None, description="Filter: earliest date (YYYY-MM-DD)")
     date_to: Optional[str] = Field(default=None, description="Filter: latest date (YYYY-MM-DD)")
+    field_weights: Optional[Dict[str, float]] = Field(default=None, description="multi: weight per field ('content', 'title', 'headnotes'); fields left out or weighted 0 are not searched. Default: equal weights")
+    fusion: str = Field(default="rrf", description="multi: 'rrf' (weighted Reciprocal Rank Fusion) or 'score' (weighted cosine similarity)")
+    candidates: int = Field(default=40, ge=1, le=1000, description="multi: nearest neighbours fetched per field before fusion")
+    fields: Optional[List[str]] = Field(default=None, min_length=1, description="Result fields to return (see LegalSearchResult); default all. Unrequested columns are not fetched")
+
+class LegalSearchRequest(LegalSearchOptions):
+    query: str = Field(..., min_length=1, description="Natural language legal research query")
 
     model_config = {"json_schema_extra": {"examples": [
         {"query": "employment discrimination reasonable accommodation", "top_k": 5, "search_field": "hybrid", "status_filter": "exclude_overruled"},
+        {"query": "employment discrimination reasonable accommodation", "top_k": 5, "search_field": "multi", "field_weights": {"content": 1.0, "headnotes": 0.8, "title": 0.4}},
+        {"query": "employment discrimination reasonable accommodation", "top_k": 50, "fields": ["doc_id", "title", "citation", "similarity"]},
+    ]}}
+
+class LegalBatchSearchRequest(LegalSearchOptions):
+    queries: List[str] = Field(..., min_length=1, max_length=BATCH_QUERY_MAX, description="Legal research queries; each gets its own top_k results, in the same order")
+
+    model_config = {"json_schema_extra": {"examples": [
+        {"queries": ["wrongful termination", "reasonable accommodation"], "top_k": 5, "search_field": "hybrid"},
     ]}}
 
 class LegalSearchResult(BaseModel):
@@ -135,8 +252,9 @@ class LegalSearchResult(BaseModel):
     practice_area: Optional[str] = Field(description="Practice area")
     status: Optional[str] = Field(description="Shepard's-style status")
     content_snippet: str = Field(description="First 500 characters of document content")
-    similarity: float = Field(description="Relevance score (cosine similarity for semantic, RRF for hybrid)")
-    search_method: str = Field(description="Search method used: 'semantic', 'keyword', or 'hybrid'")
+    similarity: float = Field(description="Relevance score (cosine similarity for semantic, RRF for hybrid, fused score for multi)")
+    search_method: str = Field(description="Search method used: 'semantic', 'keyword', 'hybrid', or 'multi'")
+    field_scores: Optional[Dict[str, float]] = Field(default=None, description="multi: cosine similarity of each searched field")
 
 class LegalRAGRequest(BaseModel):
     query: str = Field(..., min_length=1, description="Legal research question to answer with citations")
@@ -144,6 +262,7 @@ class LegalRAGRequest(BaseModel):
     jurisdiction: Optional[str] = Field(default=None, description="Filter sources by jurisdiction")
     practice_area: Optional[str] = Field(default=None, description="Filter sources by practice area")
     exclude_overruled: bool = Field(default=True, description="Exclude overruled authorities (Shepard's-style filtering)")
+    stream: bool = Field(default=False, description="Stream sources, answer tokens, then citations as server-sent events")
 
     model_config = {"json_schema_extra": {"examples": [
         {"query": "What are the requirements for filing a wrongful termination claim?", "top_k": 3, "jurisdiction": "CA"},
@@ -155,13 +274,16 @@ class LegalRAGResponse(BaseModel):
     sources: List[LegalSearchResult] = Field(description="Source authorities used to generate the answer")
     citations_used: List[str] = Field(description="List of legal citations referenced in the answer")
     faithfulness_note: str = Field(description="Assessment of source grounding (e.g., 'Answer references 3 source(s) out of 3 retrieved.')")
+    generation: Optional[GenerationStats] = Field(default=None, description="Token counts and timings for this generation")
+    context: Optional[ContextStats] = Field(default=None, description="How the sources were packed into the prompt")
+    cached: bool = Field(default=False, description="True if served from the semantic answer cache (no retrieval or generation)")
 
 
 # ============================================================
 # Helper Functions
 # ============================================================
 
-def get_db_credentials():
+def _fetch_db_credentials():
     """Get database credentials from env vars (local dev) or Secrets Manager (AWS)."""
     if os.getenv('DB_HOST'):
         return {
@@ -184,9 +306,27 @@ def get_db_credentials():
         raise
 
 
-def get_db_connection():
-    """Create a database connection."""
-    creds = get_db_credentials()
+_credentials_cache = {"value": None, "expires_at": 0.0}
+_credentials_lock = threading.Lock()
+
+
+def get_db_credentials(force_refresh: bool = False):
+    """Get database credentials, cached for DB_CREDENTIALS_TTL seconds.
+
+    Avoids a Secrets Manager round-trip per connection. Pass force_refresh=True
+    after an authentication failure to pick up rotated credentials.
+    """
+    ttl = float(os.getenv("DB_CREDENTIALS_TTL", "300"))
+    with _credentials_lock:
+        now = time.monotonic()
+        if force_refresh or _credentials_cache["value"] is None or now >= _credentials_cache["expires_at"]:
+            with timed_stage("credential_fetch"):
+                _credentials_cache["value"] = _fetch_db_credentials()
+            _credentials_cache["expires_at"] = now + ttl
+        return _credentials_cache["value"]
+
+
+def _connect(creds):
     return psycopg2.connect(
         host=creds['host'],
         database=creds['database'],
@@ -196,6 +336,214 @@ def get_db_connection():
     )
 
 
+def get_db_connection():
+    """Create a dedicated (unpooled) database connection.
+
+    Request handlers should use the shared pool via get_db_cursor() instead.
+    """
+    try:
+        return _connect(get_db_credentials())
+    except psycopg2.OperationalError:
+        # Credentials may have been rotated since they were cached
+        return _connect(get_db_credentials(force_refresh=True))
+
+
+def _percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    idx = min(len(sorted_values) - 1, max(0, int(round(pct / 100.0 * len(sorted_values))) - 1))
+    return sorted_values[idx]
+
+
+class DatabasePool:
+    """Thread-safe psycopg2 connection pool shared by all request handlers.
+
+    Unlike psycopg2.pool.ThreadedConnectionPool, callers block (up to
+    `timeout` seconds) when every connection is checked out instead of
+    failing immediately. Idle connections that have not been used for
+    `healthcheck_interval` seconds are probed with SELECT 1 before being
+    handed out, and broken connections are replaced transparently.
+    """
+
+    def __init__(self, min_size: int = 2, max_size: int = 16, timeout: float = 10.0,
+                 healthcheck_interval: float = 30.0):
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.healthcheck_interval = healthcheck_interval
+
+        self._idle = deque()  # (connection, last_used) pairs, most recent on the right
+        self._cond = threading.Condition()
+        self._size = 0        # open connections (idle + in use)
+        self._closed = False
+
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.discarded = 0
+        self._checkout_ms = deque(maxlen=1024)
+
+    def open(self):
+        """Pre-open min_size connections so the first requests skip the handshake."""
+        conns = [self.getconn() for _ in range(self.min_size)]
+        for conn in conns:
+            self.putconn(conn)
+
+    def close(self):
+        """Close all idle connections; in-use connections are closed on return."""
+        with self._cond:
+            self._closed = True
+            while self._idle:
+                conn, _ = self._idle.pop()
+                self._close_quietly(conn)
+                self._size -= 1
+            self._cond.notify_all()
+
+    @staticmethod
+    def _close_quietly(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, last_used: float) -> bool:
+        if conn.closed:
+            return False
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def getconn(self):
+        """Check out a connection, waiting for one to be returned if the pool is full."""
+        start = time.perf_counter()
+        deadline = start + self.timeout
+        conn, last_used = None, 0.0
+
+        with self._cond:
+            self.waiting += 1
+            try:
+                while True:
+                    if self._closed:
+                        raise psycopg2.pool.PoolError("connection pool is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        self._size += 1
+                        break
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise psycopg2.pool.PoolError(
+                            f"timed out after {self.timeout}s waiting for a database connection")
+                    self._cond.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_use += 1
+
+        try:
+            if conn is not None and not self._is_healthy(conn, last_used):
+                self._close_quietly(conn)
+                with self._cond:
+                    self.discarded += 1
+                conn = None
+            if conn is None:
+                conn = get_db_connection()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self.in_use -= 1
+                self._cond.notify()
+            raise
+
+        elapsed = time.perf_counter() - start
+        with self._cond:
+            self.checkouts += 1
+            self._checkout_ms.append(elapsed * 1000)
+        observe_stage("connection_checkout", elapsed)
+        return conn
+
+    def putconn(self, conn, discard: bool = False):
+        """Return a connection; any open transaction is rolled back."""
+        if not discard and not conn.closed and conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                discard = True
+
+        with self._cond:
+            self.in_use -= 1
+            if discard or conn.closed or self._closed:
+                self._close_quietly(conn)
+                self._size -= 1
+                self.discarded += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """Context manager that checks out a connection and always returns it."""
+        conn = self.getconn()
+        try:
+            yield conn
+        finally:
+            self.putconn(conn)
+
+    @contextmanager
+    def cursor(self, cursor_factory=None, commit: bool = False):
+        """Context manager yielding a cursor on a pooled connection.
+
+        With commit=True the transaction is committed when the block exits
+        cleanly; otherwise it is rolled back when the connection is returned.
+        """
+        with self.connection() as conn:
+            cur = conn.cursor(cursor_factory=cursor_factory)
+            try:
+                yield cur
+                if commit:
+                    conn.commit()
+            finally:
+                cur.close()
+
+    def stats(self) -> dict:
+        """Pool metrics: sizes, waiters, and checkout latency."""
+        with self._cond:
+            latencies = sorted(self._checkout_ms)
+            return {
+                "size": self._size,
+                "max_size": self.max_size,
+                "idle": len(self._idle),
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "discarded": self.discarded,
+                "checkout_latency_ms": {
+                    "avg": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                    "p50": round(_percentile(latencies, 50), 3),
+                    "p95": round(_percentile(latencies, 95), 3),
+                    "max": round(latencies[-1], 3) if latencies else 0.0,
+                },
+            }
+
+
+def get_db_cursor(cursor_factory=None, commit: bool = False):
+    """Return a context manager yielding a cursor from the shared pool."""
+    if db_pool is None:
+        raise RuntimeError("Database pool not initialized")
+    return db_pool.cursor(cursor_factory=cursor_factory, commit=commit)
+
+
 def mean_pooling(model_output, attention_mask):
     """Mean pooling for sentence embeddings."""
     token_embeddings = model_output[0]
@@ -203,81 +551,2199 @@ def mean_pooling(model_output, attention_mask):
     return torch.sum(token_embeddings * input_mask_expanded, 1) / torch.clamp(input_mask_expanded.sum(1), min=1e-9)
 
 
-def get_embedding(text: str) -> List[float]:
-    """Generate embedding for text."""
+def get_embeddings(texts: List[str]) -> np.ndarray:
+    """Generate float32 embeddings for a batch of texts in one padded forward pass."""
     global embedder, tokenizer
 
-    encoded = tokenizer(text, padding=True, truncation=True, max_length=512, return_tensors='pt')
+    start = time.perf_counter()
+    if product_onnx_embedder is not None:
+        embeddings = product_onnx_embedder.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+    else:
+        encoded = tokenizer(texts, padding=True, truncation=True, max_length=512, return_tensors='pt')
 
-    with torch.no_grad():
-        model_output = embedder(**encoded)
+        with torch.no_grad():
+            model_output = embedder(**encoded)
 
-    embedding = mean_pooling(model_output, encoded['attention_mask'])
-    embedding = torch.nn.functional.normalize(embedding, p=2, dim=1)
+        embeddings = mean_pooling(model_output, encoded['attention_mask'])
+        embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1).numpy()
 
-    return embedding[0].tolist()
+    if product_backend is not None:
+        product_backend.batch_ms.observe((time.perf_counter() - start) * 1000)
+    return embeddings.astype(np.float32, copy=False)
 
 
-def get_legal_embedding(text: str) -> List[float]:
-    """Generate 768-dim embedding for legal text using ModernBERT legal model."""
+def get_embedding(text: str) -> np.ndarray:
+    """Generate embedding for text."""
+    return get_embeddings([text])[0]
+
+
+def get_legal_embeddings(texts: List[str]) -> np.ndarray:
+    """Generate float32 768-dim legal embeddings for a batch of texts in one encode call."""
     global legal_embedder
-    embedding = legal_embedder.encode(text, normalize_embeddings=True)
-    return embedding.tolist()
+    start = time.perf_counter()
+    embeddings = legal_embedder.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+    if legal_backend is not None:
+        legal_backend.batch_ms.observe((time.perf_counter() - start) * 1000)
+    return embeddings.astype(np.float32, copy=False)
+
+
+def get_legal_embedding(text: str) -> np.ndarray:
+    """Generate 768-dim embedding for legal text using ModernBERT legal model."""
+    return get_legal_embeddings([text])[0]
 
 
 # ============================================================
-# App Lifespan
+# Vector Codec
 # ============================================================
+#
+# Embeddings stay float32 numpy arrays from the model to the database.
+# Bulk writes COPY them in pgvector's binary format (a 4-byte header and
+# big-endian float4s, no float -> str -> parse round trip); query
+# parameters, which psycopg2 can only send as text, are formatted with
+# %.9g, which round-trips float32 exactly.
+
+_VECTOR_TEXT_FORMATS = {}
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PG_DATE_EPOCH = datetime.date(2000, 1, 1).toordinal()
+_PG_TEXT_OID = 25
+
+
+def vector_text(vec) -> str:
+    """pgvector text literal ("[x,y,...]") for a 1-d vector."""
+    values = np.asarray(vec, dtype=np.float32).ravel().tolist()
+    fmt = _VECTOR_TEXT_FORMATS.get(len(values))
+    if fmt is None:
+        fmt = _VECTOR_TEXT_FORMATS[len(values)] = "[" + ",".join(["%.9g"] * len(values)) + "]"
+    return fmt % tuple(values)
+
+
+def vector_binary(vec) -> bytes:
+    """pgvector binary send format: int16 dim, int16 unused, float4[dim] big-endian."""
+    values = np.asarray(vec, dtype=">f4").ravel()
+    return struct.pack(">HH", values.shape[0], 0) + values.tobytes()
+
+
+def _adapt_ndarray(vec):
+    return AsIs("'" + vector_text(vec) + "'")
+
+
+# numpy arrays passed as query parameters (e.g. `%s::vector`) become vector literals
+register_adapter(np.ndarray, _adapt_ndarray)
+
+
+def _copy_binary_field(value, pg_type: str) -> bytes:
+    if value is None:
+        return struct.pack(">i", -1)
+    if pg_type == "vector":
+        data = vector_binary(value)
+    elif pg_type == "text":
+        data = str(value).encode("utf-8")
+    elif pg_type == "int4":
+        data = struct.pack(">i", value)
+    elif pg_type == "int8":
+        data = struct.pack(">q", value)
+    elif pg_type == "jsonb":
+        data = b"\x01" + (value if isinstance(value, str) else json.dumps(value, default=str)).encode("utf-8")
+    elif pg_type == "date":
+        if isinstance(value, str):
+            if not value:
+                return struct.pack(">i", -1)
+            value = datetime.date.fromisoformat(value)
+        data = struct.pack(">i", value.toordinal() - _PG_DATE_EPOCH)
+    elif pg_type == "text[]":
+        items = [str(v).encode("utf-8") for v in value]
+        data = struct.pack(">iiiii", 1, 0, _PG_TEXT_OID, len(items), 1) + b"".join(
+            struct.pack(">i", len(item)) + item for item in items
+        )
+    else:
+        raise ValueError(f"Unsupported binary COPY type: {pg_type}")
+    return struct.pack(">i", len(data)) + data
+
+
+def copy_binary(cur, table: str, columns: List[str], types: List[str], rows) -> int:
+    """COPY rows (tuples ordered like columns) into table using the binary format.
+
+    types gives each column's wire type: text (also varchar), int4, int8,
+    jsonb, date, text[] or vector. Returns the number of rows copied.
+    """
+    buffer = io.BytesIO()
+    buffer.write(_PGCOPY_HEADER)
+    field_count = struct.pack(">h", len(columns))
+    n = 0
+    for row in rows:
+        buffer.write(field_count)
+        for value, pg_type in zip(row, types):
+            buffer.write(_copy_binary_field(value, pg_type))
+        n += 1
+    buffer.write(struct.pack(">h", -1))
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT BINARY)", buffer)
+    return n
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Load models on startup."""
-    global llm, embedder, tokenizer, legal_embedder
-
-    # Load text generation model (Phi-3.5 Mini GGUF for fast CPU inference)
-    gen_repo = os.getenv("GEN_MODEL_REPO", "bartowski/Phi-3.5-mini-instruct-GGUF")
-    gen_filename = os.getenv("GEN_MODEL_FILE", "Phi-3.5-mini-instruct-Q4_K_M.gguf")
-    logger.info(f"Loading generation model: {gen_repo}/{gen_filename}")
-
-    llm = Llama.from_pretrained(
-        repo_id=gen_repo,
-        filename=gen_filename,
-        n_ctx=4096,
-        n_threads=int(os.getenv("LLM_THREADS", "4")),
-        verbose=False
+
+# ============================================================
+# Query Embedding Micro-Batching
+# ============================================================
+
+class Histogram:
+    """Fixed-bucket histogram with cumulative (Prometheus-style) bucket counts."""
+
+    def __init__(self, buckets):
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+
+    def state(self):
+        """(per-bucket counts, sum), the last count being the +Inf overflow; see LabelledHistogram."""
+        with self._lock:
+            return list(self._counts), self.sum
+
+    def snapshot(self) -> dict:
+        """Return count, sum and cumulative counts keyed by upper bound."""
+        with self._lock:
+            cumulative = {}
+            running = 0
+            for bound, n in zip(self.buckets, self._counts):
+                running += n
+                cumulative[str(bound)] = running
+            cumulative["+Inf"] = self.count
+            return {"count": self.count, "sum": round(self.sum, 3), "buckets": cumulative}
+
+
+class EmbeddingBatcher:
+    """Coalesces concurrent single-text embedding requests into padded batches.
+
+    Callers await embed(text). A background task takes the first queued
+    request, waits up to max_wait_ms for more to arrive, and runs up to
+    max_batch_size texts through encode_fn in one forward pass on the model's
+    executor. Each caller gets back its own vector. When max_queue requests
+    are already waiting, embed() fails fast with ModelQueueFullError.
+    """
+
+    def __init__(self, name: str, encode_fn, executor, max_batch_size: int = 32,
+                 max_wait_ms: float = 5.0, max_queue: int = 256):
+        self.name = name
+        self.encode_fn = encode_fn
+        self.executor = executor
+        self.max_batch_size = max_batch_size
+        self.max_wait_ms = max_wait_ms
+        self.max_queue = max_queue
+        self.rejected = 0
+        self.batch_sizes = Histogram([1, 2, 4, 8, 16, 32, 64, 128])
+        self.queue_wait_ms = Histogram([0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 1000])
+        self._queue = None
+        self._task = None
+
+    def start(self):
+        self._queue = asyncio.Queue()
+        self._task = asyncio.create_task(self._run(), name=f"embedding-batcher-{self.name}")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        while self._queue is not None and not self._queue.empty():
+            _, future, _ = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError(f"{self.name} embedding batcher stopped"))
+
+    async def embed(self, text: str) -> np.ndarray:
+        if self._queue.qsize() >= self.max_queue:
+            self.rejected += 1
+            raise ModelQueueFullError(self.name)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((text, future, time.perf_counter()))
+        return await future
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            if self.max_wait_ms > 0 and self._queue.qsize() < self.max_batch_size - 1:
+                await asyncio.sleep(self.max_wait_ms / 1000)
+            while len(batch) < self.max_batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            started = time.perf_counter()
+            for _, _, enqueued in batch:
+                self.queue_wait_ms.observe((started - enqueued) * 1000)
+            self.batch_sizes.observe(len(batch))
+
+            try:
+                vectors = await self.executor.run(self.encode_fn, [text for text, _, _ in batch])
+            except Exception as e:
+                logger.error(f"{self.name} batch embedding error: {e}")
+                for _, future, _ in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+
+            for (_, future, _), vector in zip(batch, vectors):
+                if not future.done():
+                    future.set_result(vector)
+
+    def stats(self) -> dict:
+        batches = self.batch_sizes.count
+        return {
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait_ms,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "batches": batches,
+            "requests": int(self.batch_sizes.sum),
+            "avg_batch_size": round(self.batch_sizes.sum / batches, 2) if batches else 0.0,
+            "batch_size_histogram": self.batch_sizes.snapshot(),
+            "queue_wait_ms_histogram": self.queue_wait_ms.snapshot(),
+        }
+
+
+# ============================================================
+# Metrics
+# ============================================================
+#
+# Prometheus text-format metrics served at /metrics. Stage latencies are
+# labelled with the endpoint and search_field of the request they ran
+# for; those labels live in a context variable set by MetricsMiddleware
+# and MetricsRoute, so code running in the request's task or in
+# run_in_threadpool workers picks them up without passing them around.
+#
+# Under gunicorn each worker has its own metrics and a scrape reaches one
+# of them. With METRICS_DIR set (gunicorn.conf.py sets it), every worker
+# writes a snapshot of its metrics to METRICS_DIR/<pid>.json each
+# METRICS_SNAPSHOT_SECONDS, and /metrics adds up the snapshots of all
+# workers (its own metrics read live), so histograms, counters and gauges
+# such as inference_requests_in_flight describe the whole task, up to one
+# snapshot interval old. inference_model_ready is the minimum: 1 only once
+# every worker has the model.
+
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+METRICS_SNAPSHOT_SECONDS = float(os.getenv("METRICS_SNAPSHOT_SECONDS", "1"))
+
+LATENCY_BUCKETS_SECONDS = [0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+
+_request_labels = contextvars.ContextVar("request_labels", default=None)
+
+
+class LabelledHistogram:
+    """A Histogram per label-value combination, rendered in Prometheus text format."""
+
+    def __init__(self, name: str, help_text: str, labelnames, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(n, "")) for n in self.labelnames)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, Histogram(self.buckets))
+        child.observe(value)
+
+    def state(self) -> list:
+        """[[label values, per-bucket counts, sum]] for every child (JSON-serializable)."""
+        with self._lock:
+            children = list(self._children.items())
+        return [[list(key), *histogram.state()] for key, histogram in children]
+
+    def render(self, states) -> List[str]:
+        """Text format for the sum of several processes' state() lists."""
+        merged = {}
+        for state in states:
+            for key, counts, total in state:
+                key = tuple(key)
+                if key in merged:
+                    merged[key] = ([a + b for a, b in zip(merged[key][0], counts)], merged[key][1] + total)
+                else:
+                    merged[key] = (counts, total)
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        bounds = [str(b) for b in self.buckets] + ["+Inf"]
+        for key, (counts, total) in sorted(merged.items()):
+            labels = ",".join(f'{n}="{_escape_label(v)}"' for n, v in zip(self.labelnames, key))
+            sep = "," if labels else ""
+            for bound, count in zip(bounds, itertools.accumulate(counts)):
+                lines.append(f'{self.name}_bucket{{{labels}{sep}le="{bound}"}} {count}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {sum(counts)}")
+        return lines
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_SECONDS = LabelledHistogram(
+    "inference_stage_seconds",
+    "Latency of one request stage (credential_fetch, connection_checkout, query_embedding, sql, prefill, decode, serialize)",
+    ["stage", "endpoint", "search_field"], LATENCY_BUCKETS_SECONDS,
+)
+REQUEST_SECONDS = LabelledHistogram(
+    "inference_request_seconds",
+    "End-to-end request latency, including streamed bodies",
+    ["endpoint", "method", "status"], LATENCY_BUCKETS_SECONDS,
+)
+DECODE_TOKENS_PER_SECOND = LabelledHistogram(
+    "inference_decode_tokens_per_second",
+    "LLM decode throughput per generation",
+    ["endpoint", "search_field"], [1, 2, 4, 6, 8, 10, 12, 16, 20, 25, 30, 40, 60, 100],
+)
+HISTOGRAMS = (REQUEST_SECONDS, STAGE_SECONDS, DECODE_TOKENS_PER_SECOND)
+
+# Gauges and counters: name -> (type, help, how workers' values combine)
+SAMPLE_METRICS = {
+    "inference_requests_in_flight": ("gauge", "HTTP requests currently being handled", sum),
+    "inference_model_queue_depth": ("gauge", "Jobs waiting for a model worker", sum),
+    "inference_embedding_batch_queue_depth": ("gauge", "Query embeddings waiting to be batched", sum),
+    "inference_db_pool_connections": ("gauge", "Database pool connections by state", sum),
+    "inference_model_ready": ("gauge", "1 once the model is loaded and warmed up (in every worker)", min),
+    "inference_search_path_total": ("counter", "Filtered vector searches by routing path", sum),
+}
+requests_in_flight = 0
+
+
+def set_metric_label(name: str, value):
+    """Attach a label (e.g. search_field) to the current request's metrics."""
+    labels = _request_labels.get()
+    if labels is not None:
+        labels[name] = value
+
+
+def observe_stage(stage: str, seconds: float):
+    """Record a stage latency against the current request's endpoint and search_field."""
+    labels = _request_labels.get() or {}
+    STAGE_SECONDS.observe(
+        seconds, stage=stage,
+        endpoint=labels.get("endpoint", "background"),
+        search_field=labels.get("search_field") or "none",
     )
 
-    logger.info("Generation model loaded (Phi-3.5 Mini GGUF)")
 
-    # Load product embedding model (384-dim, for backward compatibility)
-    embed_model_id = os.getenv("EMBED_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2")
-    logger.info(f"Loading product embedding model: {embed_model_id}")
+@contextmanager
+def timed_stage(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - start)
+
+
+def observe_generation(generation: Optional[dict]):
+    """Record prefill/decode latency and decode throughput from generation stats."""
+    if not generation:
+        return
+    observe_stage("prefill", generation["prefill_ms"] / 1000)
+    observe_stage("decode", generation["decode_ms"] / 1000)
+    if generation.get("tokens_per_second"):
+        labels = _request_labels.get() or {}
+        DECODE_TOKENS_PER_SECOND.observe(
+            generation["tokens_per_second"],
+            endpoint=labels.get("endpoint", "background"),
+            search_field=labels.get("search_field") or "none",
+        )
+
+
+class MetricsMiddleware:
+    """ASGI middleware: request latency, in-flight gauge, and the per-request label context."""
 
-    tokenizer = AutoTokenizer.from_pretrained(embed_model_id)
-    embedder = AutoModel.from_pretrained(embed_model_id)
-    embedder.eval()
+    def __init__(self, app):
+        self.app = app
 
-    logger.info("Product embedding model loaded (384-dim)")
+    async def __call__(self, scope, receive, send):
+        global requests_in_flight
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        labels = {"endpoint": "unmatched"}
+        token = _request_labels.set(labels)
+        status = {"code": 500}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        requests_in_flight += 1
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            requests_in_flight -= 1
+            REQUEST_SECONDS.observe(
+                time.perf_counter() - start,
+                endpoint=labels["endpoint"], method=scope["method"], status=status["code"],
+            )
+            _request_labels.reset(token)
+
+
+def _mark_endpoint_returned(labels):
+    if labels is not None:
+        labels["endpoint_returned_at"] = time.perf_counter()
+
+
+def _timed_endpoint(endpoint):
+    """Wrap a route function to note when it returns, so serialization can be timed."""
+    if asyncio.iscoroutinefunction(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            result = await endpoint(*args, **kwargs)
+            _mark_endpoint_returned(_request_labels.get())
+            return result
+    else:
+        @functools.wraps(endpoint)
+        def wrapper(*args, **kwargs):
+            result = endpoint(*args, **kwargs)
+            _mark_endpoint_returned(_request_labels.get())
+            return result
+    return wrapper
+
+
+class MetricsRoute(APIRoute):
+    """Labels metrics with the route's path template and times response serialization.
+
+    The serialize stage is the time from the endpoint function returning
+    to the Response being built: response_model validation, JSON
+    encoding and rendering.
+    """
+
+    def __init__(self, path: str, endpoint, **kwargs):
+        super().__init__(path, _timed_endpoint(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def metrics_handler(request: Request):
+            labels = _request_labels.get()
+            if labels is not None:
+                labels["endpoint"] = self.path
+            response = await handler(request)
+            if labels is not None and "endpoint_returned_at" in labels:
+                observe_stage("serialize", time.perf_counter() - labels.pop("endpoint_returned_at"))
+            return response
+
+        return metrics_handler
+
+
+def _metric_samples() -> List[list]:
+    """[name, labels, value] for this process's gauges and counters."""
+    samples = [["inference_requests_in_flight", "", requests_in_flight]]
+    for executor in (llm_pool, embedder_executor, legal_embedder_executor):
+        if executor is not None:
+            samples.append(["inference_model_queue_depth", f'model="{executor.name}"', executor.depth])
+    for batcher in (embedding_batcher, legal_embedding_batcher):
+        if batcher is not None and batcher._queue is not None:
+            samples.append(["inference_embedding_batch_queue_depth", f'batcher="{batcher.name}"', batcher._queue.qsize()])
+    if db_pool is not None:
+        samples.append(["inference_db_pool_connections", 'state="in_use"', db_pool.in_use])
+        samples.append(["inference_db_pool_connections", 'state="waiting"', db_pool.waiting])
+    for name, state in model_states.items():
+        samples.append(["inference_model_ready", f'model="{name}"', int(state.ready)])
+    if search_router is not None:
+        for path in search_router.stats()["paths"]:
+            samples.append(["inference_search_path_total", f'table="{path["table"]}",path="{path["path"]}"', path["queries"]])
+    return samples
+
+
+def metrics_snapshot() -> dict:
+    return {"histograms": {m.name: m.state() for m in HISTOGRAMS}, "samples": _metric_samples()}
+
+
+def write_metrics_snapshot():
+    """Publish this worker's metrics to METRICS_DIR for the other workers' /metrics."""
+    path = os.path.join(METRICS_DIR, f"{os.getpid()}.json")
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(metrics_snapshot(), f)
+    os.replace(f"{path}.tmp", path)
+
+
+async def _publish_metrics(interval: float):
+    while True:
+        try:
+            await asyncio.to_thread(write_metrics_snapshot)
+        except Exception as e:
+            logger.warning(f"Could not write metrics snapshot: {e}")
+        await asyncio.sleep(interval)
+
+
+def _metrics_snapshots() -> List[dict]:
+    """This process's metrics, live, plus the latest snapshot of every other worker."""
+    snapshots = [metrics_snapshot()]
+    if METRICS_DIR is None:
+        return snapshots
+    own = f"{os.getpid()}.json"
+    for name in os.listdir(METRICS_DIR):
+        if name.endswith(".json") and name != own:
+            try:
+                with open(os.path.join(METRICS_DIR, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue   # the worker exited and its snapshot was removed
+    return snapshots
+
+
+def render_metrics() -> str:
+    """All metrics in Prometheus text exposition format, summed over the server's workers."""
+    snapshots = _metrics_snapshots()
+    lines = []
+    for metric in HISTOGRAMS:
+        lines += metric.render([s["histograms"].get(metric.name, []) for s in snapshots])
+
+    values = {}
+    for snapshot in snapshots:
+        for name, labels, value in snapshot["samples"]:
+            values.setdefault(name, {}).setdefault(labels, []).append(value)
+    for name, (kind, help_text, combine) in SAMPLE_METRICS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+        for labels, worker_values in values.get(name, {}).items():
+            lines.append(f"{name}{{{labels}}} {combine(worker_values)}" if labels else f"{name} {combine(worker_values)}")
+    lines += [
+        "# HELP inference_metrics_workers Worker processes whose metrics are included",
+        "# TYPE inference_metrics_workers gauge",
+        f"inference_metrics_workers {len(snapshots)}",
+    ]
+    if os.path.exists("/proc/self/smaps_rollup"):
+        lines += [
+            "# HELP inference_process_memory_bytes Server process memory (rss, pss, shared, private)",
+            "# TYPE inference_process_memory_bytes gauge",
+        ]
+        for pid, role, counters in _process_memory_bytes():
+            for kind, value in counters.items():
+                lines.append(f'inference_process_memory_bytes{{pid="{pid}",role="{role}",kind="{kind}"}} {value}')
+    return "\n".join(lines) + "\n"
+
+
+# ============================================================
+# Embedding Backends
+# ============================================================
+
+# Mixed short queries and longer passages used to compare a candidate
+# backend against the torch model at startup
+EMBED_PARITY_PROBES = [
+    "wireless headphones",
+    "Comfortable running shoes with breathable mesh upper and cushioned sole for long distance training.",
+    "wrongful termination",
+    "What are the requirements for filing a wrongful termination claim in California?",
+    "An employer may not discharge an employee in violation of a fundamental public policy embodied in a statute "
+    "or constitutional provision. The employee must show a nexus between the protected activity and the termination.",
+    "Fourth Amendment search and seizure without a warrant",
+    "The court held that the statute of limitations was tolled during the pendency of the administrative proceedings, "
+    "and that the plaintiff's claims under the Fair Employment and Housing Act were therefore timely filed.",
+    "USB-C charging cable 2m",
+]
+
+EMBED_BACKENDS = ("torch", "onnx", "onnx-int8")
+
+
+class EmbeddingBackend:
+    """Which inference backend an embedder runs on, with parity and latency stats."""
+
+    def __init__(self, name: str, requested: str):
+        if requested not in EMBED_BACKENDS:
+            raise ValueError(f"Unknown embedding backend '{requested}', expected one of {EMBED_BACKENDS}")
+        self.name = name
+        self.requested = requested
+        self.active = "torch"
+        self.parity_min_cosine = None
+        self.probe_batch_ms = {}
+        self.fallback_reason = None
+        self.batch_ms = Histogram([1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000])
+
+    def stats(self) -> dict:
+        count = self.batch_ms.count
+        return {
+            "requested": self.requested,
+            "active": self.active,
+            "parity_min_cosine": self.parity_min_cosine,
+            "probe_batch_ms": self.probe_batch_ms,
+            "fallback_reason": self.fallback_reason,
+            "batches": count,
+            "avg_batch_ms": round(self.batch_ms.sum / count, 2) if count else None,
+            "batch_ms_histogram": self.batch_ms.snapshot(),
+        }
+
+
+def _load_onnx_sentence_transformer(model_id: str, quantize: bool) -> SentenceTransformer:
+    """Load model_id with the ONNX Runtime backend, optionally int8-quantized.
+
+    The hub repo's ONNX graph is used if it has one, otherwise it is
+    exported. Quantized graphs are exported once into EMBED_ONNX_DIR and
+    reused on later starts.
+    """
+    if not quantize:
+        return SentenceTransformer(model_id, backend="onnx")
+
+    config = os.getenv("EMBED_ONNX_QUANTIZATION", "avx2")
+    export_dir = os.path.join(os.getenv("EMBED_ONNX_DIR", "/tmp/onnx-models"), model_id.replace("/", "__"))
+    file_name = f"onnx/model_qint8_{config}.onnx"
+    if not os.path.exists(os.path.join(export_dir, file_name)):
+        from sentence_transformers import export_dynamic_quantized_onnx_model
+
+        logger.info(f"Exporting int8 ONNX model for {model_id} ({config}) to {export_dir}")
+        model = SentenceTransformer(model_id, backend="onnx")
+        model.save_pretrained(export_dir)
+        export_dynamic_quantized_onnx_model(model, quantization_config=config, model_name_or_path=export_dir)
+    return SentenceTransformer(export_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+
+def _time_probe_batch(encode_fn):
+    """Encode the probe set (after one warm-up call); returns (vectors, ms)."""
+    encode_fn(EMBED_PARITY_PROBES)
+    start = time.perf_counter()
+    vectors = np.asarray(encode_fn(EMBED_PARITY_PROBES), dtype=np.float32)
+    return vectors, round((time.perf_counter() - start) * 1000, 2)
+
+
+def select_embedding_backend(backend: EmbeddingBackend, model_id: str, torch_encode,
+                             max_seq_length: Optional[int] = None) -> Optional[SentenceTransformer]:
+    """Load the requested ONNX backend if it matches torch on the probe set.
+
+    Returns the ONNX model to use, or None to stay on torch (requested
+    backend is torch, loading failed, or min cosine similarity against
+    torch is below EMBED_PARITY_THRESHOLD).
+    """
+    reference, torch_ms = _time_probe_batch(torch_encode)
+    backend.probe_batch_ms["torch"] = torch_ms
+    if backend.requested == "torch":
+        return None
+
+    try:
+        candidate = _load_onnx_sentence_transformer(model_id, quantize=backend.requested == "onnx-int8")
+        if max_seq_length is not None:
+            candidate.max_seq_length = max_seq_length
+        vectors, candidate_ms = _time_probe_batch(
+            lambda texts: candidate.encode(texts, batch_size=len(texts), normalize_embeddings=True)
+        )
+    except Exception as e:
+        backend.fallback_reason = f"{backend.requested} backend failed to load: {e}"
+        logger.warning(f"{backend.name} embedder: {backend.fallback_reason}; using torch")
+        return None
+
+    backend.probe_batch_ms[backend.requested] = candidate_ms
+    if vectors.shape != reference.shape:
+        backend.fallback_reason = f"parity check failed: output shape {vectors.shape} != torch {reference.shape}"
+        logger.warning(f"{backend.name} embedder: {backend.fallback_reason}; using torch")
+        return None
+    backend.parity_min_cosine = round(float(np.min(np.sum(reference * vectors, axis=1))), 5)
+    threshold = float(os.getenv("EMBED_PARITY_THRESHOLD", "0.98"))
+    if backend.parity_min_cosine < threshold:
+        backend.fallback_reason = f"parity check failed: min cosine {backend.parity_min_cosine} < {threshold}"
+        logger.warning(f"{backend.name} embedder: {backend.fallback_reason}; using torch")
+        return None
+
+    backend.active = backend.requested
+    logger.info(
+        f"{backend.name} embedder using {backend.active} (min cosine {backend.parity_min_cosine}, "
+        f"probe batch {candidate_ms}ms vs torch {torch_ms}ms)"
+    )
+    return candidate
+
+
+# ============================================================
+# Query Embedding Cache
+# ============================================================
+
+class EmbeddingCache:
+    """Bounded LRU cache of query embeddings keyed on (model id, normalized text).
+
+    Clients that retry or autocomplete send the same query strings
+    repeatedly; a hit skips tokenization and the forward pass entirely.
+    Keys include the model id, so entries persisted by a different model
+    are never served. save()/load() persist the cache as an .npz file so
+    a restarted task starts warm.
+    """
+
+    def __init__(self, max_entries: int = 10000, path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.path = path
+        self._entries = OrderedDict()   # (model id, text) -> float32 vector
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def normalize(text: str) -> str:
+        return " ".join(unicodedata.normalize("NFC", text).split())
+
+    def get(self, model_id: str, text: str) -> Optional[np.ndarray]:
+        key = (model_id, self.normalize(text))
+        with self._lock:
+            vec = self._entries.get(key)
+            if vec is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+        return vec
+
+    def put(self, model_id: str, text: str, embedding):
+        key = (model_id, self.normalize(text))
+        with self._lock:
+            self._entries[key] = np.asarray(embedding, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def save(self):
+        """Write the cache to self.path (atomically, via a temp file)."""
+        if not self.path:
+            return
+        with self._lock:
+            items = list(self._entries.items())
+        by_model = {}
+        for (model_id, text), vec in items:
+            by_model.setdefault(model_id, ([], []))
+            by_model[model_id][0].append(text)
+            by_model[model_id][1].append(vec)
+        arrays = {"models": np.array(list(by_model), dtype=str)}
+        for i, (texts, vecs) in enumerate(by_model.values()):
+            arrays[f"texts_{i}"] = np.array(texts, dtype=str)
+            arrays[f"vectors_{i}"] = np.stack(vecs)
+        # Per-process temp name: under gunicorn every worker saves on shutdown
+        tmp_path = f"{self.path}.{os.getpid()}.tmp.npz"
+        np.savez(tmp_path, **arrays)
+        os.replace(tmp_path, self.path)
+        logger.info(f"Saved {len(items)} query embeddings to {self.path}")
+
+    def load(self):
+        """Warm the cache from self.path if it exists (least recently used first)."""
+        if not self.path or not os.path.exists(self.path):
+            return
+        with np.load(self.path) as data:
+            for i, model_id in enumerate(data["models"]):
+                for text, vec in zip(data[f"texts_{i}"], data[f"vectors_{i}"]):
+                    self.put(str(model_id), str(text), vec)
+        logger.info(f"Loaded {len(self._entries)} query embeddings from {self.path}")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "persist_path": self.path,
+        }
+
+
+# ============================================================
+# Model Executors
+# ============================================================
+
+class ModelQueueFullError(HTTPException):
+    """Raised when a model's work queue is full; served as 429 Too Many Requests."""
+
+    def __init__(self, model: str):
+        super().__init__(
+            status_code=429,
+            detail=f"{model} queue is full, retry shortly",
+            headers={"Retry-After": "1"},
+        )
+
+
+class ModelExecutor:
+    """Dedicated worker thread(s) for one model with a bounded backlog.
+
+    Blocking inference (llama.cpp generation, torch forward passes) runs
+    here instead of on the event loop, so a long generation cannot stall
+    /health or cheap searches. At most max_workers calls run at once and
+    at most max_queue more may wait; further submissions are rejected
+    immediately with ModelQueueFullError.
+    """
+
+    def __init__(self, name: str, max_workers: int = 1, max_queue: int = 8):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"model-{name}")
+        self._lock = threading.Lock()
+        self.pending = 0   # queued + running
+        self.running = 0
+        self.rejected = 0
+        self.queue_wait_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000])
+        self.run_ms = Histogram([5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000])
+
+    @property
+    def depth(self) -> int:
+        """Number of calls waiting for a worker."""
+        return self.pending - self.running
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def submit(self, fn, *args, **kwargs) -> asyncio.Future:
+        """Queue fn(*args, **kwargs) on this model's worker.
+
+        Raises ModelQueueFullError immediately if the backlog is full, so
+        callers can reject a request before they start responding.
+        """
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ModelQueueFullError(self.name)
+            self.pending += 1
+
+        submitted = time.perf_counter()
+
+        def task():
+            started = time.perf_counter()
+            self.queue_wait_ms.observe((started - submitted) * 1000)
+            with self._lock:
+                self.running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self.running -= 1
+                self.run_ms.observe((time.perf_counter() - started) * 1000)
+
+        future = self._executor.submit(task)
+        future.add_done_callback(self._release)
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on this model's worker and await the result."""
+        return await self.submit(fn, *args, **kwargs)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "running": self.running,
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "rejected": self.rejected,
+            "queue_wait_ms_histogram": self.queue_wait_ms.snapshot(),
+            "run_ms_histogram": self.run_ms.snapshot(),
+        }
+
+
+# ============================================================
+# Generation and Prompt Prefix Cache
+# ============================================================
+
+PRODUCT_RAG_SYSTEM_PROMPT = "You are a helpful product search assistant. Answer questions based only on the provided product information. Be concise."
+
+LEGAL_RAG_SYSTEM_PROMPT = """You are a legal content editor at a major legal publisher.
+
+RULES:
+1. ONLY use information from the provided source documents. Do not add facts from training data.
+2. Every factual claim must include a citation in [brackets] referencing the source number.
+3. If uncertain about any legal interpretation, prefix with [NEEDS REVIEW].
+4. If sources are insufficient to answer the question, say "Insufficient sources" rather than guessing.
+5. Note if any cited authority has been overruled or questioned."""
+
+RAG_SYSTEM_PROMPTS = {
+    "product_rag": PRODUCT_RAG_SYSTEM_PROMPT,
+    "legal_rag": LEGAL_RAG_SYSTEM_PROMPT,
+}
+
+# Endpoints that decode with prompt-lookup speculative decoding, e.g.
+# "rag,legal_rag". RAG answers copy long spans from their sources, which
+# the n-gram lookup drafts for free. Enabling any endpoint loads the
+# models with logits_all=True (llama.cpp must keep logits for every
+# drafted position), which costs n_ctx x n_vocab floats per instance.
+SPECULATIVE_ENDPOINTS = {e.strip() for e in os.getenv("LLM_SPECULATIVE_ENDPOINTS", "").split(",") if e.strip()}
+
+
+class CountingPromptLookup(LlamaPromptLookupDecoding):
+    """Prompt-lookup draft model that counts calls and drafted tokens."""
+
+    def __init__(self, max_ngram_size: int = 2, num_pred_tokens: int = 10):
+        super().__init__(max_ngram_size=max_ngram_size, num_pred_tokens=num_pred_tokens)
+        self.calls = 0
+        self.drafted = 0
+
+    def __call__(self, input_ids, /, **kwargs):
+        draft = super().__call__(input_ids, **kwargs)
+        self.calls += 1
+        self.drafted += len(draft)
+        return draft
+
+
+class PrefixCachingLlama(Llama):
+    """Llama with snapshots of the KV cache for fixed system-prompt prefixes.
+
+    llama.cpp already skips prefill for the longest prefix shared between a
+    new prompt and whatever is in the KV cache, but any other request (e.g.
+    /generate, or the other RAG endpoint) overwrites that cache. cache_prefix()
+    evaluates a system prompt once and snapshots the state; restore_prefix()
+    reloads the snapshot before a generation if the cache no longer starts
+    with that prefix, so only the per-request sources and question are
+    prefilled.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prefix_states = {}   # key -> (prefix tokens, LlamaState)
+        self.prefix_restores = 0
+        self.last_prompt_tokens = []
+        self.last_reused_tokens = 0
+        self.total_prompt_tokens = 0
+        self.total_reused_tokens = 0
+        self.cancel_event = None   # set by LlamaPool while a job runs on this instance
+        self.last_completion_tokens = 0
+        self.last_prefill_seconds = 0.0
+        self.last_decode_seconds = 0.0
+        self.total_completion_tokens = 0
+        self.decode_totals = {"standard": [0, 0.0], "speculative": [0, 0.0]}   # mode -> [tokens, seconds]
+        self.lookup = None
+        self._draft_start = (0, 0)
+        self.total_drafted_tokens = 0
+        self.total_accepted_tokens = 0
+
+    def enable_lookup(self, max_ngram_size: int = 2, num_pred_tokens: int = 10):
+        """Attach a prompt-lookup draft model; use_lookup() turns it on per job."""
+        self.lookup = CountingPromptLookup(max_ngram_size, num_pred_tokens)
+
+    def use_lookup(self, enabled: bool):
+        self.draft_model = self.lookup if enabled else None
+
+    def generate(self, tokens, *args, **kwargs):
+        # Mirror llama.cpp's own prefix match so we know how much prefill is skipped
+        tokens = list(tokens)
+        reused = 0
+        if kwargs.get("reset", True) and self.n_tokens > 0:
+            reused = Llama.longest_token_prefix(self._input_ids, tokens[:-1])
+        self.last_prompt_tokens = tokens
+        self.last_reused_tokens = reused
+        self.total_prompt_tokens += len(tokens)
+        self.total_reused_tokens += reused
+        if self.lookup is not None:
+            self._draft_start = (self.lookup.calls, self.lookup.drafted)
+        return self._timed_tokens(super().generate(tokens, *args, **kwargs))
+
+    def _timed_tokens(self, tokens):
+        """Count and time sampled tokens; stop early if the job was cancelled.
+
+        The first token arrives after prefill, so decode speed is measured
+        from the first token onwards. Totals are updated per token so they
+        stay correct when the caller abandons the generator.
+        """
+        self.last_completion_tokens = 0
+        self.last_prefill_seconds = 0.0
+        self.last_decode_seconds = 0.0
+        totals = self.decode_totals["speculative" if self.draft_model is not None else "standard"]
+        start = previous = time.perf_counter()
+        for token in tokens:
+            now = time.perf_counter()
+            if self.last_completion_tokens == 0:
+                self.last_prefill_seconds = now - start
+            else:
+                self.last_decode_seconds += now - previous
+                totals[0] += 1
+                totals[1] += now - previous
+            previous = now
+            self.last_completion_tokens += 1
+            self.total_completion_tokens += 1
+            if self.cancel_event is not None and self.cancel_event.is_set():
+                return
+            yield token
+
+    def cache_prefix(self, key: str, system_prompt: str):
+        """Evaluate the chat-formatted prefix for system_prompt and snapshot it.
+
+        The prefix is whatever the chat template renders before the user
+        message, found as the common prefix of two probe prompts.
+        """
+        totals = (self.total_prompt_tokens, self.total_reused_tokens)
+        probes = []
+        for probe in ("a", "b"):
+            self.create_chat_completion(
+                messages=[{"role": "system", "content": system_prompt}, {"role": "user", "content": probe}],
+                max_tokens=1,
+                temperature=0.0,
+            )
+            probes.append(self.last_prompt_tokens)
+        prefix = probes[0][:Llama.longest_token_prefix(probes[0], probes[1])]
+        self.total_prompt_tokens, self.total_reused_tokens = totals
+
+        self.reset()
+        self.eval(prefix)
+        self.prefix_states[key] = (prefix, self.save_state())
+        return len(prefix)
+
+    def warm_up(self):
+        """Run a one-token completion so the first request skips lazy initialisation."""
+        totals = (self.total_prompt_tokens, self.total_reused_tokens)
+        self.create_completion("Hello", max_tokens=1, temperature=0.0)
+        self.total_prompt_tokens, self.total_reused_tokens = totals
+        self.reset()
+
+    def restore_prefix(self, key: Optional[str]):
+        """Load the snapshot for key unless the KV cache already starts with it."""
+        if key not in self.prefix_states:
+            return
+        prefix, state = self.prefix_states[key]
+        if Llama.longest_token_prefix(self._input_ids, prefix) < len(prefix):
+            self.load_state(state)
+            self.prefix_restores += 1
+
+    def _draft_counts(self):
+        """(drafted, accepted) tokens for the most recent generation.
+
+        Each verification step evaluates one draft and yields the accepted
+        draft tokens plus one sampled token, so accepted is the completion
+        length minus the first token and one token per draft call.
+        """
+        if self.lookup is None or self.draft_model is None:
+            return 0, 0
+        calls = self.lookup.calls - self._draft_start[0]
+        drafted = self.lookup.drafted - self._draft_start[1]
+        accepted = min(max(self.last_completion_tokens - 1 - calls, 0), drafted)
+        return drafted, accepted
+
+    def generation_stats(self) -> dict:
+        """Token accounting and timings for the most recent generation.
+
+        Also adds its draft counts to the instance totals, so call it once
+        per generation.
+        """
+        prompt_tokens = len(self.last_prompt_tokens)
+        decode_tokens = max(self.last_completion_tokens - 1, 0)
+        drafted, accepted = self._draft_counts()
+        self.total_drafted_tokens += drafted
+        self.total_accepted_tokens += accepted
+        return {
+            "prompt_tokens": prompt_tokens,
+            "prompt_tokens_reused": self.last_reused_tokens,
+            "prompt_tokens_fresh": prompt_tokens - self.last_reused_tokens,
+            "completion_tokens": self.last_completion_tokens,
+            "prefill_ms": round(self.last_prefill_seconds * 1000, 1),
+            "decode_ms": round(self.last_decode_seconds * 1000, 1),
+            "tokens_per_second": round(decode_tokens / self.last_decode_seconds, 2) if self.last_decode_seconds else None,
+            "speculative": self.draft_model is not None,
+            "draft_tokens": drafted,
+            "draft_tokens_accepted": accepted,
+            "draft_acceptance_rate": round(accepted / drafted, 3) if drafted else None,
+        }
+
+    def throughput_stats(self) -> dict:
+        """Cumulative decode throughput for this instance, overall and per decoding mode."""
+        tokens = sum(t for t, _ in self.decode_totals.values())
+        seconds = sum(sec for _, sec in self.decode_totals.values())
+        return {
+            "completion_tokens": self.total_completion_tokens,
+            "tokens_per_second": round(tokens / seconds, 2) if seconds else None,
+            "tokens_per_second_by_mode": {
+                mode: round(t / sec, 2) if sec else None for mode, (t, sec) in self.decode_totals.items()
+            },
+            "draft_acceptance_rate": (
+                round(self.total_accepted_tokens / self.total_drafted_tokens, 3)
+                if self.total_drafted_tokens else None
+            ),
+        }
+
+    def prefix_cache_stats(self) -> dict:
+        return {
+            "prefixes": {
+                key: {"tokens": len(prefix), "state_bytes": state.llama_state_size}
+                for key, (prefix, state) in self.prefix_states.items()
+            },
+            "restores": self.prefix_restores,
+            "prompt_tokens": self.total_prompt_tokens,
+            "prompt_tokens_reused": self.total_reused_tokens,
+        }
+
+
+class GenerationQueueTimeout(HTTPException):
+    """Raised when a generation waited longer than LLM_MAX_QUEUE_SECONDS for an instance."""
+
+    def __init__(self, waited: float):
+        super().__init__(
+            status_code=503,
+            detail=f"Generation queue wait exceeded {waited:.1f}s, retry shortly",
+            headers={"Retry-After": "5"},
+        )
+
+
+class ClientDisconnected(HTTPException):
+    """Raised when the client went away before its generation finished."""
+
+    def __init__(self):
+        super().__init__(status_code=499, detail="Client disconnected")
+
+
+def _parse_priorities(spec: str) -> dict:
+    """Parse 'legal_rag:0,rag:1,generate:2' into {endpoint: priority}."""
+    priorities = {}
+    for item in spec.split(","):
+        if item.strip():
+            name, _, value = item.partition(":")
+            priorities[name.strip()] = int(value)
+    return priorities
+
+
+# Lower values are scheduled first; waiting jobs gain one level per
+# LLM_PRIORITY_AGING_SECONDS so low-priority endpoints are not starved.
+GENERATION_PRIORITIES = _parse_priorities(os.getenv("LLM_ENDPOINT_PRIORITIES", "legal_rag:0,rag:1,generate:2"))
+
+
+class GenerationJob:
+    """One queued call on the LLM pool, resolved on the submitting event loop."""
+
+    def __init__(self, fn, args, kwargs, endpoint: str, priority: int):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.endpoint = endpoint
+        self.priority = priority
+        self.loop = asyncio.get_running_loop()
+        self.future = self.loop.create_future()
+        self.started = self.loop.create_future()   # set when a worker picks the job up
+        self.cancelled = threading.Event()
+        self.enqueued_at = time.perf_counter()
+        self.started_at = None
+        self.instance = None
+
+    def _set_started(self):
+        if not self.started.done():
+            self.started.set_result(None)
+
+    def mark_started(self, instance: int):
+        self.started_at = time.perf_counter()
+        self.instance = instance
+        self.loop.call_soon_threadsafe(self._set_started)
+
+    def _resolve(self, result, error):
+        if self.future.done():
+            return
+        if error is not None:
+            self.future.set_exception(error)
+        else:
+            self.future.set_result(result)
+
+    def resolve(self, result=None, error=None):
+        self.loop.call_soon_threadsafe(self._resolve, result, error)
+
+
+class LlamaPool:
+    """Pool of llama.cpp instances with a priority scheduler.
+
+    A Llama object is not safe to use from two threads, so each instance is
+    owned by one worker thread. Jobs wait in a single queue and the next
+    free worker takes the one with the best aged priority (see
+    GENERATION_PRIORITIES). The queue is bounded (full -> 429), a job that
+    cannot start within max_queue_seconds fails with 503, and a cancelled
+    job is dropped from the queue or stopped at its next token.
+    """
+
+    def __init__(self, instances, threads_per_instance: int, max_queue: int = 8,
+                 max_queue_seconds: float = 30.0, aging_seconds: float = 10.0):
+        self.name = "generator"
+        self.instances = instances
+        self.threads_per_instance = threads_per_instance
+        self.max_queue = max_queue
+        self.max_queue_seconds = max_queue_seconds
+        self.aging_seconds = aging_seconds
+        self._queue = []
+        self._cond = threading.Condition()
+        self._closed = False
+        self._busy = [False] * len(instances)
+        self._requests = [0] * len(instances)
+        self.rejected = 0
+        self.timed_out = 0
+        self.cancelled = 0
+        self.queue_wait_ms = Histogram([1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000])
+        self.run_ms = Histogram([5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000])
+        self._threads = [
+            threading.Thread(target=self._worker, args=(index,), name=f"llm-{index}", daemon=True)
+            for index in range(len(instances))
+        ]
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    def start(self):
+        for thread in self._threads:
+            thread.start()
+
+    def shutdown(self):
+        with self._cond:
+            self._closed = True
+            for job in self._queue:
+                job.cancelled.set()
+                job.resolve(error=RuntimeError("Generator pool shut down"))
+            self._queue.clear()
+            self._cond.notify_all()
+
+    def submit(self, fn, *args, endpoint: str = "generate", **kwargs) -> GenerationJob:
+        """Queue fn(instance, *args, **kwargs) for the next free instance.
+
+        Raises ModelQueueFullError immediately if the queue is full.
+        """
+        job = GenerationJob(fn, args, kwargs, endpoint, GENERATION_PRIORITIES.get(endpoint, 0))
+        with self._cond:
+            if len(self._queue) >= self.max_queue:
+                self.rejected += 1
+                raise ModelQueueFullError(self.name)
+            self._queue.append(job)
+            self._cond.notify()
+        return job
+
+    def _dequeue(self, job: GenerationJob) -> bool:
+        with self._cond:
+            if job in self._queue:
+                self._queue.remove(job)
+                return True
+        return False
+
+    def cancel(self, job: GenerationJob):
+        """Drop job from the queue, or stop it at its next token if running."""
+        if job.future.done() or job.cancelled.is_set():
+            return
+        job.cancelled.set()
+        self._dequeue(job)
+        self.cancelled += 1
+
+    async def wait_started(self, job: GenerationJob, request=None, poll_interval: float = 0.25):
+        """Wait until a worker picks up job.
+
+        Raises GenerationQueueTimeout after max_queue_seconds and
+        ClientDisconnected if request's client goes away; either way the
+        job is removed from the queue.
+        """
+        while job.started_at is None and not job.future.done():
+            await asyncio.wait({job.started, job.future}, timeout=poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            if job.started_at is not None or job.future.done():
+                return
+            waited = time.perf_counter() - job.enqueued_at
+            if request is not None and await request.is_disconnected():
+                self.cancel(job)
+                raise ClientDisconnected()
+            if waited > self.max_queue_seconds and self._dequeue(job):
+                job.cancelled.set()
+                self.timed_out += 1
+                raise GenerationQueueTimeout(waited)
+
+    async def result(self, job: GenerationJob, request=None, poll_interval: float = 0.25):
+        """Await job's result, cancelling it if the caller or client goes away."""
+        try:
+            await self.wait_started(job, request, poll_interval)
+            while True:
+                done, _ = await asyncio.wait({job.future}, timeout=poll_interval)
+                if done:
+                    return job.future.result()
+                if request is not None and await request.is_disconnected():
+                    self.cancel(job)
+                    raise ClientDisconnected()
+        except asyncio.CancelledError:
+            self.cancel(job)
+            raise
+
+    async def run(self, fn, *args, endpoint: str = "generate", request=None, **kwargs):
+        return await self.result(self.submit(fn, *args, endpoint=endpoint, **kwargs), request)
+
+    def _next_job(self) -> GenerationJob:
+        now = time.perf_counter()
+        job = min(self._queue, key=lambda j: (j.priority - (now - j.enqueued_at) / self.aging_seconds, j.enqueued_at))
+        self._queue.remove(job)
+        return job
+
+    def _worker(self, index: int):
+        instance = self.instances[index]
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    self._cond.wait()
+                if self._closed:
+                    return
+                job = self._next_job()
+                job.mark_started(index)
+                self._busy[index] = True
+                self._requests[index] += 1
+            self.queue_wait_ms.observe((job.started_at - job.enqueued_at) * 1000)
+            instance.cancel_event = job.cancelled
+            instance.use_lookup(job.endpoint in SPECULATIVE_ENDPOINTS)
+            try:
+                if job.cancelled.is_set():
+                    job.resolve(error=ClientDisconnected())
+                else:
+                    job.resolve(job.fn(instance, *job.args, **job.kwargs))
+            except Exception as e:
+                job.resolve(error=e)
+            finally:
+                instance.cancel_event = None
+                self.run_ms.observe((time.perf_counter() - job.started_at) * 1000)
+                with self._cond:
+                    self._busy[index] = False
+
+    def stats(self) -> dict:
+        return {
+            "instances": len(self.instances),
+            "threads_per_instance": self.threads_per_instance,
+            "busy": sum(self._busy),
+            "queue_depth": self.depth,
+            "max_queue": self.max_queue,
+            "max_queue_seconds": self.max_queue_seconds,
+            "priorities": GENERATION_PRIORITIES,
+            "speculative_endpoints": sorted(SPECULATIVE_ENDPOINTS),
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "cancelled": self.cancelled,
+            "queue_wait_ms_histogram": self.queue_wait_ms.snapshot(),
+            "run_ms_histogram": self.run_ms.snapshot(),
+            "per_instance": [
+                {"busy": self._busy[i], "requests": self._requests[i], **instance.throughput_stats()}
+                for i, instance in enumerate(self.instances)
+            ],
+        }
+
+
+def _chat_completion(instance, prefix_key=None, **kwargs):
+    """Restore the cached prefix (if any), then run a blocking chat completion."""
+    instance.restore_prefix(prefix_key)
+    output = instance.create_chat_completion(**kwargs)
+    return output, instance.generation_stats()
+
+
+async def run_generation(endpoint: str, prefix_key: Optional[str] = None, request=None, **kwargs):
+    """Run a chat completion on the next free LLM instance.
+
+    Returns (output, generation stats). endpoint selects the scheduling
+    priority; prefix_key names a cached system prompt from
+    RAG_SYSTEM_PROMPTS to restore before prefill. Passing the incoming
+    Request cancels the generation if the client disconnects.
+    """
+    output, generation = await llm_pool.run(_chat_completion, prefix_key, endpoint=endpoint, request=request, **kwargs)
+    observe_generation(generation)
+    return output, generation
+
+
+class TokenStream:
+    """Streams chat-completion deltas from llama.cpp to the event loop.
+
+    Creating a TokenStream immediately queues a stream=True completion on
+    the LLM pool (raising ModelQueueFullError if it is full). Iterating it
+    yields text deltas as llama.cpp produces them, or raises
+    GenerationQueueTimeout if no instance frees up in time. If the
+    consumer stops early (e.g. the SSE client disconnects), generation is
+    abandoned at the next token.
+    """
+
+    _DONE = object()
+
+    def __init__(self, endpoint: str, prefix_key: Optional[str] = None, **kwargs):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue()
+        self.finish_reason = None
+        self.error = None
+        self.generation = None
+        self._finished = False
+        self._job = llm_pool.submit(self._produce, prefix_key, kwargs, endpoint=endpoint)
+
+    def _put(self, item):
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, item)
+
+    def _produce(self, instance, prefix_key, kwargs):
+        try:
+            instance.restore_prefix(prefix_key)
+            # instance.cancel_event is this job's cancelled flag; self._job may
+            # not be assigned yet when an idle worker picks the job up at once
+            for chunk in instance.create_chat_completion(stream=True, **kwargs):
+                if instance.cancel_event.is_set():
+                    break
+                choice = chunk["choices"][0]
+                delta = choice["delta"].get("content")
+                if delta:
+                    self._put(delta)
+                if choice.get("finish_reason"):
+                    self.finish_reason = choice["finish_reason"]
+            self.generation = instance.generation_stats()
+        except Exception as e:
+            self._put(e)
+        finally:
+            self._put(self._DONE)
+
+    async def __aiter__(self):
+        try:
+            await llm_pool.wait_started(self._job)
+            while True:
+                item = await self._queue.get()
+                if item is self._DONE:
+                    self._finished = True
+                    observe_generation(self.generation)
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            if not self._finished:
+                llm_pool.cancel(self._job)
+
+    async def sse_tokens(self, parts: list):
+        """Yield one SSE 'token' event per delta, collecting the text into parts.
+
+        A generation failure ends the stream with an 'error' event and sets
+        self.error, so callers can skip their final event.
+        """
+        try:
+            async for delta in self:
+                parts.append(delta)
+                yield sse_event("token", {"text": delta})
+        except Exception as e:
+            logger.error(f"Streaming generation error: {e}")
+            self.error = str(e)
+            yield sse_event("error", {"detail": str(e)})
+
+
+def sse_event(event: str, data) -> str:
+    """Format one server-sent event with a JSON payload."""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _db_query(sql, params=None, fetch="all", cursor_factory=None, commit=False):
+    with get_db_cursor(cursor_factory=cursor_factory, commit=commit) as cur:
+        with timed_stage("sql"):
+            cur.execute(sql, params)
+            if fetch == "all":
+                return cur.fetchall()
+            if fetch == "one":
+                return cur.fetchone()
+            return None
+
+
+async def db_fetchall(sql, params=None, cursor_factory=None):
+    """Execute a query on a pooled connection in a worker thread and fetch all rows."""
+    return await run_in_threadpool(_db_query, sql, params, "all", cursor_factory)
+
+
+async def db_fetchone(sql, params=None, cursor_factory=None, commit=False):
+    """Execute a statement on a pooled connection in a worker thread and fetch one row."""
+    return await run_in_threadpool(_db_query, sql, params, "one", cursor_factory, commit)
+
+
+async def _cached_embedding(model_id: str, text: str, batcher, encode_one) -> np.ndarray:
+    with timed_stage("query_embedding"):
+        return await _embed_with_cache(model_id, text, batcher, encode_one)
+
+
+async def _embed_with_cache(model_id: str, text: str, batcher, encode_one) -> np.ndarray:
+    if query_embedding_cache is not None:
+        embedding = query_embedding_cache.get(model_id, text)
+        if embedding is not None:
+            return embedding
+    embedding = await _encode(text, batcher, encode_one)
+    if query_embedding_cache is not None:
+        query_embedding_cache.put(model_id, text, embedding)
+    return embedding
+
+
+async def _encode(text: str, batcher, encode_one) -> np.ndarray:
+    if batcher is None:
+        return await run_in_threadpool(encode_one, text)
+    return await batcher.embed(text)
+
+
+async def embed_query(text: str) -> np.ndarray:
+    """Product embedding for a query, cached and batched with concurrent requests."""
+    return await _cached_embedding(EMBED_MODEL_ID, text, embedding_batcher, get_embedding)
+
+
+async def embed_legal_query(text: str) -> np.ndarray:
+    """Legal embedding for a query, cached and batched with concurrent requests."""
+    return await _cached_embedding(LEGAL_EMBED_MODEL_ID, text, legal_embedding_batcher, get_legal_embedding)
+
+
+async def embed_document(text: str) -> np.ndarray:
+    """Product embedding for a document body, batched like queries but kept out of the query cache."""
+    with timed_stage("document_embedding"):
+        return await _encode(text, embedding_batcher, get_embedding)
+
+
+async def _embed_many(model_id: str, texts: List[str], executor, encode_batch) -> np.ndarray:
+    """Embeddings for several texts: cache hits, plus one forward pass over the distinct misses."""
+    with timed_stage("query_embedding"):
+        cache = query_embedding_cache
+        vectors = [cache.get(model_id, text) if cache is not None else None for text in texts]
+        missing = list(dict.fromkeys(text for text, vec in zip(texts, vectors) if vec is None))
+        if missing:
+            encoded = dict(zip(missing, await executor.run(encode_batch, missing)))
+            if cache is not None:
+                for text, vec in encoded.items():
+                    cache.put(model_id, text, vec)
+            vectors = [encoded[text] if vec is None else vec for text, vec in zip(texts, vectors)]
+        return np.stack(vectors)
+
+
+async def embed_queries(texts: List[str]) -> np.ndarray:
+    """Product embeddings for several queries (one row each), cached, in one forward pass."""
+    return await _embed_many(EMBED_MODEL_ID, texts, embedder_executor, get_embeddings)
+
+
+async def embed_legal_queries(texts: List[str]) -> np.ndarray:
+    """Legal embeddings for several queries (one row each), cached, in one forward pass."""
+    return await _embed_many(LEGAL_EMBED_MODEL_ID, texts, legal_embedder_executor, get_legal_embeddings)
+
+
+# ============================================================
+# Semantic Answer Cache
+# ============================================================
+
+class SemanticAnswerCache:
+    """RAG answer cache keyed on query-embedding similarity plus exact filters.
+
+    A lookup hits when a stored entry has identical filters and a query
+    embedding with cosine similarity >= threshold, so near-identical
+    questions reuse one retrieval + generation. Entries expire after
+    ttl_seconds and are evicted least-recently-used beyond max_entries or
+    max_bytes. invalidate() drops everything when the corpus changes;
+    for corpora written outside this service, version_fn is polled at
+    most every version_check_interval seconds and a changed value
+    invalidates the cache.
+    """
+
+    def __init__(self, name: str, threshold: float = 0.95, ttl_seconds: float = 3600,
+                 max_entries: int = 1000, max_bytes: int = 64 * 1024 * 1024,
+                 version_fn=None, version_check_interval: float = 5.0):
+        self.name = name
+        self.threshold = threshold
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.version_fn = version_fn
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()   # id -> (unit vector, filters, response, created, size)
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_checked = 0.0
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vec = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def _drop(self, entry_id):
+        self.bytes -= self._entries.pop(entry_id)[4]
+
+    def lookup(self, embedding, filters: tuple) -> Optional[dict]:
+        """Return the cached response for the most similar matching query, if any."""
+        vec = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            expired = [i for i, e in self._entries.items() if now - e[3] > self.ttl_seconds]
+            for entry_id in expired:
+                self._drop(entry_id)
+            self.expirations += len(expired)
+
+            candidates = [(i, e) for i, e in self._entries.items() if e[1] == filters]
+            if candidates:
+                sims = np.stack([e[0] for _, e in candidates]) @ vec
+                best = int(np.argmax(sims))
+                if sims[best] >= self.threshold:
+                    entry_id, entry = candidates[best]
+                    self._entries.move_to_end(entry_id)
+                    self.hits += 1
+                    return entry[2]
+            self.misses += 1
+            return None
+
+    def store(self, embedding, filters: tuple, response: dict):
+        vec = self._unit(embedding)
+        size = vec.nbytes + len(json.dumps(response, default=str))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self._entries[next(self._ids)] = (vec, filters, response, time.monotonic(), size)
+            self.bytes += size
+            while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate(self, reason: str):
+        with self._lock:
+            if self._entries:
+                logger.info(f"Invalidating {self.name} answer cache ({len(self._entries)} entries): {reason}")
+            self._entries.clear()
+            self.bytes = 0
+            self.invalidations += 1
+
+    async def check_version(self):
+        """Invalidate if version_fn reports a changed corpus (rate-limited)."""
+        if self.version_fn is None or time.monotonic() - self._version_checked < self.version_check_interval:
+            return
+        self._version_checked = time.monotonic()
+        try:
+            version = await run_in_threadpool(self.version_fn)
+        except Exception as e:
+            logger.warning(f"{self.name} answer cache version check failed: {e}")
+            return
+        if self._version is not None and version != self._version:
+            self.invalidate("corpus version changed")
+        self._version = version
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "threshold": self.threshold,
+            "ttl_seconds": self.ttl_seconds,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+        }
+
+
+def _ingestion_version():
+    """Changes whenever the ingestion worker starts or finishes a job on ingested_records."""
+    return _db_query("SELECT count(*), max(completed_at) FROM ingestion_jobs", fetch="one")
+
+
+def _legal_ingest_version():
+    """Changes whenever a /legal/ingest job, in any worker, starts or finishes."""
+    try:
+        return _db_query("SELECT count(*), max(finished_at) FROM legal_ingest_jobs", fetch="one")
+    except psycopg2.errors.UndefinedTable:
+        return None
+
+
+def _answer_cache(name: str, version_fn=None) -> Optional[SemanticAnswerCache]:
+    if os.getenv("ANSWER_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return SemanticAnswerCache(
+        name,
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+        ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+        max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+        max_bytes=int(float(os.getenv("ANSWER_CACHE_MAX_MB", "64")) * 1024 * 1024),
+        version_fn=version_fn,
+    )
+
+
+# ============================================================
+# RAG Context Packing
+# ============================================================
+#
+# Retrieved sources are packed into the prompt in rank order until a token
+# budget (counted with the generator's own tokenizer) is used up, so
+# prompt length, and with it prefill time, is bounded however long the
+# retrieved documents are. A source that does not fit whole is cut at the
+# last sentence boundary that fits; sources after the budget runs out are
+# left out of the prompt but keep their [n] numbering.
+
+RAG_CONTEXT_TOKENS = int(os.getenv("RAG_CONTEXT_TOKENS", "1536"))
+RAG_CONTEXT_MIN_SOURCE_TOKENS = int(os.getenv("RAG_CONTEXT_MIN_SOURCE_TOKENS", "24"))
+
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;])\s+|\n+")
+
+
+def count_tokens(text: str) -> int:
+    """Number of generator tokens in text (no BOS)."""
+    if not text:
+        return 0
+    return len(llm.tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+
+def _trim_to_sentences(body: str, budget: int):
+    """Longest prefix of whole sentences of body within budget tokens; returns (text, tokens)."""
+    sentences = [s for s in _SENTENCE_BOUNDARY.split(body) if s.strip()]
+    # Per-sentence counts slightly overestimate the joined text, so the
+    # greedy pick stays within budget; the result is then counted exactly
+    kept, used = [], 0
+    for sentence in sentences:
+        n = count_tokens(" " + sentence)
+        if used + n > budget:
+            break
+        kept.append(sentence)
+        used += n
+    text = " ".join(kept)
+    return text, count_tokens(text)
+
+
+def pack_context(sources, budget: int = None):
+    """Pack (header, body) sources, in rank order, into at most budget tokens.
+
+    Each packed source is rendered as "[n] header" followed by its (possibly
+    trimmed) body. Returns (context, stats), where stats reports the budget,
+    tokens used, and tokens / truncation for every source.
+    """
+    budget = RAG_CONTEXT_TOKENS if budget is None else budget
+    separator_tokens = count_tokens("\n\n")
+    parts, usage, used = [], [], 0
+
+    for i, (header, body) in enumerate(sources, 1):
+        entry = {"index": i, "tokens": 0, "included": False, "truncated": False}
+        usage.append(entry)
+        prefix = f"[{i}] {header}"
+        remaining = budget - used - (separator_tokens if parts else 0)
+        prefix_tokens = count_tokens(prefix)
+        if remaining - prefix_tokens < RAG_CONTEXT_MIN_SOURCE_TOKENS:
+            continue
+
+        body_tokens = count_tokens(body)
+        if prefix_tokens + body_tokens > remaining:
+            body, body_tokens = _trim_to_sentences(body, remaining - prefix_tokens)
+            if not body:
+                continue
+            entry["truncated"] = True
+
+        parts.append(f"{prefix}{body}")
+        tokens = prefix_tokens + body_tokens
+        used += tokens + (separator_tokens if len(parts) > 1 else 0)
+        entry.update(tokens=tokens, included=True)
+
+    return "\n\n".join(parts), {"budget": budget, "tokens": used, "sources": usage}
+
+
+# ============================================================
+# Model Loading and Readiness
+# ============================================================
+
+class ModelState:
+    """Load and warm-up progress of one model, reported in /health."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.status = "pending"
+        self.error = None
+        self.seconds = {}
+        self.ready_after_seconds = None
+        self._created = time.perf_counter()
+
+    @property
+    def ready(self) -> bool:
+        return self.status == "ready"
+
+    @contextmanager
+    def phase(self, status: str):
+        """Time one stage (loading, warming); a failure marks the model failed."""
+        self.status = status
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            self.status = "failed"
+            self.error = f"{status}: {e}"
+            raise
+        finally:
+            self.seconds[status] = round(time.perf_counter() - start, 2)
+
+    def mark_ready(self):
+        self.status = "ready"
+        self.ready_after_seconds = round(time.perf_counter() - self._created, 2)
+        logger.info(f"{self.name} ready after {self.ready_after_seconds}s ({self.seconds})")
+
+    def stats(self) -> dict:
+        return {
+            "status": self.status,
+            "load_seconds": self.seconds.get("loading"),
+            "warmup_seconds": self.seconds.get("warming"),
+            "ready_after_seconds": self.ready_after_seconds,
+            "error": self.error,
+        }
 
-    # Load legal embedding model (768-dim, fine-tuned on legal opinions)
-    legal_model_id = os.getenv("LEGAL_EMBED_MODEL_ID", "freelawproject/modernbert-embed-base_finetune_512")
-    logger.info(f"Loading legal embedding model: {legal_model_id}")
 
-    legal_embedder = SentenceTransformer(legal_model_id)
+model_states = {}
 
+
+def require_models(*names: str):
+    """Raise 503 unless every named model has finished loading and warming up."""
+    for name in names:
+        state = model_states.get(name)
+        if state is None or not state.ready:
+            status = state.status if state is not None else "pending"
+            headers = None if status == "failed" else {"Retry-After": "10"}
+            raise HTTPException(status_code=503, detail=f"Model '{name}' not ready ({status})", headers=headers)
+
+
+def _load_llama_instances(pool_size: int, threads_per_instance: int) -> List[PrefixCachingLlama]:
+    """Load the Phi-3.5 Mini GGUF pool instances."""
+    logger.info(f"Loading generation model: {GEN_MODEL_REPO}/{GEN_MODEL_FILE}")
+
+    # The GGUF weights are mmapped read-only, so every instance (and every
+    # gunicorn worker) shares one copy in the page cache
+    instances = [
+        PrefixCachingLlama.from_pretrained(
+            repo_id=GEN_MODEL_REPO,
+            filename=GEN_MODEL_FILE,
+            n_ctx=4096,
+            use_mmap=True,
+            n_threads=threads_per_instance,
+            logits_all=bool(SPECULATIVE_ENDPOINTS),
+            verbose=False
+        )
+        for _ in range(pool_size)
+    ]
+    if SPECULATIVE_ENDPOINTS:
+        for instance in instances:
+            instance.enable_lookup(
+                max_ngram_size=int(os.getenv("LLM_LOOKUP_NGRAM_SIZE", "2")),
+                num_pred_tokens=int(os.getenv("LLM_LOOKUP_NUM_PRED_TOKENS", "10")),
+            )
+        logger.info(f"Prompt-lookup speculative decoding enabled for: {', '.join(sorted(SPECULATIVE_ENDPOINTS))}")
+
+    logger.info(f"Generation model loaded (Phi-3.5 Mini GGUF, {pool_size} instance(s) x {threads_per_instance} threads)")
+    return instances
+
+
+def _warm_llama_instances(instances: List[PrefixCachingLlama]):
+    """Prefill the RAG system prompts (or run a one-token completion) on every instance."""
+    with ThreadPoolExecutor(max_workers=len(instances)) as prefill:
+        # Requests restore these prefix snapshots instead of re-evaluating the system prompt
+        if os.getenv("LLM_PREFIX_CACHE", "true").lower() == "true":
+            for key, system_prompt in RAG_SYSTEM_PROMPTS.items():
+                start = time.perf_counter()
+                n_prefix = list(prefill.map(lambda instance: instance.cache_prefix(key, system_prompt), instances))[0]
+                logger.info(f"Cached {key} prompt prefix: {n_prefix} tokens in {time.perf_counter() - start:.2f}s")
+        else:
+            list(prefill.map(lambda instance: instance.warm_up(), instances))
+
+
+def _load_product_embedder(model_id: str):
+    """Load the MiniLM tokenizer and model; returns (tokenizer, model)."""
+    logger.info(f"Loading product embedding model: {model_id}")
+    product_tokenizer = AutoTokenizer.from_pretrained(model_id)
+    model = AutoModel.from_pretrained(model_id)
+    model.eval()
+    logger.info("Product embedding model loaded (384-dim)")
+    return product_tokenizer, model
+
+
+def _load_legal_embedder(model_id: str) -> SentenceTransformer:
+    """Load the ModernBERT legal SentenceTransformer."""
+    logger.info(f"Loading legal embedding model: {model_id}")
+    model = SentenceTransformer(model_id)
     logger.info("Legal embedding model loaded (768-dim)")
+    return model
+
+
+async def load_generator():
+    """Load and warm the generation pool, then start serving from it."""
+    global llm, llm_pool
+    state = model_states["generator"]
+
+    # N instances split LLM_THREADS between them; llama.cpp mmaps the GGUF so
+    # the weights are shared and each extra instance mainly costs its KV cache
+    pool_size = max(1, int(os.getenv("LLM_POOL_SIZE", "1")))
+    threads_per_instance = max(1, int(os.getenv("LLM_THREADS", "4")) // pool_size)
+    with state.phase("loading"):
+        instances = await asyncio.to_thread(_load_llama_instances, pool_size, threads_per_instance)
+    with state.phase("warming"):
+        await asyncio.to_thread(_warm_llama_instances, instances)
+
+    llm = instances[0]
+    llm_pool = LlamaPool(
+        instances,
+        threads_per_instance,
+        max_queue=int(os.getenv("GEN_QUEUE_MAX", "8")),
+        max_queue_seconds=float(os.getenv("LLM_MAX_QUEUE_SECONDS", "30")),
+        aging_seconds=float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "10")),
+    )
+    llm_pool.start()
+    state.mark_ready()
 
-    # Test database connection
+
+async def load_product_embedder():
+    """Load the product embedder, pick its backend and warm it on the probe set."""
+    global tokenizer, embedder, product_onnx_embedder, product_backend
+    state = model_states["embedder"]
+    with state.phase("loading"):
+        tokenizer, embedder = preloaded_models.get("embedder") or await asyncio.to_thread(
+            _load_product_embedder, EMBED_MODEL_ID
+        )
+
+    # Optionally move to ONNX Runtime (fp32 or dynamic int8), keeping torch if
+    # the ONNX model does not match it; the probe batches double as warm-up.
+    # The backend is published afterwards so probes stay out of its stats.
+    with state.phase("warming"):
+        backend = EmbeddingBackend("product", os.getenv("EMBED_BACKEND", "torch").lower())
+        product_onnx_embedder = await asyncio.to_thread(
+            select_embedding_backend, backend, EMBED_MODEL_ID, get_embeddings, 512
+        )
+    product_backend = backend
+    state.mark_ready()
+
+
+async def load_legal_embedder():
+    """Load the legal embedder, pick its backend and warm it on the probe set."""
+    global legal_embedder, legal_backend
+    state = model_states["legal_embedder"]
+    with state.phase("loading"):
+        legal_embedder = preloaded_models.get("legal_embedder") or await asyncio.to_thread(
+            _load_legal_embedder, LEGAL_EMBED_MODEL_ID
+        )
+
+    with state.phase("warming"):
+        requested = os.getenv("LEGAL_EMBED_BACKEND", os.getenv("EMBED_BACKEND", "torch")).lower()
+        backend = EmbeddingBackend("legal", requested)
+        onnx_legal_embedder = await asyncio.to_thread(
+            select_embedding_backend, backend, LEGAL_EMBED_MODEL_ID, get_legal_embeddings
+        )
+        if onnx_legal_embedder is not None:
+            legal_embedder = onnx_legal_embedder
+    legal_backend = backend
+    state.mark_ready()
+
+
+async def load_models():
+    """Load all models concurrently; each endpoint opens once its own models are ready."""
+    loaders = {"generator": load_generator, "embedder": load_product_embedder, "legal_embedder": load_legal_embedder}
+    results = await asyncio.gather(*(load() for load in loaders.values()), return_exceptions=True)
+    for name, result in zip(loaders, results):
+        if isinstance(result, Exception):
+            logger.error(f"Failed to load {name}: {result}")
+
+
+# ============================================================
+# Shared Model Preload (multi-worker serving)
+# ============================================================
+#
+# Under gunicorn with preload_app (see gunicorn.conf.py) this module is
+# imported once in the master, which then forks the workers. With
+# PRELOAD_MODELS=true the master loads the embedders' torch weights at
+# import time, so the workers inherit the tensors copy-on-write, and
+# downloads the GGUF so the workers' llama.cpp instances mmap the same
+# page-cache pages. Nothing runs inference in the master: torch's OpenMP
+# pool, llama.cpp contexts and ONNX Runtime sessions are not fork-safe,
+# so Llama instances (and their KV caches), ONNX backends and warm-up are
+# created in each worker by load_models().
+
+PRELOAD_MODELS = os.getenv("PRELOAD_MODELS", "false").lower() == "true"
+
+preloaded_models = {}
+
+
+def preload_models():
+    """Load the shareable model weights into this (pre-fork) process."""
+    from huggingface_hub import hf_hub_download
+
+    start = time.perf_counter()
+    # One thread so loading never starts an OpenMP pool the workers would inherit
+    torch_threads = torch.get_num_threads()
+    torch.set_num_threads(1)
     try:
-        conn = get_db_connection()
-        conn.close()
-        logger.info("Database connection verified")
+        preloaded_models["embedder"] = _load_product_embedder(EMBED_MODEL_ID)
+        preloaded_models["legal_embedder"] = _load_legal_embedder(LEGAL_EMBED_MODEL_ID)
+    finally:
+        torch.set_num_threads(torch_threads)
+
+    gguf_path = hf_hub_download(repo_id=GEN_MODEL_REPO, filename=GEN_MODEL_FILE)
+    with open(gguf_path, "rb") as f:
+        os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_WILLNEED)
+    logger.info(f"Preloaded model weights for forked workers in {time.perf_counter() - start:.1f}s")
+
+
+def _smaps_rollup(pid: int) -> dict:
+    """Memory counters (bytes) for one process from /proc/<pid>/smaps_rollup."""
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 3 and parts[2] == "kB":
+                fields[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    return {
+        "rss": fields.get("Rss", 0),
+        "pss": fields.get("Pss", 0),
+        "shared": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "private": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _server_processes():
+    """(pid, role) for the gunicorn master and all its workers, or just this process."""
+    me, parent = os.getpid(), os.getppid()
+    try:
+        with open(f"/proc/{parent}/cmdline", "rb") as f:
+            under_gunicorn = b"gunicorn" in f.read()
+        if under_gunicorn:
+            with open(f"/proc/{parent}/task/{parent}/children") as f:
+                workers = sorted(int(pid) for pid in f.read().split())
+            return [(parent, "master")] + [(pid, "worker") for pid in workers]
+    except OSError:
+        pass
+    return [(me, "worker")]
+
+
+def _process_memory_bytes():
+    """[(pid, role, smaps counters)] for the server processes still running."""
+    usage = []
+    for pid, role in _server_processes():
+        try:
+            usage.append((pid, role, _smaps_rollup(pid)))
+        except OSError:
+            continue
+    return usage
+
+
+def process_memory() -> Optional[dict]:
+    """RSS / PSS / shared / private memory of every server process.
+
+    Shared weights show up in each worker's RSS but are split between
+    processes in PSS, so total_pss well below total_rss (and small
+    per-worker private memory) confirms the workers share the weights.
+    """
+    if not os.path.exists("/proc/self/smaps_rollup"):
+        return None
+    processes = [
+        {"pid": pid, "role": role, "self": pid == os.getpid(),
+         **{f"{k}_mb": round(v / 2**20, 1) for k, v in counters.items()}}
+        for pid, role, counters in _process_memory_bytes()
+    ]
+    return {
+        "processes": processes,
+        "total_rss_mb": round(sum(p["rss_mb"] for p in processes), 1),
+        "total_pss_mb": round(sum(p["pss_mb"] for p in processes), 1),
+    }
+
+
+if PRELOAD_MODELS:
+    preload_models()
+
+
+# ============================================================
+# App Lifespan
+# ============================================================
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Load models on startup."""
+    global db_pool, embedder_executor, legal_embedder_executor
+    global embedding_batcher, legal_embedding_batcher, query_embedding_cache
+    global rag_answer_cache, legal_answer_cache, search_router, memory_index
+
+    if os.getenv("TORCH_THREADS"):
+        torch.set_num_threads(int(os.getenv("TORCH_THREADS")))
+
+    # Models load in the background so the server (and /health) come up
+    # immediately; endpoints return 503 until the models they use are ready
+    model_states.clear()
+    model_states.update({name: ModelState(name) for name in ("generator", "embedder", "legal_embedder")})
+    model_loading = asyncio.create_task(load_models())
+
+    # One executor per embedder so inference never blocks the event loop;
+    # each has a bounded backlog and rejects with 429 when full
+    embedder_executor = ModelExecutor("embedder", max_queue=int(os.getenv("EMBED_QUEUE_MAX", "64")))
+    legal_embedder_executor = ModelExecutor("legal_embedder", max_queue=int(os.getenv("LEGAL_EMBED_QUEUE_MAX", "64")))
+
+    # Start query embedding micro-batchers
+    embedding_batcher = EmbeddingBatcher(
+        "product", get_embeddings, embedder_executor,
+        max_batch_size=int(os.getenv("EMBED_BATCH_MAX_SIZE", "32")),
+        max_wait_ms=float(os.getenv("EMBED_BATCH_MAX_WAIT_MS", "5")),
+        max_queue=int(os.getenv("EMBED_BATCH_MAX_QUEUE", "256")),
+    )
+    legal_embedding_batcher = EmbeddingBatcher(
+        "legal", get_legal_embeddings, legal_embedder_executor,
+        max_batch_size=int(os.getenv("LEGAL_EMBED_BATCH_MAX_SIZE", "16")),
+        max_wait_ms=float(os.getenv("LEGAL_EMBED_BATCH_MAX_WAIT_MS", "5")),
+        max_queue=int(os.getenv("LEGAL_EMBED_BATCH_MAX_QUEUE", "256")),
+    )
+    embedding_batcher.start()
+    legal_embedding_batcher.start()
+
+    # Query embedding cache, optionally warmed from the previous run
+    if int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "10000")) > 0:
+        query_embedding_cache = EmbeddingCache(
+            max_entries=int(os.getenv("EMBED_CACHE_MAX_ENTRIES", "10000")),
+            path=os.getenv("EMBED_CACHE_PATH") or None,
+        )
+        try:
+            query_embedding_cache.load()
+        except Exception as e:
+            logger.warning(f"Could not load query embedding cache: {e}")
+
+    # /rag reads ingested_records, which the ingestion worker writes, so its
+    # cache polls ingestion_jobs; /legal/ingest invalidates the legal cache in
+    # the worker that ran it, and the other workers see legal_ingest_jobs change
+    rag_answer_cache = _answer_cache("rag", version_fn=_ingestion_version)
+    legal_answer_cache = _answer_cache("legal_rag", version_fn=_legal_ingest_version)
+
+    # Create the shared connection pool (credentials are fetched once and cached)
+    db_pool = DatabasePool(
+        min_size=int(os.getenv("DB_POOL_MIN_SIZE", "2")),
+        max_size=int(os.getenv("DB_POOL_MAX_SIZE", "16")),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+        healthcheck_interval=float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30")),
+    )
+    try:
+        db_pool.open()
+        logger.info(f"Database connection pool ready (min={db_pool.min_size}, max={db_pool.max_size})")
     except Exception as e:
         logger.warning(f"Database not available: {e}")
 
+    # Filter-aware search routing; the first refresh runs in the background
+    search_router = SearchRouter(SEARCH_TABLES)
+    search_router.start()
+
+    # Exact in-process search for small tables and BM25 keyword ranking,
+    # loaded by one listener thread
+    if MEMORY_INDEX_ENABLED or KEYWORD_INDEX_ENABLED:
+        memory_index = MemoryVectorIndex(SEARCH_TABLES, vectors=MEMORY_INDEX_ENABLED, keywords=KEYWORD_INDEX_ENABLED)
+        memory_index.start()
+
+    # Metrics snapshots for the other workers' /metrics (see Metrics)
+    metrics_publisher = None
+    if METRICS_DIR is not None:
+        metrics_publisher = asyncio.create_task(_publish_metrics(METRICS_SNAPSHOT_SECONDS))
+
     yield
 
     logger.info("Shutting down...")
+    model_loading.cancel()
+    if metrics_publisher is not None:
+        metrics_publisher.cancel()
+        try:
+            os.remove(os.path.join(METRICS_DIR, f"{os.getpid()}.json"))
+        except OSError:
+            pass
+    search_router.stop()
+    if memory_index is not None:
+        memory_index.stop()
+    await embedding_batcher.stop()
+    await legal_embedding_batcher.stop()
+    if query_embedding_cache is not None:
+        try:
+            query_embedding_cache.save()
+        except Exception as e:
+            logger.warning(f"Could not save query embedding cache: {e}")
+    if llm_pool is not None:
+        llm_pool.shutdown()
+    for executor in (embedder_executor, legal_embedder_executor):
+        executor.shutdown()
+    db_pool.close()
 
 
 # ============================================================
@@ -325,45 +2791,103 @@ app = FastAPI(
     lifespan=lifespan,
     openapi_tags=tags_metadata
 )
+app.router.route_class = MetricsRoute
+app.add_middleware(MetricsMiddleware)
 
 
 # ============================================================
 # Core Endpoints
 # ============================================================
 
-@app.get("/health", tags=["Health & Info"], summary="Health check",
-    description="Returns service health status including model loading state, database connectivity, and legal document count.",
-    response_description="Health status object")
-async def health_check():
-    """Health check endpoint."""
+def _check_database():
+    """Return (db_status, legal_docs_count) for the health check."""
     db_status = "unknown"
     legal_docs_count = 0
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        db_status = "connected"
-        try:
-            cur.execute("SELECT COUNT(*) FROM legal_documents")
-            legal_docs_count = cur.fetchone()[0]
-        except:
-            pass
-        cur.close()
-        conn.close()
+        with get_db_cursor() as cur:
+            db_status = "connected"
+            try:
+                cur.execute("SELECT COUNT(*) FROM legal_documents")
+                legal_docs_count = cur.fetchone()[0]
+            except:
+                pass
     except:
         db_status = "disconnected"
+    return db_status, legal_docs_count
+
+
+@app.get("/health", tags=["Health & Info"], summary="Health check",
+    description="Returns service health status including model loading state, database connectivity, and legal document count.",
+    response_description="Health status object")
+async def health_check():
+    """Health check endpoint."""
+    db_status, legal_docs_count = await run_in_threadpool(_check_database)
+
+    if all(state.ready for state in model_states.values()):
+        status = "healthy"
+    elif any(state.status == "failed" for state in model_states.values()):
+        status = "degraded"
+    else:
+        status = "starting"
 
     return {
-        "status": "healthy",
+        "status": status,
+        "models": {name: state.stats() for name, state in model_states.items()},
         "generator_loaded": llm is not None,
         "generator_model": "Phi-3.5-mini-instruct-Q4_K_M",
-        "embedder_loaded": embedder is not None,
-        "legal_embedder_loaded": legal_embedder is not None,
+        "embedder_loaded": "embedder" in model_states and model_states["embedder"].ready,
+        "legal_embedder_loaded": "legal_embedder" in model_states and model_states["legal_embedder"].ready,
         "legal_embed_model": "freelawproject/modernbert-embed-base_finetune_512",
         "database": db_status,
+        "db_pool": db_pool.stats() if db_pool is not None else None,
+        "embedding_backends": {
+            b.name: b.stats() for b in (product_backend, legal_backend) if b is not None
+        },
+        "embedding_batchers": {
+            b.name: b.stats() for b in (embedding_batcher, legal_embedding_batcher) if b is not None
+        },
+        "prompt_prefix_cache": [i.prefix_cache_stats() for i in llm_pool.instances] if llm_pool is not None else None,
+        "query_embedding_cache": query_embedding_cache.stats() if query_embedding_cache is not None else None,
+        "answer_caches": {
+            c.name: c.stats() for c in (rag_answer_cache, legal_answer_cache) if c is not None
+        },
+        "model_queues": {
+            e.name: e.stats() for e in (llm_pool, embedder_executor, legal_embedder_executor) if e is not None
+        },
+        "memory": await run_in_threadpool(process_memory),
         "legal_documents_indexed": legal_docs_count
     }
 
 
+@app.get("/ready", tags=["Health & Info"], summary="Readiness check",
+    description="""Returns 200 once the given models (comma-separated; default all of them) are loaded and warmed up, 503 otherwise.
+
+Use `?models=embedder,legal_embedder` as a load balancer health check to route search traffic before the generator is ready.""",
+    response_description="Per-model readiness")
+async def readiness_check(models: Optional[str] = None):
+    """Readiness endpoint."""
+    names = [name.strip() for name in models.split(",") if name.strip()] if models else list(model_states)
+    unknown = [name for name in names if name not in model_states]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown models: {', '.join(unknown)}")
+    require_models(*names)
+    return {"ready": True, "models": {name: model_states[name].stats() for name in names}}
+
+
+@app.get("/metrics", tags=["Health & Info"], summary="Prometheus metrics",
+    description="""Prometheus text-format metrics for scraping.
+
+- `inference_stage_seconds{stage,endpoint,search_field}` — per-stage latency histograms: `credential_fetch`, `connection_checkout`, `query_embedding`, `document_embedding`, `sql`, `memory_search`, `keyword_search`, `prefill`, `decode`, `serialize`
+- `inference_decode_tokens_per_second{endpoint,search_field}` — LLM decode throughput per generation
+- `inference_request_seconds{endpoint,method,status}` — end-to-end request latency
+- `inference_search_path_total{table,path}` — vector searches by routing path (`exact`, `partial`, `global`, `memory`)
+- `inference_requests_in_flight`, `inference_model_queue_depth{model}`, `inference_embedding_batch_queue_depth{batcher}`, `inference_db_pool_connections{state}`, `inference_model_ready{model}` — gauges""",
+    response_class=PlainTextResponse)
+async def metrics():
+    """Metrics endpoint."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
+
+
 @app.get("/", tags=["Health & Info"], summary="Service info",
     description="Returns service name, version, and a directory of all available API endpoints.",
     response_description="Service metadata and endpoint directory")
@@ -375,17 +2899,23 @@ async def root():
         "endpoints": {
             "generate": "POST /generate",
             "embed": "POST /embed",
+            "embed_batch": "POST /embed/batch",
             "add_document": "POST /documents",
             "add_documents_batch": "POST /documents/batch",
             "search_documents": "POST /search",
             "search_ingested": "POST /search/records",
+            "search_ingested_batch": "POST /search/records/batch",
+            "search_routing": "GET /search/routing",
             "rag": "POST /rag",
             "ingestion_jobs": "GET /ingestion/jobs",
             "ingestion_stats": "GET /ingestion/stats",
             "ingestion_count": "GET /ingestion/records/count",
             "health": "GET /health",
+            "ready": "GET /ready",
+            "metrics": "GET /metrics",
             "legal_ingest": "POST /legal/ingest",
             "legal_search": "POST /legal/search",
+            "legal_search_batch": "POST /legal/search/batch",
             "legal_rag": "POST /legal/rag",
             "legal_document_count": "GET /legal/documents/count",
             "legal_document_get": "GET /legal/documents/{doc_id}"
@@ -406,25 +2936,52 @@ Used by the Java search service to delegate embedding generation to Python, ensu
     response_description="Embedding vector with dimensions and model info")
 async def generate_embedding(request: EmbedRequest):
     """Generate embedding vector for text."""
-    if embedder is None:
-        raise HTTPException(status_code=503, detail="Embedding model not loaded")
+    require_models("embedder")
 
     text = request.text.strip()
 
     try:
-        embedding = get_embedding(text)
+        embedding = await embed_query(text)
 
         return {
-            "embedding": embedding,
+            "embedding": embedding.tolist(),
             "dimensions": len(embedding),
             "model": os.getenv("EMBED_MODEL_ID", "sentence-transformers/all-MiniLM-L6-v2"),
             "note": "Product embedding model (384-dim). Legal endpoints use ModernBERT (768-dim)."
         }
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Embedding generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/embed/batch", tags=["Embeddings"], summary="Generate product embeddings for many texts",
+    description=f"""Generate 384-dimensional embeddings for up to {BATCH_QUERY_MAX} texts (`BATCH_QUERY_MAX`) in one call and one forward pass.
+
+Embeddings come back in the order of `texts`. Texts already in the query embedding cache are not re-encoded.""",
+    response_description="Embedding vectors, one per input text")
+async def generate_embeddings_batch(request: EmbedBatchRequest):
+    """Generate embedding vectors for several texts."""
+    require_models("embedder")
+    texts = _batch_queries(request.texts)
+
+    try:
+        embeddings = await embed_queries(texts)
+
+        return {
+            "embeddings": embeddings.tolist(),
+            "count": len(texts),
+            "dimensions": embeddings.shape[1],
+            "model": EMBED_MODEL_ID,
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch embedding generation error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 # ============================================================
 # Text Generation
 # ============================================================
@@ -433,18 +2990,38 @@ async def generate_embedding(request: EmbedRequest):
     summary="Generate text from prompt",
     description="""Generate text using Phi-3.5 Mini (3.8B params, GGUF Q4_K_M quantized).
 
-Uses chat completion format with the prompt as user message. Runs on CPU via llama-cpp-python with 16 threads.""",
+Uses chat completion format with the prompt as user message. Runs on CPU via llama-cpp-python; requests are scheduled across a pool of `LLM_POOL_SIZE` model instances, with RAG endpoints served ahead of `/generate`.
+
+Set `stream: true` to receive `token` server-sent events as they are generated, followed by a `done` event with the full text.""",
     response_description="Generated text and model identifier")
-async def generate_text(request: GenerateRequest):
+async def generate_text(request: GenerateRequest, http_request: Request):
     """Generate text from prompt."""
-    if llm is None:
-        raise HTTPException(status_code=503, detail="Model not loaded")
+    require_models("generator")
 
     try:
-        output = llm.create_chat_completion(
-            messages=[
-                {"role": "user", "content": request.prompt}
-            ],
+        messages = [
+            {"role": "user", "content": request.prompt}
+        ]
+
+        if request.stream:
+            token_stream = TokenStream("generate", messages=messages, max_tokens=request.max_new_tokens,
+                                       temperature=request.temperature)
+
+            async def events():
+                parts = []
+                async for event in token_stream.sse_tokens(parts):
+                    yield event
+                if token_stream.error is None:
+                    yield sse_event("done", {"generated_text": "".join(parts),
+                                             "model": "Phi-3.5-mini-instruct-Q4_K_M",
+                                             "generation": token_stream.generation})
+
+            return sse_response(events())
+
+        output, generation = await run_generation(
+            "generate",
+            request=http_request,
+            messages=messages,
             max_tokens=request.max_new_tokens,
             temperature=request.temperature,
         )
@@ -453,8 +3030,11 @@ async def generate_text(request: GenerateRequest):
 
         return GenerateResponse(
             generated_text=generated_text,
-            model="Phi-3.5-mini-instruct-Q4_K_M"
+            model="Phi-3.5-mini-instruct-Q4_K_M",
+            generation=generation
         )
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Generation error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -469,67 +3049,96 @@ async def generate_text(request: GenerateRequest):
     response_description="Created document ID")
 async def add_document(request: DocumentRequest):
     """Add a document with its embedding to the database."""
-    if embedder is None:
-        raise HTTPException(status_code=503, detail="Embedding model not loaded")
+    require_models("embedder")
 
     try:
-        embedding = get_embedding(request.content)
-
-        conn = get_db_connection()
-        cur = conn.cursor()
+        embedding = await embed_document(request.content)
 
-        cur.execute(
+        row = await db_fetchone(
             """
             INSERT INTO documents (content, metadata, embedding)
             VALUES (%s, %s, %s)
             RETURNING id
             """,
-            (request.content, json.dumps(request.metadata), embedding)
+            (request.content, json.dumps(request.metadata), embedding),
+            commit=True
         )
-
-        doc_id = cur.fetchone()[0]
-        conn.commit()
-        cur.close()
-        conn.close()
+        doc_id = row[0]
 
         return {"id": doc_id, "message": "Document added successfully"}
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding document: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/documents/batch", tags=["Document Management"], summary="Add documents in batch",
-    description="Add multiple documents at once. Each document is embedded individually.",
-    response_description="List of created document IDs")
+    description="""Add multiple documents at once.
+
+Documents are sorted by length and embedded in padded batches of `DOCUMENT_EMBED_BATCH_SIZE`, then binary-COPYed into a staging table and inserted with one `INSERT ... RETURNING`. IDs are returned in input order, along with per-stage timings.""",
+    response_description="List of created document IDs (in input order) and per-stage timings")
 async def add_documents_batch(documents: List[DocumentRequest]):
     """Add multiple documents at once."""
-    if embedder is None:
-        raise HTTPException(status_code=503, detail="Embedding model not loaded")
+    require_models("embedder")
+    if not documents:
+        return {"ids": [], "message": "0 documents added successfully", "timings_ms": {}}
 
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        doc_ids = []
-        for doc in documents:
-            embedding = get_embedding(doc.content)
-            cur.execute(
-                """
-                INSERT INTO documents (content, metadata, embedding)
-                VALUES (%s, %s, %s)
-                RETURNING id
-                """,
-                (doc.content, json.dumps(doc.metadata), embedding)
+        start = time.perf_counter()
+
+        # Embed longest-first so each padded batch holds similar lengths;
+        # each batch is a separate executor job so queries can interleave
+        batch_size = int(os.getenv("DOCUMENT_EMBED_BATCH_SIZE", "32"))
+        order = sorted(range(len(documents)), key=lambda i: len(documents[i].content), reverse=True)
+        embeddings = [None] * len(documents)
+        for b in range(0, len(order), batch_size):
+            batch = order[b:b + batch_size]
+            vectors = await embedder_executor.run(get_embeddings, [documents[i].content for i in batch])
+            for i, vector in zip(batch, vectors):
+                embeddings[i] = vector
+        embedded = time.perf_counter()
+
+        def insert_documents():
+            # Each staged row draws its id from the documents sequence as it is
+            # copied in, so the ids map back to input order through ord
+            rows = (
+                (ord_, doc.content, doc.metadata, embedding)
+                for ord_, (doc, embedding) in enumerate(zip(documents, embeddings))
             )
-            doc_ids.append(cur.fetchone()[0])
-
-        conn.commit()
-        cur.close()
-        conn.close()
+            with get_db_cursor(commit=True) as cur:
+                cur.execute("""
+                    CREATE TEMP TABLE documents_staging (
+                        id int DEFAULT nextval(pg_get_serial_sequence('documents', 'id')),
+                        ord int, content text, metadata jsonb, embedding vector
+                    ) ON COMMIT DROP
+                """)
+                copy_binary(cur, "documents_staging", ["ord", "content", "metadata", "embedding"],
+                            ["int4", "text", "jsonb", "vector"], rows)
+                cur.execute("""
+                    INSERT INTO documents (id, content, metadata, embedding)
+                    SELECT id, content, metadata, embedding FROM documents_staging
+                """)
+                cur.execute("SELECT id FROM documents_staging ORDER BY ord")
+                return [row[0] for row in cur.fetchall()]
+
+        doc_ids = await run_in_threadpool(insert_documents)
+        inserted = time.perf_counter()
 
-        return {"ids": doc_ids, "message": f"{len(doc_ids)} documents added successfully"}
+        return {
+            "ids": doc_ids,
+            "message": f"{len(doc_ids)} documents added successfully",
+            "timings_ms": {
+                "embed": round((embedded - start) * 1000, 1),
+                "insert": round((inserted - embedded) * 1000, 1),
+                "total": round((inserted - start) * 1000, 1),
+            },
+            "embed_batches": (len(documents) + batch_size - 1) // batch_size,
+        }
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error adding documents: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -538,15 +3147,12 @@ async def add_documents_batch(documents: List[DocumentRequest]):
 @app.get("/documents/count", tags=["Document Management"], summary="Get document count",
     description="Returns the total number of documents in the vector store.",
     response_description="Document count")
-async def get_document_count():
+def get_document_count():
     """Get the total number of documents."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM documents")
-        count = cur.fetchone()[0]
-        cur.close()
-        conn.close()
+        with get_db_cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM documents")
+            count = cur.fetchone()[0]
         return {"count": count}
     except Exception as e:
         logger.error(f"Error getting count: {e}")
@@ -556,16 +3162,12 @@ async def get_document_count():
 @app.delete("/documents/{doc_id}", tags=["Document Management"], summary="Delete a document",
     description="Delete a document by its ID. Returns 404 if document does not exist.",
     response_description="Deletion confirmation")
-async def delete_document(doc_id: int):
+def delete_document(doc_id: int):
     """Delete a document by ID."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("DELETE FROM documents WHERE id = %s RETURNING id", (doc_id,))
-        deleted = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
+        with get_db_cursor(commit=True) as cur:
+            cur.execute("DELETE FROM documents WHERE id = %s RETURNING id", (doc_id,))
+            deleted = cur.fetchone()
 
         if deleted is None:
             raise HTTPException(status_code=404, detail="Document not found")
@@ -588,16 +3190,12 @@ async def delete_document(doc_id: int):
     response_description="Ranked list of matching documents with similarity scores")
 async def search_documents(request: SearchRequest):
     """Search for similar documents."""
-    if embedder is None:
-        raise HTTPException(status_code=503, detail="Embedding model not loaded")
+    require_models("embedder")
 
     try:
-        query_embedding = get_embedding(request.query)
+        query_embedding = await embed_query(request.query)
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute(
+        results = await db_fetchall(
             """
             SELECT
                 id,
@@ -609,13 +3207,10 @@ async def search_documents(request: SearchRequest):
             ORDER BY embedding <=> %s::vector
             LIMIT %s
             """,
-            (query_embedding, query_embedding, request.top_k)
+            (query_embedding, query_embedding, request.top_k),
+            cursor_factory=RealDictCursor
         )
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
-
         return [
             SearchResult(
                 id=r['id'],
@@ -626,11 +3221,74 @@ async def search_documents(request: SearchRequest):
             for r in results
         ]
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# ============================================================
+# Search Result Projection
+# ============================================================
+#
+# Search endpoints take an optional `fields` list. Only the table columns
+# behind those fields go in the SQL select list (raw_data JSONB and
+# content snippets are the bulk of a row), results are built as plain
+# dicts instead of response models, and FastJSONResponse encodes them
+# with orjson. response_model stays on the routes for the OpenAPI schema.
+
+# Result field -> SQL expression; {t} is the table alias prefix ("d." or "")
+INGESTED_RESULT_COLUMNS = {
+    "id": "{t}id", "title": "{t}title", "description": "{t}description",
+    "category": "{t}category", "tags": "{t}tags", "raw_data": "{t}raw_data",
+}
+LEGAL_RESULT_COLUMNS = {
+    "id": "{t}id", "doc_id": "{t}doc_id", "doc_type": "{t}doc_type", "title": "{t}title",
+    "citation": "{t}citation", "jurisdiction": "{t}jurisdiction", "court": "{t}court",
+    "practice_area": "{t}practice_area", "status": "{t}status", "content_snippet": "LEFT({t}content, 300)",
+}
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(Response):
+    """JSON response encoded with orjson (numpy arrays and Decimals included)."""
+
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, default=_json_default, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def result_fields(requested: Optional[List[str]], model) -> List[str]:
+    """Validate a `fields` projection against a result model; None selects every field.
+
+    Returns the fields in the model's declaration order.
+    """
+    if requested is None:
+        return list(model.model_fields)
+    unknown = sorted(set(requested) - set(model.model_fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields {unknown}; expected {list(model.model_fields)}")
+    return [field for field in model.model_fields if field in requested]
+
+
+def projected_columns(fields: List[str], columns: Dict[str, str]) -> List[str]:
+    """Result fields that are table columns; id always, since fusion and batching join on it."""
+    return ["id"] + [field for field in fields if field in columns and field != "id"]
+
+
+def select_list(fields: List[str], columns: Dict[str, str], alias: str = "") -> str:
+    """SQL select list for the projected columns of fields."""
+    prefix = f"{alias}." if alias else ""
+    return ", ".join(f"{columns[field].format(t=prefix)} AS {field}" for field in projected_columns(fields, columns))
+
+
 # ============================================================
 # RAG (Retrieval-Augmented Generation)
 # ============================================================
@@ -641,152 +3299,1405 @@ async def search_documents(request: SearchRequest):
 
 1. Embeds the query using all-MiniLM-L6-v2 (384-dim)
 2. Retrieves the top-k most similar products from ingested_records
-3. Generates an answer using Phi-3.5 Mini with the retrieved products as context""",
+3. Packs the products, in rank order, into a `RAG_CONTEXT_TOKENS` prompt budget (cutting the last one at a sentence boundary) and generates an answer with Phi-3.5 Mini; `context` reports the tokens used per source
+
+Set `stream: true` to receive a `sources` server-sent event first, then `token` events as the answer is generated, then a `done` event.
+
+Answers are cached by query embedding: a near-identical question (cosine similarity above `ANSWER_CACHE_THRESHOLD`) with the same `top_k`, `max_new_tokens` and `fields` is answered from cache with `cached: true`.
+
+Set `fields` to return only some source fields, e.g. `["id", "title", "similarity"]`; the product JSON (`raw_data`) is then not fetched at all.""",
     response_description="Generated answer with source product records")
-async def rag_query(request: RAGRequest):
+async def rag_query(request: RAGRequest, http_request: Request):
     """RAG: Retrieve from ingested products and generate answer."""
-    if llm is None or embedder is None:
-        raise HTTPException(status_code=503, detail="Models not loaded")
+    require_models("generator", "embedder")
+    fields = result_fields(request.fields, IngestedSearchResult)
 
     try:
         # Step 1: Retrieve from ingested_records (not documents)
-        query_embedding = get_embedding(request.query)
+        query_embedding = await embed_query(request.query)
+
+        # Near-identical questions with the same parameters reuse a cached answer
+        cache_filters = (request.top_k, request.max_new_tokens, tuple(fields))
+        cached = None
+        if rag_answer_cache is not None:
+            await rag_answer_cache.check_version()
+            cached = rag_answer_cache.lookup(query_embedding, cache_filters)
+        if cached is not None:
+            if request.stream:
+                async def cached_events():
+                    yield sse_event("sources", cached["sources"])
+                    yield sse_event("token", {"text": cached["answer"]})
+                    yield sse_event("done", {"answer": cached["answer"], "generation": None, "cached": True})
+
+                return sse_response(cached_events())
+            return FastJSONResponse({**cached, "generation": None, "context": None, "cached": True})
+
+        # Titles and descriptions feed the prompt whether or not they are returned
+        search = IngestedSearchOptions(top_k=request.top_k, fields=fields + ["title", "description"])
+        groups, _, _ = await ingested_search_rows(search, [query_embedding])
+        results = groups[0]
+
+        search_results = [_ingested_result(r, None, fields) for r in results]
+
+        # Step 2: Pack product titles + descriptions into the context token budget
+        context, context_stats = await run_in_threadpool(
+            pack_context, [(f"{r['title'] or 'Untitled'}: ", r["description"] or "") for r in results]
+        )
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        # Step 3: Generate answer using Phi-3.5 Mini
+        messages = [
+            {"role": "system", "content": PRODUCT_RAG_SYSTEM_PROMPT},
+            {"role": "user", "content": f"Products:\n{context}\n\nQuestion: {request.query}"}
+        ]
 
-        cur.execute(
-            """
-            SELECT id, title, description, category, tags, raw_data,
-                   1 - (content_embedding <=> %s::vector) as similarity
-            FROM ingested_records
-            WHERE status = 'active'
-              AND content_embedding IS NOT NULL
-            ORDER BY content_embedding <=> %s::vector
-            LIMIT %s
-            """,
-            (query_embedding, query_embedding, request.top_k)
+        if request.stream:
+            token_stream = TokenStream("rag", prefix_key="product_rag", messages=messages,
+                                       max_tokens=request.max_new_tokens, temperature=0.7)
+
+            async def events():
+                yield sse_event("sources", search_results)
+                parts = []
+                async for event in token_stream.sse_tokens(parts):
+                    yield event
+                if token_stream.error is None:
+                    answer = "".join(parts)
+                    yield sse_event("done", {"answer": answer, "generation": token_stream.generation,
+                                             "context": context_stats, "cached": False})
+                    if rag_answer_cache is not None:
+                        rag_answer_cache.store(query_embedding, cache_filters, {
+                            "answer": answer, "sources": search_results,
+                        })
+
+            return sse_response(events())
+
+        output, generation = await run_generation(
+            "rag",
+            prefix_key="product_rag",
+            request=http_request,
+            messages=messages,
+            max_tokens=request.max_new_tokens,
+            temperature=0.7,
         )
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
+        answer = output["choices"][0]["message"]["content"]
 
-        search_results = [
-            IngestedSearchResult(
-                id=r['id'],
-                title=r['title'],
-                description=r['description'],
-                category=r['category'],
-                tags=r['tags'],
-                raw_data=r['raw_data'] or {},
-                similarity=float(r['similarity'])
-            )
-            for r in results
-        ]
+        if rag_answer_cache is not None:
+            rag_answer_cache.store(query_embedding, cache_filters, {
+                "answer": answer, "sources": search_results,
+            })
 
-        # Step 2: Build context from product titles + descriptions
-        context_parts = []
-        for i, result in enumerate(search_results, 1):
-            title = result.title or "Untitled"
-            desc = result.description or ""
-            context_parts.append(f"[{i}] {title}: {desc}")
+        return FastJSONResponse({
+            "answer": answer,
+            "sources": search_results,
+            "generation": generation,
+            "context": context_stats,
+            "cached": False,
+        })
 
-        context = "\n\n".join(context_parts)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"RAG error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        # Step 3: Generate answer using Phi-3.5 Mini
-        output = llm.create_chat_completion(
-            messages=[
-                {"role": "system", "content": "You are a helpful product search assistant. Answer questions based only on the provided product information. Be concise."},
-                {"role": "user", "content": f"Products:\n{context}\n\nQuestion: {request.query}"}
-            ],
-            max_tokens=request.max_new_tokens,
-            temperature=0.7,
+
+# ============================================================
+# Half-Precision Vector Indexes
+# ============================================================
+#
+# With LEGAL_VECTOR_PRECISION=half, legal_documents is searched through
+# HNSW indexes on halfvec casts of its embedding columns, e.g.
+# USING hnsw ((content_embedding::halfvec(768)) halfvec_cosine_ops),
+# which are half the size of the vector(768) indexes (migrate_halfvec.py
+# builds them next to the existing ones). The columns stay float32: each
+# index scan fetches HALFVEC_RESCORE_FACTOR times the rows it needs, and
+# those are re-ranked by their full-precision distance, so rounding only
+# decides which rows get re-scored. Needs pgvector >= 0.7.0.
+
+LEGAL_VECTOR_PRECISION_HALF = os.getenv("LEGAL_VECTOR_PRECISION", "full").lower() == "half"
+HALFVEC_RESCORE_FACTOR = max(1, int(os.getenv("HALFVEC_RESCORE_FACTOR", "4")))
+
+HALFVEC_TABLES = {"legal_documents": 768} if LEGAL_VECTOR_PRECISION_HALF else {}   # table -> dimensions
+
+
+def vector_precision(table: str) -> str:
+    return "half" if table in HALFVEC_TABLES else "full"
+
+
+def hnsw_index_key(table: str, column: str) -> str:
+    """The key and operator class of column's HNSW index on table."""
+    dims = HALFVEC_TABLES.get(table)
+    if dims:
+        return f"({column}::halfvec({dims})) halfvec_cosine_ops"
+    return f"{column} vector_cosine_ops"
+
+
+def nearest_sql(table: str, column: str, select_columns: str, filter_clause: str, limit) -> str:
+    """SELECT of the `limit` rows nearest %(query_vec)s on column, with their exact `distance`.
+
+    The ORDER BY matches column's HNSW index. For a halfvec table the
+    index scan returns HALFVEC_RESCORE_FACTOR times as many rows, which
+    are re-ranked by full-precision distance before the limit. Rows are
+    ordered by distance only in the halfvec form; order by it outside.
+    """
+    scan = f"""
+        SELECT {select_columns}, {column} <=> %(query_vec)s::vector AS distance
+        FROM {table}
+        WHERE {filter_clause}
+          AND {column} IS NOT NULL"""
+    dims = HALFVEC_TABLES.get(table)
+    if not dims:
+        return f"{scan}\n        ORDER BY {column} <=> %(query_vec)s::vector\n        LIMIT {limit}"
+    return f"""
+        SELECT * FROM ({scan}
+            ORDER BY {column}::halfvec({dims}) <=> %(query_vec)s::halfvec({dims})
+            LIMIT {HALFVEC_RESCORE_FACTOR} * {limit}
+        ) rescored
+        ORDER BY distance
+        LIMIT {limit}"""
+
+
+def candidate_limit(table: str, limit: int) -> int:
+    """Rows an index scan on table must yield for `limit` results (for ef_search)."""
+    return limit * HALFVEC_RESCORE_FACTOR if table in HALFVEC_TABLES else limit
+
+
+# ============================================================
+# Multi-Vector Fused Search
+# ============================================================
+
+MULTI_VECTOR_FUSIONS = ("rrf", "score")
+MULTI_VECTOR_RRF_K = int(os.getenv("MULTI_VECTOR_RRF_K", "60"))
+
+
+def _multi_vector_weights(requested: Optional[Dict[str, float]], fields: Dict[str, str]) -> Dict[str, float]:
+    """Validate per-request field weights; default is every field at 1.0."""
+    if requested is None:
+        return {field: 1.0 for field in fields}
+    unknown = sorted(set(requested) - set(fields))
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown field_weights {unknown}; expected {sorted(fields)}")
+    if any(w < 0 for w in requested.values()):
+        raise HTTPException(status_code=400, detail="field_weights must be non-negative")
+    weights = {field: float(w) for field, w in requested.items() if w > 0}
+    if not weights:
+        raise HTTPException(status_code=400, detail="field_weights must give at least one field a positive weight")
+    return weights
+
+
+def multi_vector_search_sql(table: str, select_columns: str, fields: Dict[str, str], weights: Dict[str, float],
+                            filter_clause: str, fusion: str, candidates: int):
+    """One statement that searches several vector columns and fuses the results.
+
+    Each weighted field gets a CTE ordered by its own distance and limited
+    to `candidates`, so it runs as a bounded scan on that column's HNSW
+    index (see nearest_sql). The union of candidates is then scored
+    either by weighted RRF over the per-field ranks or by the weighted
+    mean of exact cosine similarities for every searched field.
+
+    Returns (sql, params); the caller adds query_vec and top_k, and should
+    route the search with limit=candidates so ef_search covers each scan.
+    """
+    if fusion not in MULTI_VECTOR_FUSIONS:
+        raise HTTPException(status_code=400, detail=f"fusion must be one of {MULTI_VECTOR_FUSIONS}")
+
+    ctes = []
+    for field in weights:
+        col = fields[field]
+        ctes.append(f"""
+            c_{field} AS (
+                SELECT id, ROW_NUMBER() OVER (ORDER BY distance) AS rank
+                FROM ({nearest_sql(table, col, "id", filter_clause, "%(candidates)s")}
+                ) nearest
+            )""")
+    union = " UNION ".join(f"SELECT id FROM c_{field}" for field in weights)
+    similarities = ",\n".join(
+        f"                1 - (d.{fields[field]} <=> %(query_vec)s::vector) AS {field}_similarity" for field in weights
+    )
+    joins = "\n".join(f"            LEFT JOIN c_{field} ON c_{field}.id = d.id" for field in weights)
+    if fusion == "rrf":
+        fused = " + ".join(f"COALESCE(%(w_{field})s / (%(rrf_k)s + c_{field}.rank), 0)" for field in weights)
+    else:
+        fused = "(" + " + ".join(
+            f"%(w_{field})s * COALESCE(1 - (d.{fields[field]} <=> %(query_vec)s::vector), 0)" for field in weights
+        ) + f") / {sum(weights.values())}"
+
+    sql = f"""
+        WITH {",".join(ctes)},
+        candidates AS ({union})
+        SELECT {select_columns},
+{similarities},
+               {fused} AS similarity,
+               'multi' AS search_method
+        FROM candidates x
+        JOIN {table} d ON d.id = x.id
+{joins}
+        ORDER BY {SEARCH_RANK_ORDER}
+        LIMIT %(top_k)s
+    """
+    params = {"candidates": candidates, "rrf_k": MULTI_VECTOR_RRF_K}
+    params.update({f"w_{field}": weight for field, weight in weights.items()})
+    return sql, params
+
+
+def _field_scores(row: dict, weights: Dict[str, float]) -> Dict[str, float]:
+    return {
+        field: round(float(row[f"{field}_similarity"]), 6)
+        for field in weights if row.get(f"{field}_similarity") is not None
+    }
+
+
+# ============================================================
+# Filter-Aware Search Routing
+# ============================================================
+#
+# A filtered search on the global HNSW index scans ef_search candidates
+# and filters them afterwards, so a selective filter either returns too
+# few rows or needs a much larger scan. SearchRouter picks a path for
+# each filtered query from cached per-value row counts:
+#
+#   exact    the filtered set is at most EXACT_SEARCH_MAX_ROWS rows, so
+#            index scans are disabled and the matching rows are scored
+#            exactly (the filter columns' B-tree indexes still apply)
+#   partial  a partial HNSW index (WHERE column = value) covers one of the
+#            query's filters for every searched vector column; the most
+#            selective one is used and ef_search covers any extra filters
+#   global   the global HNSW index, with ef_search raised to
+#            limit / selectivity so post-filtering still leaves enough rows
+#            (unfiltered searches get ef_search >= limit for the same reason)
+#
+# Filtered queries are counted per (vector column, filter value); every
+# PARTIAL_INDEX_REFRESH_SECONDS the router refreshes its row counts and,
+# if PARTIAL_INDEX_AUTO_CREATE is on, builds one partial HNSW index
+# (CREATE INDEX CONCURRENTLY) for the most-used value that has none.
+# Partial indexes are named idx_partial_* and described by a JSON
+# comment (including their vector precision, see HALFVEC_TABLES), so
+# every worker rediscovers them.
+
+EXACT_SEARCH_MAX_ROWS = int(os.getenv("EXACT_SEARCH_MAX_ROWS", "2000"))
+SEARCH_EF_SEARCH_MAX = int(os.getenv("SEARCH_EF_SEARCH_MAX", "1000"))
+PARTIAL_INDEX_AUTO_CREATE = os.getenv("PARTIAL_INDEX_AUTO_CREATE", "true").lower() == "true"
+PARTIAL_INDEX_MIN_QUERIES = int(os.getenv("PARTIAL_INDEX_MIN_QUERIES", "50"))
+PARTIAL_INDEX_MAX = int(os.getenv("PARTIAL_INDEX_MAX", "16"))
+PARTIAL_INDEX_MAX_FRACTION = float(os.getenv("PARTIAL_INDEX_MAX_FRACTION", "0.5"))
+PARTIAL_INDEX_REFRESH_SECONDS = float(os.getenv("PARTIAL_INDEX_REFRESH_SECONDS", "300"))
+HNSW_DEFAULT_EF_SEARCH = 40
+
+SEARCH_TABLES = {
+    "legal_documents": {
+        "vectors": ("content_embedding", "title_embedding", "headnote_embedding"),
+        "filters": ("jurisdiction", "doc_type", "practice_area", "status"),
+    },
+    "ingested_records": {
+        "vectors": ("content_embedding", "title_embedding"),
+        "filters": ("category", "status"),
+    },
+}
+
+
+class SearchRoute:
+    """The path chosen for one search and the SET LOCAL statements that select it."""
+
+    def __init__(self, path: str, setup: str = "", indexes=(), estimated_rows: Optional[int] = None,
+                 ef_search: Optional[int] = None):
+        self.path = path
+        self.setup = setup
+        self.indexes = list(indexes)
+        self.estimated_rows = estimated_rows
+        self.ef_search = ef_search
+
+    @property
+    def header(self) -> str:
+        """X-Search-Path value, e.g. 'partial; index=idx_partial_...; rows=420'."""
+        parts = [self.path]
+        if self.indexes:
+            parts.append(f"index={','.join(self.indexes)}")
+        if self.estimated_rows is not None:
+            parts.append(f"rows={self.estimated_rows}")
+        if self.ef_search is not None:
+            parts.append(f"ef_search={self.ef_search}")
+        return "; ".join(parts)
+
+
+def _global_route(limit: int, selectivity: float = 1.0, estimated_rows: Optional[int] = None) -> SearchRoute:
+    """Global HNSW index; an HNSW scan yields at most ef_search rows, so size it to limit / selectivity."""
+    ef = min(SEARCH_EF_SEARCH_MAX, max(HNSW_DEFAULT_EF_SEARCH, math.ceil(limit / max(selectivity, 1e-9))))
+    if ef <= HNSW_DEFAULT_EF_SEARCH:
+        return SearchRoute("global", estimated_rows=estimated_rows)
+    return SearchRoute("global", f"SET LOCAL hnsw.ef_search = {ef};\n", estimated_rows=estimated_rows, ef_search=ef)
+
+
+class SearchRouter:
+    """Routes filtered vector searches and manages partial HNSW indexes (see above)."""
+
+    def __init__(self, tables: dict):
+        self.tables = tables
+        self._lock = threading.Lock()
+        self.row_counts = {}       # table -> rows
+        self.value_counts = {}     # (table, column, value) -> rows
+        self.partial_indexes = {}  # (table, vector_column, column, value) -> index name
+        self.usage = Counter()     # (table, vector_column, column, value) -> filtered queries
+        self.paths = Counter()     # (table, path) -> queries
+        self.refreshed_at = None
+        self.indexes_created = 0
+        self.index_failures = 0
+        self._task = None
+
+    def route(self, table: str, vector_columns, predicates, limit: int) -> SearchRoute:
+        """Choose the path for a search of vector_columns under predicates.
+
+        predicates are (column, op, value) with op '=' or '!='; limit is
+        the number of nearest neighbours each index scan must yield.
+        """
+        route = self._choose(table, vector_columns, predicates, limit)
+        with self._lock:
+            for column, op, value in predicates:
+                if op == "=":
+                    for vector_column in vector_columns:
+                        self.usage[(table, vector_column, column, value)] += 1
+            self.paths[(table, route.path)] += 1
+        return route
+
+    def count_path(self, table: str, path: str):
+        """Count a search that was served without a route (the in-memory index)."""
+        with self._lock:
+            self.paths[(table, path)] += 1
+
+    def _choose(self, table, vector_columns, predicates, limit) -> SearchRoute:
+        total = self.row_counts.get(table)
+        if not predicates or not total:
+            return _global_route(limit)
+
+        def rows(column, value):
+            return self.value_counts.get((table, column, value), 0)
+
+        selectivity = 1.0
+        for column, op, value in predicates:
+            share = rows(column, value) / total
+            selectivity *= share if op == "=" else 1 - share
+        estimated = int(total * selectivity)
+
+        if estimated <= EXACT_SEARCH_MAX_ROWS:
+            return SearchRoute("exact", "SET LOCAL enable_indexscan = off;\n", estimated_rows=estimated)
+
+        # Most selective partial index per vector column; all must have one
+        chosen = []
+        for vector_column in vector_columns:
+            covering = [
+                (rows(column, value), self.partial_indexes[(table, vector_column, column, value)])
+                for column, op, value in predicates
+                if op == "=" and (table, vector_column, column, value) in self.partial_indexes
+            ]
+            if not covering:
+                break
+            chosen.append(min(covering))
+        if chosen and len(chosen) == len(vector_columns):
+            # Within the partial index only the remaining filters still discard rows
+            indexed_rows = max(n for n, _ in chosen)
+            ef = min(SEARCH_EF_SEARCH_MAX, max(HNSW_DEFAULT_EF_SEARCH, math.ceil(limit * indexed_rows / max(estimated, 1))))
+            setup = f"SET LOCAL hnsw.ef_search = {ef};\n" if ef > HNSW_DEFAULT_EF_SEARCH else ""
+            return SearchRoute("partial", setup, [name for _, name in chosen], estimated,
+                               ef if setup else None)
+
+        return _global_route(limit, selectivity, estimated)
+
+    # -- background maintenance ------------------------------------------
+
+    def refresh(self):
+        """Reload row counts and partial indexes, then build at most one new index."""
+        self._refresh_counts()
+        self._load_partial_indexes()
+        self.refreshed_at = time.time()
+        if PARTIAL_INDEX_AUTO_CREATE:
+            candidate = self._next_index_candidate()
+            if candidate is not None:
+                self._create_partial_index(*candidate)
+                self._load_partial_indexes()
+
+    def _refresh_counts(self):
+        row_counts, value_counts = {}, {}
+        with get_db_cursor() as cur:
+            for table, spec in self.tables.items():
+                cur.execute(psql.SQL("SELECT count(*) FROM {}").format(psql.Identifier(table)))
+                row_counts[table] = cur.fetchone()[0]
+                for column in spec["filters"]:
+                    cur.execute(psql.SQL("SELECT {col}, count(*) FROM {table} WHERE {col} IS NOT NULL GROUP BY {col}").format(
+                        col=psql.Identifier(column), table=psql.Identifier(table)))
+                    for value, count in cur.fetchall():
+                        value_counts[(table, column, value)] = count
+        with self._lock:
+            self.row_counts, self.value_counts = row_counts, value_counts
+
+    def _load_partial_indexes(self):
+        rows = _db_query("""
+            SELECT c.relname, obj_description(c.oid, 'pg_class')
+            FROM pg_class c
+            JOIN pg_index i ON i.indexrelid = c.oid
+            WHERE c.relname LIKE 'idx\\_partial\\_%' AND i.indisvalid
+        """)
+        indexes = {}
+        for name, comment in rows:
+            try:
+                meta = json.loads(comment)
+                # Built for the other LEGAL_VECTOR_PRECISION; the planner would not use it
+                if meta.get("precision", "full") != vector_precision(meta["table"]):
+                    continue
+                indexes[(meta["table"], meta["vector_column"], meta["column"], meta["value"])] = name
+            except (TypeError, ValueError, KeyError):
+                logger.warning(f"Ignoring partial index {name} without a valid description comment")
+        with self._lock:
+            self.partial_indexes = indexes
+
+    def _next_index_candidate(self):
+        """Most-used (table, vector_column, column, value) worth a partial index, if any."""
+        with self._lock:
+            if len(self.partial_indexes) >= PARTIAL_INDEX_MAX:
+                return None
+            for key, queries in self.usage.most_common():
+                if queries < PARTIAL_INDEX_MIN_QUERIES:
+                    return None
+                table, _, column, value = key
+                rows = self.value_counts.get((table, column, value), 0)
+                # Small sets use exact search; large ones gain little over the global index
+                if key in self.partial_indexes or rows <= EXACT_SEARCH_MAX_ROWS:
+                    continue
+                if rows > PARTIAL_INDEX_MAX_FRACTION * self.row_counts.get(table, 0):
+                    continue
+                return key
+        return None
+
+    def _create_partial_index(self, table, vector_column, column, value):
+        precision = vector_precision(table)
+        key = f"{vector_column}:{column}={value}" + (":half" if precision == "half" else "")
+        digest = hashlib.md5(key.encode()).hexdigest()[:8]
+        name = f"idx_partial_{table}_{vector_column}"[:54] + f"_{digest}"
+        meta = {"table": table, "vector_column": vector_column, "column": column, "value": value,
+                "precision": precision}
+        conn = get_db_connection()
+        conn.autocommit = True
+        try:
+            cur = conn.cursor()
+            # One builder across workers and tasks
+            cur.execute("SELECT pg_try_advisory_lock(hashtext('idx_partial'))")
+            if not cur.fetchone()[0]:
+                return
+            logger.info(f"Building partial HNSW index {name} on {table}.{vector_column} WHERE {column} = {value!r}")
+            start = time.perf_counter()
+            try:
+                cur.execute(psql.SQL(
+                    "CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} "
+                    "USING hnsw ({key}) WITH (m = 16, ef_construction = 64) "
+                    "WHERE {column} = {value}"
+                ).format(name=psql.Identifier(name), table=psql.Identifier(table),
+                         key=psql.SQL(hnsw_index_key(table, vector_column)), column=psql.Identifier(column),
+                         value=psql.Literal(value)))
+                cur.execute(psql.SQL("COMMENT ON INDEX {} IS {}").format(psql.Identifier(name), psql.Literal(json.dumps(meta))))
+                self.indexes_created += 1
+                logger.info(f"Built partial HNSW index {name} in {time.perf_counter() - start:.1f}s")
+            except psycopg2.Error as e:
+                # A failed concurrent build leaves an invalid index behind
+                self.index_failures += 1
+                logger.error(f"Partial index build {name} failed: {e}")
+                cur.execute(psql.SQL("DROP INDEX CONCURRENTLY IF EXISTS {}").format(psql.Identifier(name)))
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(hashtext('idx_partial'))")
+        finally:
+            conn.close()
+
+    async def _run(self, interval: float):
+        while True:
+            try:
+                await asyncio.to_thread(self.refresh)
+            except Exception as e:
+                logger.warning(f"Search router refresh failed: {e}")
+            await asyncio.sleep(interval)
+
+    def start(self, interval: float = PARTIAL_INDEX_REFRESH_SECONDS):
+        self._task = asyncio.create_task(self._run(interval), name="search-router")
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "refreshed_at": self.refreshed_at,
+                "row_counts": dict(self.row_counts),
+                "partial_indexes": [
+                    {"name": name, "table": t, "vector_column": v, "column": c, "value": val,
+                     "rows": self.value_counts.get((t, c, val))}
+                    for (t, v, c, val), name in sorted(self.partial_indexes.items(), key=lambda kv: kv[1])
+                ],
+                "filter_usage": [
+                    {"table": t, "vector_column": v, "column": c, "value": val, "queries": n,
+                     "rows": self.value_counts.get((t, c, val)), "indexed": (t, v, c, val) in self.partial_indexes}
+                    for (t, v, c, val), n in self.usage.most_common(50)
+                ],
+                "paths": [{"table": t, "path": path, "queries": n} for (t, path), n in sorted(self.paths.items())],
+                "indexes_created": self.indexes_created,
+                "index_failures": self.index_failures,
+                "config": {
+                    "exact_search_max_rows": EXACT_SEARCH_MAX_ROWS,
+                    "ef_search_max": SEARCH_EF_SEARCH_MAX,
+                    "auto_create": PARTIAL_INDEX_AUTO_CREATE,
+                    "min_queries": PARTIAL_INDEX_MIN_QUERIES,
+                    "max_indexes": PARTIAL_INDEX_MAX,
+                    "max_fraction": PARTIAL_INDEX_MAX_FRACTION,
+                    "refresh_seconds": PARTIAL_INDEX_REFRESH_SECONDS,
+                    "vector_precision": {table: vector_precision(table) for table in self.tables},
+                    "halfvec_rescore_factor": HALFVEC_RESCORE_FACTOR,
+                },
+            }
+
+
+def route_search(table: str, vector_columns, predicates, limit: int) -> SearchRoute:
+    """Path for a search (see SearchRouter); its setup SQL goes in front of the statement."""
+    limit = candidate_limit(table, limit)
+    if search_router is None:
+        return _global_route(limit)
+    return search_router.route(table, vector_columns, predicates, limit)
+
+
+def count_search_path(table: str, path: str):
+    if search_router is not None:
+        search_router.count_path(table, path)
+
+
+# ============================================================
+# In-Memory Keyword Index (BM25)
+# ============================================================
+#
+# The keyword side of hybrid legal search, served in process instead of
+# by ts_rank over content_tsv. With KEYWORD_INDEX_ENABLED (the default),
+# each table in MEMORY_INDEX_KEYWORD_COLUMNS is held as a KeywordTable:
+# a BM25Index over the keyword column plus the filter bitmaps and dates,
+# whatever the table's size and whether or not its vectors are held in
+# memory. The in-memory index's listener keeps it in sync (see
+# MemoryVectorIndex). A hybrid search on pgvector gets its keyword ranks
+# from it as an array of ids, so SQL only runs the semantic leg and
+# fetches the keyword rows by primary key.
+#
+# Text is split, lowercased, stripped of Postgres's english.stop words
+# and Snowball stemmed, close to to_tsvector('english', ...), and scored
+# with Okapi BM25 (BM25_K1, BM25_B).
+#
+# Postings are arrays: every (term, row) pair sorted by term, with
+# offsets[term] marking where a term's rows start. Each pair stores its
+# precomputed impact tf * (k1 + 1) / (tf + k1 * (1 - b + b * dl / avgdl)),
+# so a term's contribution to a row is idf * impact, and each term
+# keeps its largest impact as an upper bound. Queries run term at a time
+# in MaxScore order, from the highest bound down. Once the bounds of the
+# terms still to score cannot lift an unseen row past the current k-th
+# best score, the rest of the terms only update rows already in
+# contention. Changed rows are re-analysed on their own, and the arrays
+# are rebuilt from the per-row term counts.
+
+KEYWORD_INDEX_ENABLED = os.getenv("KEYWORD_INDEX_ENABLED", "true").lower() == "true"
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Hybrid search fuses the top HYBRID_CANDIDATES of each side by RRF
+HYBRID_CANDIDATES = 20
+HYBRID_RRF_K = 60
+HYBRID_RANK_ORDER = "rrf_score DESC, id"
+
+ENGLISH_STOPWORDS = frozenset("""
+    i me my myself we our ours ourselves you your yours yourself yourselves he him his himself she her hers
+    herself it its itself they them their theirs themselves what which who whom this that these those am is
+    are was were be been being have has had having do does did doing a an the and but if or because as until
+    while of at by for with about against between into through during before after above below to from up
+    down in out on off over under again further then once here there when where why how all any both each
+    few more most other some such no nor not only own same so than too very s t can will just don should now
+""".split())
+_WORD_RE = re.compile(r"[^\W_]+")
+_stemmer = snowballstemmer.stemmer("english")
+
+
+def analyze(text: str) -> List[str]:
+    """Index terms of text, in order: words lowercased, stopwords dropped, stemmed."""
+    return _stemmer.stemWords([w for w in _WORD_RE.findall(text.lower()) if w not in ENGLISH_STOPWORDS])
+
+
+class BM25Index:
+    """BM25 over one text column, rows aligned with a KeywordTable. Never modified; changes build a new one."""
+
+    def __init__(self, vocabulary: Dict[str, int], doc_terms):
+        self.vocabulary = vocabulary  # term -> term id, ids in insertion order
+        self.doc_terms = doc_terms    # per row: (int32 term ids, float32 term frequencies)
+        n, n_terms = len(doc_terms), len(vocabulary)
+        lengths = np.array([tf.sum() for _, tf in doc_terms], dtype=np.float32)
+        self.avgdl = float(lengths.mean()) if n else 0.0
+        terms = np.concatenate([t for t, _ in doc_terms] + [np.empty(0, dtype=np.int32)])
+        tfs = np.concatenate([tf for _, tf in doc_terms] + [np.empty(0, dtype=np.float32)])
+        docs = np.repeat(np.arange(n, dtype=np.int32), [len(t) for t, _ in doc_terms])
+        order = np.argsort(terms, kind="stable")  # by term, then row
+        terms, tfs, self.docs = terms[order], tfs[order], docs[order]
+        norms = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(self.avgdl, 1e-9))
+        self.impacts = (tfs * (BM25_K1 + 1) / (tfs + norms[self.docs])).astype(np.float32)
+        df = np.bincount(terms, minlength=n_terms)
+        self.offsets = np.concatenate([[0], np.cumsum(df)])
+        self.idf = np.log(1 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        self.max_impact = np.zeros(n_terms, dtype=np.float32)
+        np.maximum.at(self.max_impact, terms, self.impacts)
+
+    def __len__(self):
+        return len(self.doc_terms)
+
+    @property
+    def postings(self) -> int:
+        return len(self.docs)
+
+    @classmethod
+    def from_texts(cls, texts: List[str]) -> "BM25Index":
+        vocabulary, doc_terms = {}, []
+        for text in texts:
+            ids = np.array([vocabulary.setdefault(term, len(vocabulary)) for term in analyze(text)], dtype=np.int32)
+            terms, counts = np.unique(ids, return_counts=True)
+            doc_terms.append((terms.astype(np.int32), counts.astype(np.float32)))
+        return cls(vocabulary, doc_terms)
+
+    def replace(self, keep: np.ndarray, changed: "BM25Index") -> "BM25Index":
+        """A copy with the rows where keep is False dropped, then the rows of changed appended."""
+        vocabulary = dict(self.vocabulary)
+        mapping = np.array([vocabulary.setdefault(term, len(vocabulary)) for term in changed.vocabulary], dtype=np.int32)
+        return BM25Index(
+            vocabulary,
+            [row for row, k in zip(self.doc_terms, keep) if k] + [(mapping[t], tf) for t, tf in changed.doc_terms],
         )
 
-        answer = output["choices"][0]["message"]["content"]
+    def top(self, text: str, mask: np.ndarray, k: int):
+        """(row indexes, scores), best first: the k best rows in mask matching any query term."""
+        terms = sorted({self.vocabulary[t] for t in analyze(text) if t in self.vocabulary},
+                       key=lambda t: -self.idf[t] * self.max_impact[t])
+        bounds = [float(self.idf[t] * self.max_impact[t]) for t in terms]
+        scores = np.zeros(len(self), dtype=np.float32)
+        seen = np.zeros(len(self), dtype=bool)
+        threshold = 0.0
+        for i, term in enumerate(terms):
+            upper = sum(bounds[i:])  # the most a row can still gain
+            start, end = self.offsets[term], self.offsets[term + 1]
+            if start == end:
+                continue
+            docs = self.docs[start:end]
+            contributions = self.idf[term] * self.impacts[start:end]
+            if threshold > 0 and upper <= threshold:
+                # No unseen row can reach the top k: score only the rows that still can
+                candidates = np.flatnonzero(seen & (scores + upper >= threshold))
+                positions = np.minimum(np.searchsorted(docs, candidates), len(docs) - 1)
+                hit = docs[positions] == candidates
+                scores[candidates[hit]] += contributions[positions[hit]]
+            else:
+                allowed = mask[docs]
+                scores[docs[allowed]] += contributions[allowed]
+                seen[docs[allowed]] = True
+            matched = scores[seen]
+            if len(matched) >= k:
+                threshold = float(np.partition(matched, len(matched) - k)[len(matched) - k])
+        rows = np.flatnonzero(seen)
+        k = min(k, len(rows))
+        if k == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.float32)
+        top = rows[np.argpartition(-scores[rows], k - 1)[:k]]
+        order = np.argsort(-scores[top], kind="stable")
+        return top[order], scores[top[order]]
+
+
+class FilteredRows:
+    """Row ids with the filter columns and dates that SearchRouter-style predicates test."""
+
+    def __init__(self, ids, values, dates):
+        self.ids = ids            # int64 row ids
+        self.values = values      # filter column -> object array of values
+        self.dates = dates        # datetime64[D] (NaT where NULL), or None
+        self.not_null = {column: np.not_equal(v, None) for column, v in values.items()}
+        self.bitmaps = {
+            (column, value): v == value
+            for column, v in values.items() for value in set(v.tolist()) - {None}
+        }
 
-        return RAGResponse(
-            answer=answer,
-            sources=search_results
+    def __len__(self):
+        return len(self.ids)
+
+    @staticmethod
+    def _columns(rows, filters, date_column: Optional[str]):
+        """(ids, values, dates) of selected rows."""
+        return (
+            np.array([r["id"] for r in rows], dtype=np.int64),
+            {column: np.array([r[column] for r in rows], dtype=object) for column in filters},
+            np.array([r[date_column] for r in rows], dtype="datetime64[D]") if date_column else None,
         )
 
-    except Exception as e:
-        logger.error(f"RAG error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+    def _kept(self, keep: np.ndarray, changed: "FilteredRows"):
+        """(ids, values, dates) of the rows in keep, then those of changed."""
+        return (
+            np.concatenate([self.ids[keep], changed.ids]),
+            {c: np.concatenate([v[keep], changed.values[c]]) for c, v in self.values.items()},
+            np.concatenate([self.dates[keep], changed.dates]) if self.dates is not None else None,
+        )
+
+    def mask(self, predicates, date_from: Optional[str] = None, date_to: Optional[str] = None) -> np.ndarray:
+        """Rows matching SearchRouter-style (column, op, value) predicates and the date range."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, op, value in predicates:
+            matches = self.bitmaps.get((column, value))
+            if op == "=":
+                mask &= matches if matches is not None else False
+            else:
+                # column != value, which like SQL excludes NULLs
+                mask &= self.not_null[column] if matches is None else self.not_null[column] & ~matches
+        if date_from:
+            mask &= self.dates >= np.datetime64(date_from)
+        if date_to:
+            mask &= self.dates <= np.datetime64(date_to)
+        return mask
+
+
+class KeywordTable(FilteredRows):
+    """A BM25Index over one table's keyword column, with its filters. Never modified; changes build a new one."""
+
+    def __init__(self, ids, values, dates, keywords: BM25Index):
+        super().__init__(ids, values, dates)
+        self.keywords = keywords
+
+    @classmethod
+    def from_rows(cls, filters, date_column: Optional[str], rows) -> "KeywordTable":
+        """Build from rows selected by MemoryVectorIndex._keyword_sql (text as keyword_text)."""
+        return cls(*cls._columns(rows, filters, date_column),
+                   BM25Index.from_texts([r["keyword_text"] for r in rows]))
+
+    def replace(self, ids, changed: "KeywordTable") -> "KeywordTable":
+        """A copy with rows whose id is in ids dropped, then the rows of changed appended."""
+        keep = ~np.isin(self.ids, list(ids))
+        return KeywordTable(*self._kept(keep, changed), self.keywords.replace(keep, changed.keywords))
+
+    def top(self, text: str, mask: np.ndarray, k: int) -> List[int]:
+        """Ids of the k best BM25 matches for text among the rows in mask, best first."""
+        return self.ids[self.keywords.top(text, mask, k)[0]].tolist()
+
+
+# ============================================================
+# In-Memory Vector Index
+# ============================================================
+#
+# Small tables can be searched exactly, in process, instead of through
+# an approximate HNSW scan and a database round trip. With
+# MEMORY_INDEX_ENABLED, each of the SEARCH_TABLES with at most
+# MEMORY_INDEX_MAX_ROWS rows is held as a MemoryTable:
+#
+#   - one contiguous float32 matrix per embedding column, with rows
+#     normalised so a matrix-vector product gives cosine similarity
+#   - a boolean bitmap per (filter column, value), and dates for the
+#     legal date range filters
+#   - the result columns (INGESTED_RESULT_COLUMNS / LEGAL_RESULT_COLUMNS)
+#
+# Hybrid search takes its keyword ranks from the table's KeywordTable,
+# so it runs without the database too.
+#
+# A query ANDs the bitmaps it filters on, scores every row with one
+# product and takes the top k with argpartition. Writes reach the index
+# through the notify_search_index triggers (migrate_schema.py and
+# schema_legal.sql): a listener thread on its own connection refetches
+# the changed rows by id and swaps in a rebuilt MemoryTable. A table that
+# grows past the limit, a table without the trigger, and any listener
+# error all fall back to pgvector; the listener reloads everything when
+# it reconnects. The same listener holds the KeywordTables (without
+# MEMORY_INDEX_ENABLED it runs for them alone), which have no row limit.
+
+MEMORY_INDEX_ENABLED = os.getenv("MEMORY_INDEX_ENABLED", "false").lower() == "true"
+MEMORY_INDEX_MAX_ROWS = int(os.getenv("MEMORY_INDEX_MAX_ROWS", "10000"))
+MEMORY_INDEX_DEBOUNCE_SECONDS = float(os.getenv("MEMORY_INDEX_DEBOUNCE_SECONDS", "0.2"))
+MEMORY_INDEX_RECHECK_SECONDS = 60
+MEMORY_INDEX_CHANNEL = "search_index"
+
+MEMORY_INDEX_COLUMNS = {"ingested_records": INGESTED_RESULT_COLUMNS, "legal_documents": LEGAL_RESULT_COLUMNS}
+MEMORY_INDEX_DATE_COLUMNS = {"legal_documents": "date_decided"}
+MEMORY_INDEX_KEYWORD_COLUMNS = {"legal_documents": "content"}
+
+
+class MemoryTable(FilteredRows):
+    """One table held in memory for exact search. Never modified; changes build a new one."""
+
+    def __init__(self, ids, rows, vectors, present, values, dates):
+        super().__init__(ids, values, dates)
+        self.rows = rows          # result-column dicts, aligned with ids
+        self.vectors = vectors    # column -> (n, dim) float32 unit rows, zeros where NULL
+        self.present = present    # column -> bool, False where the embedding is NULL
+        self.positions = {row_id: i for i, row_id in enumerate(ids.tolist())}
+
+    @property
+    def nbytes(self) -> int:
+        return sum(m.nbytes for m in self.vectors.values())
+
+    @classmethod
+    def from_rows(cls, spec: dict, columns: Dict[str, str], date_column: Optional[str], dims: Dict[str, int], rows):
+        """Build from rows selected by MemoryVectorIndex._select_sql (embeddings as real[])."""
+        vectors, present = {}, {}
+        for column in spec["vectors"]:
+            matrix = np.zeros((len(rows), dims[column]), dtype=np.float32)
+            mask = np.zeros(len(rows), dtype=bool)
+            for i, r in enumerate(rows):
+                if r[column] is not None:
+                    matrix[i] = r[column]
+                    mask[i] = True
+            norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+            vectors[column] = matrix / np.where(norms > 0, norms, 1)
+            present[column] = mask
+        ids, values, dates = cls._columns(rows, spec["filters"], date_column)
+        return cls(ids, [{field: r[field] for field in columns} for r in rows], vectors, present, values, dates)
+
+    def replace(self, ids, changed: "MemoryTable") -> "MemoryTable":
+        """A copy with rows whose id is in ids dropped, then the rows of changed appended."""
+        keep = ~np.isin(self.ids, list(ids))
+        ids, values, dates = self._kept(keep, changed)
+        return MemoryTable(
+            ids,
+            [row for row, k in zip(self.rows, keep) if k] + changed.rows,
+            {c: np.concatenate([m[keep], changed.vectors[c]]) for c, m in self.vectors.items()},
+            {c: np.concatenate([m[keep], changed.present[c]]) for c, m in self.present.items()},
+            values,
+            dates,
+        )
+
+    def nearest(self, column: str, queries: np.ndarray, mask: np.ndarray, k: int):
+        """Top-k (row indexes, similarities) per query, best first, among rows in mask."""
+        allowed = mask & self.present[column]
+        k = min(k, int(allowed.sum()))
+        if k == 0:
+            empty = np.empty((len(queries), 0))
+            return empty.astype(np.int64), empty
+        similarities = queries @ self.vectors[column].T
+        similarities[:, ~allowed] = -np.inf
+        top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+        top_similarities = np.take_along_axis(similarities, top, axis=1)
+        order = np.argsort(-top_similarities, axis=1, kind="stable")
+        return np.take_along_axis(top, order, axis=1), np.take_along_axis(top_similarities, order, axis=1)
+
+    def semantic(self, column: str, mask: np.ndarray, queries: np.ndarray, top_k: int) -> List[List[dict]]:
+        """Ranked result rows per query by cosine similarity on one embedding column."""
+        top, similarities = self.nearest(column, queries, mask, top_k)
+        return [
+            [{**self.rows[i], "similarity": float(s), "search_method": "semantic"} for i, s in zip(indexes, sims)]
+            for indexes, sims in zip(top, similarities)
+        ]
+
+    def hybrid(self, column: str, mask: np.ndarray, queries: np.ndarray, keyword_ids: List[List[int]],
+               top_k: int) -> List[List[dict]]:
+        """Result rows per query fusing vector ranks with KeywordTable.top ids, as the hybrid SQL in _legal_search_sql does."""
+        nearest, similarities = self.nearest(column, queries, mask, HYBRID_CANDIDATES)
+        results = []
+        for q, ids in enumerate(keyword_ids):
+            semantic = {int(i): (rank, float(s)) for rank, (i, s) in enumerate(zip(nearest[q], similarities[q]), 1)}
+            # Ids the keyword side has seen and this snapshot not yet are left out
+            keyword = {self.positions[i]: rank for rank, i in enumerate(ids, 1) if i in self.positions}
+            fused = []
+            for i in semantic.keys() | keyword.keys():
+                rank, similarity = semantic.get(i, (None, 0.0))
+                rrf = (1.0 / (HYBRID_RRF_K + rank) if rank else 0.0) + (1.0 / (HYBRID_RRF_K + keyword[i]) if i in keyword else 0.0)
+                method = "hybrid" if rank and i in keyword else "semantic" if rank else "keyword"
+                fused.append((rrf, i, similarity, method))
+            fused.sort(key=lambda f: (-f[0], self.ids[f[1]]))
+            results.append([
+                {**self.rows[i], "similarity": similarity, "rrf_score": rrf, "search_method": method}
+                for rrf, i, similarity, method in fused[:top_k]
+            ])
+        return results
+
+    def multi(self, fields: Dict[str, str], weights: Dict[str, float], mask: np.ndarray, queries: np.ndarray,
+              fusion: str, candidates: int, top_k: int) -> List[List[dict]]:
+        """Fused result rows per query, as multi_vector_search_sql computes them."""
+        if fusion not in MULTI_VECTOR_FUSIONS:
+            raise HTTPException(status_code=400, detail=f"fusion must be one of {MULTI_VECTOR_FUSIONS}")
+        nearest = {field: self.nearest(fields[field], queries, mask, candidates)[0] for field in weights}
+        results = []
+        for q, query in enumerate(queries):
+            ranks = {field: {int(i): rank for rank, i in enumerate(nearest[field][q], 1)} for field in weights}
+            union = np.array(sorted(set().union(*ranks.values())), dtype=np.int64)
+            field_similarities = {
+                field: np.where(self.present[fields[field]][union], self.vectors[fields[field]][union] @ query, np.nan)
+                for field in weights
+            }
+            if fusion == "rrf":
+                fused = sum(
+                    np.array([weights[field] / (MULTI_VECTOR_RRF_K + ranks[field][i]) if i in ranks[field] else 0.0
+                              for i in union.tolist()])
+                    for field in weights
+                )
+            else:
+                fused = sum(weights[field] * np.nan_to_num(field_similarities[field]) for field in weights) / sum(weights.values())
+            order = np.argsort(-fused, kind="stable")[:top_k]
+            results.append([
+                {
+                    **self.rows[union[j]],
+                    **{f"{field}_similarity": None if np.isnan(sims[j]) else float(sims[j])
+                       for field, sims in field_similarities.items()},
+                    "similarity": float(fused[j]),
+                    "search_method": "multi",
+                }
+                for j in order
+            ])
+        return results
+
+
+class MemoryVectorIndex:
+    """MemoryTables for the SEARCH_TABLES and their KeywordTables, kept in sync by LISTEN/NOTIFY (see above)."""
+
+    def __init__(self, tables: dict, vectors: bool = True, keywords: bool = True):
+        self.tables = tables
+        self.vectors = vectors    # hold MemoryTables (MEMORY_INDEX_ENABLED)
+        self.keywords = keywords  # hold KeywordTables (KEYWORD_INDEX_ENABLED)
+        self.watched = [table for table in tables if vectors or (keywords and table in MEMORY_INDEX_KEYWORD_COLUMNS)]
+        self.snapshots = {}       # table -> MemoryTable, only while in sync and within the limit
+        self.keyword_snapshots = {}  # table -> KeywordTable, only while in sync
+        self.row_counts = {}
+        self.loaded_at = {}
+        self.checked_at = {}
+        self.rows_updated = Counter()
+        self.last_error = None
+        self._dims = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def table(self, name: str) -> Optional[MemoryTable]:
+        return self.snapshots.get(name)
+
+    def keyword_table(self, name: str) -> Optional[KeywordTable]:
+        return self.keyword_snapshots.get(name)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._listen, name="memory-index", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            conn = None
+            try:
+                conn = get_db_connection()
+                conn.autocommit = True
+                cur = conn.cursor(cursor_factory=RealDictCursor)
+                # LISTEN before loading, so no write commits unseen in between
+                cur.execute(f"LISTEN {MEMORY_INDEX_CHANNEL}")
+                for table in self._triggered_tables(cur):
+                    self._load(cur, table)
+                self.last_error = None
+                while not self._stop.is_set():
+                    for table, ids in self._wait_for_changes(conn).items():
+                        self._apply(cur, table, ids)
+            except Exception as e:
+                self.last_error = str(e)
+                self.snapshots = {}
+                self.keyword_snapshots = {}
+                logger.warning(f"In-memory index listener failed, searching the database until it reloads: {e}")
+                self._stop.wait(5)
+            finally:
+                if conn is not None:
+                    conn.close()
+
+    def _triggered_tables(self, cur) -> List[str]:
+        """Tables with the notify_search_index trigger; the others are never loaded."""
+        cur.execute("""
+            SELECT c.relname
+            FROM pg_trigger t
+            JOIN pg_class c ON c.oid = t.tgrelid
+            WHERE t.tgname = 'notify_search_index'
+        """)
+        triggered = {r["relname"] for r in cur.fetchall()}
+        for table in self.watched:
+            if table not in triggered:
+                logger.warning(f"{table} has no notify_search_index trigger (run migrate_schema.py); "
+                               f"it stays on pgvector")
+        return [table for table in self.watched if table in triggered]
+
+    def _wait_for_changes(self, conn) -> Dict[str, Optional[set]]:
+        """Changed ids per table from the next notifications; None means reload the table."""
+        # Notifications read while loading are already buffered in conn.notifies
+        if not conn.notifies and not select.select([conn], [], [], 1.0)[0]:
+            return {}
+        # Let a burst of writes (an ingestion batch) arrive before refetching
+        time.sleep(MEMORY_INDEX_DEBOUNCE_SECONDS)
+        conn.poll()
+        changes = {}
+        while conn.notifies:
+            table, _, row_id = conn.notifies.pop(0).payload.partition(":")
+            if table not in self.watched:
+                continue
+            ids = changes.setdefault(table, set())
+            if row_id == "*":
+                changes[table] = None
+            elif ids is not None:
+                ids.add(int(row_id))
+        return changes
+
+    def _select_sql(self, table: str) -> str:
+        columns = MEMORY_INDEX_COLUMNS[table]
+        spec = self.tables[table]
+        select_columns = [f"{expr.format(t='')} AS {field}" for field, expr in columns.items()]
+        select_columns += [column for column in spec["filters"] if column not in columns]
+        if table in MEMORY_INDEX_DATE_COLUMNS:
+            select_columns.append(MEMORY_INDEX_DATE_COLUMNS[table])
+        select_columns += [f"{column}::real[] AS {column}" for column in spec["vectors"]]
+        return f"SELECT {', '.join(select_columns)} FROM {table}"
+
+    def _keyword_sql(self, table: str) -> str:
+        select_columns = ["id", *self.tables[table]["filters"]]
+        if table in MEMORY_INDEX_DATE_COLUMNS:
+            select_columns.append(MEMORY_INDEX_DATE_COLUMNS[table])
+        select_columns.append(f"coalesce({MEMORY_INDEX_KEYWORD_COLUMNS[table]}, '') AS keyword_text")
+        return f"SELECT {', '.join(select_columns)} FROM {table}"
+
+    def _build(self, table: str, rows) -> MemoryTable:
+        return MemoryTable.from_rows(self.tables[table], MEMORY_INDEX_COLUMNS[table],
+                                     MEMORY_INDEX_DATE_COLUMNS.get(table), self._dims[table], rows)
+
+    def _build_keywords(self, table: str, rows) -> KeywordTable:
+        return KeywordTable.from_rows(self.tables[table]["filters"], MEMORY_INDEX_DATE_COLUMNS.get(table), rows)
+
+    def _load(self, cur, table: str):
+        if self.keywords and table in MEMORY_INDEX_KEYWORD_COLUMNS:
+            self._load_keywords(cur, table)
+        if self.vectors:
+            self._load_vectors(cur, table)
+
+    def _apply(self, cur, table: str, ids: Optional[set]):
+        if self.keywords and table in MEMORY_INDEX_KEYWORD_COLUMNS:
+            self._apply_keywords(cur, table, ids)
+        if self.vectors:
+            self._apply_vectors(cur, table, ids)
+
+    def _load_keywords(self, cur, table: str):
+        start = time.perf_counter()
+        cur.execute(self._keyword_sql(table))
+        snapshot = self._build_keywords(table, cur.fetchall())
+        self.keyword_snapshots[table] = snapshot
+        logger.info(f"In-memory keyword index loaded {len(snapshot)} {table} rows "
+                    f"({len(snapshot.keywords.vocabulary)} terms) in {time.perf_counter() - start:.2f}s")
+
+    def _apply_keywords(self, cur, table: str, ids: Optional[set]):
+        snapshot = self.keyword_snapshots.get(table)
+        if snapshot is None or ids is None:
+            self._load_keywords(cur, table)
+            return
+        cur.execute(self._keyword_sql(table) + " WHERE id = ANY(%s)", (sorted(ids),))
+        self.keyword_snapshots[table] = snapshot.replace(ids, self._build_keywords(table, cur.fetchall()))
+
+    def _load_vectors(self, cur, table: str):
+        self.checked_at[table] = time.time()
+        cur.execute(psql.SQL("SELECT count(*) AS rows FROM {}").format(psql.Identifier(table)))
+        self.row_counts[table] = cur.fetchone()["rows"]
+        if self.row_counts[table] > MEMORY_INDEX_MAX_ROWS:
+            if self.snapshots.pop(table, None) is not None or table not in self.loaded_at:
+                logger.info(f"{table} has {self.row_counts[table]} rows (> MEMORY_INDEX_MAX_ROWS); searching it with pgvector")
+            self.loaded_at[table] = None
+            return
+        # Vector dimensions from the column type modifiers
+        cur.execute("SELECT attname, atttypmod FROM pg_attribute WHERE attrelid = %s::regclass AND attname = ANY(%s)",
+                    (table, list(self.tables[table]["vectors"])))
+        self._dims[table] = {r["attname"]: r["atttypmod"] for r in cur.fetchall()}
+        start = time.perf_counter()
+        cur.execute(self._select_sql(table))
+        snapshot = self._build(table, cur.fetchall())
+        self.snapshots[table] = snapshot
+        self.row_counts[table] = len(snapshot)
+        self.loaded_at[table] = time.time()
+        logger.info(f"In-memory vector index loaded {len(snapshot)} {table} rows "
+                    f"({snapshot.nbytes / 1e6:.1f} MB) in {time.perf_counter() - start:.2f}s")
+
+    def _apply_vectors(self, cur, table: str, ids: Optional[set]):
+        snapshot = self.snapshots.get(table)
+        if snapshot is None or ids is None:
+            # Over the limit (recounted at most every MEMORY_INDEX_RECHECK_SECONDS) or truncated
+            if ids is None or time.time() - self.checked_at.get(table, 0) > MEMORY_INDEX_RECHECK_SECONDS:
+                self._load_vectors(cur, table)
+            return
+        cur.execute(self._select_sql(table) + " WHERE id = ANY(%s)", (sorted(ids),))
+        updated = snapshot.replace(ids, self._build(table, cur.fetchall()))
+        self.rows_updated[table] += len(ids)
+        if len(updated) > MEMORY_INDEX_MAX_ROWS:
+            self._load_vectors(cur, table)
+            return
+        self.snapshots[table] = updated
+        self.row_counts[table] = len(updated)
+
+    def stats(self) -> dict:
+        tables = {}
+        for table in self.watched:
+            snapshot = self.snapshots.get(table)
+            keywords = self.keyword_snapshots.get(table)
+            tables[table] = {
+                "loaded": snapshot is not None,
+                "rows": self.row_counts.get(table),
+                "vector_bytes": snapshot.nbytes if snapshot is not None else 0,
+                "keyword_rows": len(keywords) if keywords is not None else None,
+                "keyword_terms": len(keywords.keywords.vocabulary) if keywords is not None else None,
+                "keyword_postings": keywords.keywords.postings if keywords is not None else None,
+                "loaded_at": self.loaded_at.get(table),
+                "rows_updated": self.rows_updated[table],
+            }
+        return {"vectors": self.vectors, "keywords": self.keywords, "max_rows": MEMORY_INDEX_MAX_ROWS,
+                "last_error": self.last_error, "tables": tables}
+
+
+def memory_table(name: str) -> Optional[MemoryTable]:
+    """The in-memory copy of a table, or None if searches must use pgvector."""
+    return memory_index.table(name) if memory_index is not None else None
+
+
+def keyword_table(name: str) -> Optional[KeywordTable]:
+    """The in-memory BM25 index of a table, or None if keyword search must use ts_rank."""
+    return memory_index.keyword_table(name) if memory_index is not None else None
+
+
+# ============================================================
+# Batched Search Queries
+# ============================================================
+
+# Ranking of semantic and multi search results over their output columns
+# (similarity is 1 - distance), ties broken by id; hybrid uses
+# HYBRID_RANK_ORDER
+SEARCH_RANK_ORDER = "similarity DESC, id"
+
+
+def _batch_queries(queries: List[str]) -> List[str]:
+    """Strip batch queries, rejecting empty ones."""
+    queries = [q.strip() for q in queries]
+    empty = [i for i, q in enumerate(queries) if not q]
+    if empty:
+        raise HTTPException(status_code=400, detail=f"Empty queries at positions {empty}")
+    return queries
+
+
+def batch_search_sql(sql: str, rank_order: str = SEARCH_RANK_ORDER) -> str:
+    """Rewrite a single-query search statement to run for many queries at once.
+
+    The statement's %(query_vec)s and %(query_text)s placeholders become
+    columns of unnest(%(query_vecs)s::vector[], %(query_texts)s::text[])
+    (%(keyword_ids)s, if used, becomes a column of %(keyword_id_lists)s,
+    one int[] literal per query) and the statement runs once per query
+    under a LATERAL join, so every query keeps its own ORDER BY ... LIMIT
+    scan of the HNSW index, in one round trip on one pooled connection.
+    Rows come back ordered by query_index (0-based), then by query_rank,
+    each query's rows numbered by rank_order: the statement's own ranking
+    over its output columns, since a subquery's row order does not carry
+    through. Leading SET LOCAL statements are kept in front.
+    """
+    setup = ""
+    while sql.lstrip().startswith("SET LOCAL"):
+        statement, _, sql = sql.partition(";")
+        setup += statement.strip() + ";\n"
+    body = sql.replace("%(query_vec)s", "q.query_vec").replace("%(query_text)s", "q.query_text")
+    arrays, columns = "%(query_vecs)s::vector[], %(query_texts)s::text[]", "query_vec, query_text"
+    if "%(keyword_ids)s" in body:
+        body = body.replace("%(keyword_ids)s", "q.keyword_ids")
+        arrays, columns = arrays + ", %(keyword_id_lists)s::text[]", columns + ", keyword_ids"
+    return f"""{setup}
+        SELECT q.ord - 1 AS query_index, r.*
+        FROM unnest({arrays}) WITH ORDINALITY AS q({columns}, ord)
+        CROSS JOIN LATERAL (
+            SELECT s.*, ROW_NUMBER() OVER (ORDER BY {rank_order}) AS query_rank FROM ({body}) s
+        ) r
+        ORDER BY q.ord, r.query_rank
+    """
+
+
+def group_batch_rows(rows, n_queries: int) -> List[list]:
+    """Split batch_search_sql rows into one list per query."""
+    grouped = [[] for _ in range(n_queries)]
+    for row in rows:
+        grouped[row["query_index"]].append(row)
+    return grouped
+
+
+# ============================================================
+# Ingested Records Search
+# ============================================================
+
+INGESTED_VECTOR_FIELDS = {"content": "content_embedding", "title": "title_embedding"}
+
+
+def _ingested_predicates(request: IngestedSearchOptions):
+    """The request's filters as SearchRouter predicates."""
+    predicates = [("status", "=", "active")]
+    if request.category:
+        predicates.append(("category", "=", request.category))
+    return predicates
+
+
+def _ingested_search_sql(request: IngestedSearchOptions):
+    """(sql, params, weights, route) for an ingested_records search; the caller adds query_vec.
+
+    weights is set for multi search (see multi_vector_search_sql), else
+    None; route is the SearchRoute already applied to sql. Only the
+    columns behind request.fields are selected.
+    """
+    fields = result_fields(request.fields, IngestedSearchResult)
+    filter_clause = "status = 'active'"
+    if request.category:
+        filter_clause += " AND category = %(category)s"
+    predicates = _ingested_predicates(request)
+    params = {"category": request.category, "top_k": request.top_k}
+
+    if request.search_field == "multi":
+        weights = _multi_vector_weights(request.field_weights, INGESTED_VECTOR_FIELDS)
+        sql, multi_params = multi_vector_search_sql(
+            "ingested_records", select_list(fields, INGESTED_RESULT_COLUMNS, "d"),
+            INGESTED_VECTOR_FIELDS, weights, filter_clause, request.fusion, request.candidates,
+        )
+        params.update(multi_params)
+        route = route_search("ingested_records", [INGESTED_VECTOR_FIELDS[f] for f in weights], predicates,
+                             request.candidates)
+        return route.setup + sql, params, weights, route
+
+    embedding_field = "title_embedding" if request.search_field == "title" else "content_embedding"
+    route = route_search("ingested_records", [embedding_field], predicates, request.top_k)
+    sql = route.setup + f"""
+        SELECT * FROM (
+            SELECT {select_list(fields, INGESTED_RESULT_COLUMNS)},
+                   1 - ({embedding_field} <=> %(query_vec)s::vector) as similarity
+            FROM ingested_records
+            WHERE {filter_clause}
+              AND {embedding_field} IS NOT NULL
+            ORDER BY {embedding_field} <=> %(query_vec)s::vector
+            LIMIT %(top_k)s
+        ) nearest
+        ORDER BY {SEARCH_RANK_ORDER}
+    """
+    return sql, params, None, route
+
+
+def _memory_ingested_search(table: MemoryTable, request: IngestedSearchOptions, query_vecs: np.ndarray):
+    """(groups, weights) for an ingested_records search on the in-memory index."""
+    with timed_stage("memory_search"):
+        mask = table.mask(_ingested_predicates(request))
+        if request.search_field == "multi":
+            weights = _multi_vector_weights(request.field_weights, INGESTED_VECTOR_FIELDS)
+            return table.multi(INGESTED_VECTOR_FIELDS, weights, mask, query_vecs,
+                               request.fusion, request.candidates, request.top_k), weights
+        column = "title_embedding" if request.search_field == "title" else "content_embedding"
+        return table.semantic(column, mask, query_vecs, request.top_k), None
+
+
+def _unit_rows(query_vecs) -> np.ndarray:
+    queries = np.asarray(query_vecs, dtype=np.float32).reshape(len(query_vecs), -1)
+    norms = np.linalg.norm(queries, axis=1, keepdims=True)
+    return queries / np.where(norms > 0, norms, 1)
+
+
+async def ingested_search_rows(request: IngestedSearchOptions, query_vecs, queries: Optional[List[str]] = None):
+    """(groups, weights, path): ranked rows for each query vector.
+
+    Served from the in-memory index when it holds ingested_records, else
+    by one SQL statement (batch_search_sql for several queries). path is
+    the X-Search-Path value.
+    """
+    table = memory_table("ingested_records")
+    if table is not None:
+        groups, weights = await run_in_threadpool(_memory_ingested_search, table, request, _unit_rows(query_vecs))
+        count_search_path("ingested_records", "memory")
+        return groups, weights, f"memory; rows={len(table)}"
+
+    sql, params, weights, route = _ingested_search_sql(request)
+    if len(query_vecs) == 1:
+        params["query_vec"] = query_vecs[0]
+        groups = [await db_fetchall(sql, params, cursor_factory=RealDictCursor)]
+    else:
+        params.update(query_vecs=list(query_vecs), query_texts=queries)
+        rows = await db_fetchall(batch_search_sql(sql), params, cursor_factory=RealDictCursor)
+        groups = group_batch_rows(rows, len(query_vecs))
+    return groups, weights, route.header
+
+
+def _ingested_result(r, weights: Optional[Dict[str, float]], fields: List[str]) -> dict:
+    """An IngestedSearchResult as a dict holding only the projected fields."""
+    result = {}
+    for field in fields:
+        if field == "similarity":
+            result[field] = float(r["similarity"])
+        elif field == "field_scores":
+            result[field] = _field_scores(r, weights) if weights else None
+        elif field == "raw_data":
+            result[field] = r["raw_data"] or {}
+        else:
+            result[field] = r[field]
+    return result
 
-# ============================================================
-# Ingested Records Search
-# ============================================================
 
 @app.post("/search/records", response_model=List[IngestedSearchResult], tags=["Product Search"],
     summary="Search product records",
     description="""Semantic vector search over 1,013 ingested Amazon product records.
 
-Supports searching by `content` (description embedding) or `title` (title embedding), both 384-dim. Optional category filter for faceted search.""",
+Supports searching by `content` (description embedding) or `title` (title embedding), both 384-dim, or `multi`, which searches both in one query and fuses them with per-request `field_weights` (weighted RRF or weighted cosine similarity, see `fusion`). Optional category filter for faceted search.
+
+Set `fields` to return only some result fields, e.g. `["id", "title", "similarity"]`: the other columns (notably the `raw_data` JSON) are left out of the SQL select list and the response.""",
     response_description="Ranked list of matching products with similarity scores")
 async def search_ingested_records(request: IngestedSearchRequest):
     """Search ingested records by vector similarity."""
-    if embedder is None:
-        raise HTTPException(status_code=503, detail="Embedding model not loaded")
+    require_models("embedder")
+    set_metric_label("search_field", request.search_field)
 
     try:
-        query_embedding = get_embedding(request.query)
+        query_embedding = await embed_query(request.query)
+        groups, weights, path = await ingested_search_rows(request, [query_embedding])
 
-        embedding_field = "title_embedding" if request.search_field == "title" else "content_embedding"
+        fields = result_fields(request.fields, IngestedSearchResult)
+        return FastJSONResponse([_ingested_result(r, weights, fields) for r in groups[0]],
+                                headers={"X-Search-Path": path})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Ingested search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
 
-        if request.category:
-            cur.execute(
-                f"""
-                SELECT id, title, description, category, tags, raw_data,
-                       1 - ({embedding_field} <=> %s::vector) as similarity
-                FROM ingested_records
-                WHERE status = 'active'
-                  AND category = %s
-                  AND {embedding_field} IS NOT NULL
-                ORDER BY {embedding_field} <=> %s::vector
-                LIMIT %s
-                """,
-                (query_embedding, request.category, query_embedding, request.top_k)
-            )
-        else:
-            cur.execute(
-                f"""
-                SELECT id, title, description, category, tags, raw_data,
-                       1 - ({embedding_field} <=> %s::vector) as similarity
-                FROM ingested_records
-                WHERE status = 'active'
-                  AND {embedding_field} IS NOT NULL
-                ORDER BY {embedding_field} <=> %s::vector
-                LIMIT %s
-                """,
-                (query_embedding, query_embedding, request.top_k)
-            )
+@app.post("/search/records/batch", response_model=List[List[IngestedSearchResult]], tags=["Product Search"],
+    summary="Search product records for many queries",
+    description=f"""Runs `/search/records` for up to {BATCH_QUERY_MAX} queries (`BATCH_QUERY_MAX`) in one call, with the same options applied to every query.
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
+All queries are embedded in one forward pass, and all the lookups run as one SQL statement, a `LATERAL` join over the array of query vectors, so each query still gets its own HNSW index scan. Returns one result list per query, in the order of `queries`.""",
+    response_description="One ranked result list per query")
+async def search_ingested_records_batch(request: IngestedBatchSearchRequest):
+    """Search ingested records for several queries at once."""
+    require_models("embedder")
+    set_metric_label("search_field", request.search_field)
+    queries = _batch_queries(request.queries)
 
-        return [
-            IngestedSearchResult(
-                id=r['id'],
-                title=r['title'],
-                description=r['description'],
-                category=r['category'],
-                tags=r['tags'],
-                raw_data=r['raw_data'] or {},
-                similarity=float(r['similarity'])
-            )
-            for r in results
-        ]
+    try:
+        query_embeddings = await embed_queries(queries)
+
+        groups, weights, path = await ingested_search_rows(request, query_embeddings, queries)
+
+        fields = result_fields(request.fields, IngestedSearchResult)
+        return FastJSONResponse([[_ingested_result(r, weights, fields) for r in group] for group in groups],
+                                headers={"X-Search-Path": path})
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Ingested search error: {e}")
+        logger.error(f"Batch ingested search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.get("/search/routing", tags=["Product Search"], summary="Search routing statistics",
+    description=f"""How filtered vector searches are being routed, across `/search/records` and `/legal/search`.
+
+Each search is routed to one path, reported in its `X-Search-Path` response header:
+- `exact` — the filter matches at most {EXACT_SEARCH_MAX_ROWS} rows (`EXACT_SEARCH_MAX_ROWS`), so they are scanned and ranked exactly
+- `partial` — a partial HNSW index covers the filter value
+- `global` — the table's HNSW index, with `hnsw.ef_search` raised in proportion to the filter's selectivity
+- `memory` — exact search on the in-process index (`MEMORY_INDEX_ENABLED`, tables of at most `MEMORY_INDEX_MAX_ROWS` rows), kept in sync through `LISTEN`/`NOTIFY`; `memory_index` reports what it holds, including the BM25 keyword index (`KEYWORD_INDEX_ENABLED`) that ranks the keyword side of hybrid legal search on either path
+
+Returns per-table row counts, the partial indexes in use, the most frequent filter values and whether they are indexed, and query counts per path. With `PARTIAL_INDEX_AUTO_CREATE` on, a partial index is built (`CREATE INDEX CONCURRENTLY`) for a filter value used at least `PARTIAL_INDEX_MIN_QUERIES` times.""",
+    response_description="Routing configuration, partial indexes, filter usage, and path counts")
+def search_routing():
+    """Search routing statistics."""
+    if search_router is None:
+        raise HTTPException(status_code=503, detail="Search router not started")
+    return {**search_router.stats(), "memory_index": memory_index.stats() if memory_index is not None else None}
+
+
 # ============================================================
 # Ingestion Management
 # ============================================================
@@ -794,26 +4705,21 @@ async def search_ingested_records(request: IngestedSearchRequest):
 @app.get("/ingestion/jobs", tags=["Ingestion"], summary="List ingestion jobs",
     description="List recent product data ingestion jobs with status, row counts, and timestamps.",
     response_description="List of ingestion job records")
-async def list_ingestion_jobs(limit: int = 20):
+def list_ingestion_jobs(limit: int = 20):
     """List recent ingestion jobs."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute(
-            """
-            SELECT job_id, source_file, status, total_rows, processed_rows,
-                   failed_rows, started_at, completed_at, created_at
-            FROM ingestion_jobs
-            ORDER BY created_at DESC
-            LIMIT %s
-            """,
-            (limit,)
-        )
-
-        jobs = cur.fetchall()
-        cur.close()
-        conn.close()
+        with get_db_cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT job_id, source_file, status, total_rows, processed_rows,
+                       failed_rows, started_at, completed_at, created_at
+                FROM ingestion_jobs
+                ORDER BY created_at DESC
+                LIMIT %s
+                """,
+                (limit,)
+            )
+            jobs = cur.fetchall()
 
         return [dict(j) for j in jobs]
     except Exception as e:
@@ -824,28 +4730,23 @@ async def list_ingestion_jobs(limit: int = 20):
 @app.get("/ingestion/stats", tags=["Ingestion"], summary="Get ingestion statistics",
     description="Returns aggregate statistics: total records, files, categories, and ingestion date range.",
     response_description="Ingestion statistics summary")
-async def get_ingestion_stats():
+def get_ingestion_stats():
     """Get overall ingestion statistics."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute(
-            """
-            SELECT
-                COUNT(*) as total_records,
-                COUNT(DISTINCT source_file) as total_files,
-                COUNT(DISTINCT category) as total_categories,
-                MIN(ingested_at) as earliest_ingestion,
-                MAX(ingested_at) as latest_ingestion
-            FROM ingested_records
-            WHERE status = 'active'
-            """
-        )
-
-        stats = cur.fetchone()
-        cur.close()
-        conn.close()
+        with get_db_cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT
+                    COUNT(*) as total_records,
+                    COUNT(DISTINCT source_file) as total_files,
+                    COUNT(DISTINCT category) as total_categories,
+                    MIN(ingested_at) as earliest_ingestion,
+                    MAX(ingested_at) as latest_ingestion
+                FROM ingested_records
+                WHERE status = 'active'
+                """
+            )
+            stats = cur.fetchone()
 
         return dict(stats)
     except Exception as e:
@@ -856,15 +4757,12 @@ async def get_ingestion_stats():
 @app.get("/ingestion/records/count", tags=["Ingestion"], summary="Get ingested record count",
     description="Returns the total number of active ingested product records.",
     response_description="Record count")
-async def get_ingested_record_count():
+def get_ingested_record_count():
     """Get count of ingested records."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-        cur.execute("SELECT COUNT(*) FROM ingested_records WHERE status = 'active'")
-        count = cur.fetchone()[0]
-        cur.close()
-        conn.close()
+        with get_db_cursor() as cur:
+            cur.execute("SELECT COUNT(*) FROM ingested_records WHERE status = 'active'")
+            count = cur.fetchone()[0]
         return {"count": count}
     except Exception as e:
         logger.error(f"Error getting count: {e}")
@@ -878,31 +4776,26 @@ async def get_ingested_record_count():
 @app.get("/debug/documents", tags=["Debug"], summary="Debug document embeddings",
     description="Check document count, embedding dimensions, and sample content for troubleshooting.",
     response_description="Debug information about stored documents")
-async def debug_documents():
+def debug_documents():
     """Debug: Check document embeddings."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute("""
-            SELECT
-                id,
-                LEFT(content, 50) as content_preview,
-                embedding IS NOT NULL as has_embedding,
-                CASE WHEN embedding IS NOT NULL
-                     THEN vector_dims(embedding)
-                     ELSE NULL
-                END as embedding_dims
-            FROM documents
-            ORDER BY id DESC
-            LIMIT 10
-        """)
-
-        columns = [desc[0] for desc in cur.description]
-        results = [dict(zip(columns, row)) for row in cur.fetchall()]
-
-        cur.close()
-        conn.close()
+        with get_db_cursor() as cur:
+            cur.execute("""
+                SELECT
+                    id,
+                    LEFT(content, 50) as content_preview,
+                    embedding IS NOT NULL as has_embedding,
+                    CASE WHEN embedding IS NOT NULL
+                         THEN vector_dims(embedding)
+                         ELSE NULL
+                    END as embedding_dims
+                FROM documents
+                ORDER BY id DESC
+                LIMIT 10
+            """)
+
+            columns = [desc[0] for desc in cur.description]
+            results = [dict(zip(columns, row)) for row in cur.fetchall()]
 
         return {"documents": results}
     except Exception as e:
@@ -914,34 +4807,34 @@ async def debug_documents():
     response_description="Test search results with similarity scores")
 async def debug_search_test():
     """Debug: Test vector search directly."""
+    require_models("embedder")
     try:
         test_query = "pets and animals"
-        query_embedding = get_embedding(test_query)
-
-        conn = get_db_connection()
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT
-                id,
-                LEFT(content, 50) as content_preview,
-                (embedding <=> %s::vector) as cosine_distance
-            FROM documents
-            ORDER BY embedding <=> %s::vector
-            LIMIT 5
-            """,
-            (query_embedding, query_embedding)
-        )
+        query_embedding = await embed_query(test_query)
+
+        def run_test_search():
+            with get_db_cursor() as cur:
+                cur.execute(
+                    """
+                    SELECT
+                        id,
+                        LEFT(content, 50) as content_preview,
+                        (embedding <=> %s::vector) as cosine_distance
+                    FROM documents
+                    ORDER BY embedding <=> %s::vector
+                    LIMIT 5
+                    """,
+                    (query_embedding, query_embedding)
+                )
 
-        columns = [desc[0] for desc in cur.description]
-        results = [dict(zip(columns, row)) for row in cur.fetchall()]
+                columns = [desc[0] for desc in cur.description]
+                results = [dict(zip(columns, row)) for row in cur.fetchall()]
 
-        cur.execute("SELECT vector_dims(embedding) FROM documents LIMIT 1")
-        db_dims = cur.fetchone()[0]
+                cur.execute("SELECT vector_dims(embedding) FROM documents LIMIT 1")
+                db_dims = cur.fetchone()[0]
+            return results, db_dims
 
-        cur.close()
-        conn.close()
+        results, db_dims = await run_in_threadpool(run_test_search)
 
         return {
             "query": test_query,
@@ -958,38 +4851,191 @@ async def debug_search_test():
 # Legal Document Endpoints
 # ============================================================
 
-@app.post("/legal/ingest", tags=["Legal Documents"], summary="Ingest legal documents",
-    description="""Ingest legal-documents.csv into the legal_documents table.
+LEGAL_DOCUMENT_COLUMNS = [
+    "doc_id", "doc_type", "title", "citation", "jurisdiction", "date_decided",
+    "court", "content", "headnotes", "practice_area", "status",
+    "title_embedding", "content_embedding", "headnote_embedding", "content_hash",
+]
+LEGAL_DOCUMENT_COPY_TYPES = [
+    "text", "text", "text", "text", "text", "date",
+    "text", "text", "text", "text", "text",
+    "vector", "vector", "vector", "text",
+]
 
-Drops and recreates the table, then processes all 58 documents:
-- Generates **triple embeddings** (content, title, headnote) using ModernBERT (768-dim)
-- Creates HNSW indexes (m=16, ef_construction=64) for each embedding column
-- Creates GIN index on tsvector column for full-text search
-- Processes documents in batches of 10""",
-    response_description="Ingestion summary with document count")
-async def ingest_legal_documents():
-    """Ingest legal-documents.csv into the legal_documents table."""
-    if legal_embedder is None:
-        raise HTTPException(status_code=503, detail="Legal embedding model not loaded")
+# HNSW index names per precision (see HALFVEC_TABLES); migrate_halfvec.py builds the halfvec ones
+LEGAL_HNSW_INDEX_NAMES = {
+    "full": {"title_embedding": "idx_legal_title_hnsw", "content_embedding": "idx_legal_content_hnsw",
+             "headnote_embedding": "idx_legal_headnote_hnsw"},
+    "half": {"title_embedding": "idx_legal_title_halfvec", "content_embedding": "idx_legal_content_halfvec",
+             "headnote_embedding": "idx_legal_headnote_halfvec"},
+}
+
+LEGAL_INDEX_STATEMENTS = [
+    f"CREATE INDEX IF NOT EXISTS {name} ON legal_documents USING hnsw ({hnsw_index_key('legal_documents', column)}) WITH (m = 16, ef_construction = 64)"
+    for column, name in LEGAL_HNSW_INDEX_NAMES[vector_precision("legal_documents")].items()
+] + [
+    "CREATE INDEX IF NOT EXISTS idx_legal_title_fts ON legal_documents USING gin(title_tsv)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_content_fts ON legal_documents USING gin(content_tsv)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_jurisdiction ON legal_documents(jurisdiction)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_doc_type ON legal_documents(doc_type)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_practice_area ON legal_documents(practice_area)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_status ON legal_documents(status)",
+    "CREATE INDEX IF NOT EXISTS idx_legal_date ON legal_documents(date_decided)",
+]
 
-    try:
-        import csv
+# Ingest jobs live in the legal_ingest_jobs table, so any worker can report
+# on a job another one runs; the session advisory lock below is held by
+# the running job's own connection, so at most one ingest runs across all
+# workers and tasks, and a worker that dies releases it
+LEGAL_INGEST_JOBS_TABLE = """
+    CREATE TABLE IF NOT EXISTS legal_ingest_jobs (
+        job_id VARCHAR(64) PRIMARY KEY,
+        status VARCHAR(20) NOT NULL,
+        stage VARCHAR(20),
+        counts JSONB NOT NULL DEFAULT '{}',
+        timings_ms JSONB NOT NULL DEFAULT '{}',
+        error TEXT,
+        created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+        finished_at TIMESTAMPTZ
+    )
+"""
+LEGAL_INGEST_LOCK = "hashtext('legal_ingest')"
+LEGAL_INGEST_JOBS_KEPT = 20
+
+legal_ingest_tasks = {}   # job_id -> asyncio.Task, for jobs running in this worker
+
+
+class LegalIngestJob:
+    """State of one background /legal/ingest run, saved to legal_ingest_jobs.
+
+    conn is the job's dedicated connection; it holds the legal_ingest
+    advisory lock until finish() closes it.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.job_id = str(uuid.uuid4())
+        self.status = "queued"
+        self.stage = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self.counts = {}
+        self.timings_ms = {}
+        self.error = None
+        self._stage_started = None
+
+    async def start_stage(self, stage: str):
+        self.end_stage()
+        self.stage = stage
+        self._stage_started = time.perf_counter()
+        logger.info(f"Legal ingest {self.job_id}: {stage}")
+        await run_in_threadpool(self.save)
+
+    def end_stage(self):
+        if self.stage is not None and self._stage_started is not None:
+            self.timings_ms[self.stage] = round((time.perf_counter() - self._stage_started) * 1000, 1)
+            self._stage_started = None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "status": self.status,
+            "stage": self.stage,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "counts": self.counts,
+            "timings_ms": self.timings_ms,
+            "error": self.error,
+        }
 
-        csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legal-documents.csv")
-        if not os.path.exists(csv_path):
-            raise HTTPException(status_code=404, detail="legal-documents.csv not found. Run generate_legal_data.py first.")
+    def save(self):
+        with self.conn.cursor() as cur:
+            cur.execute("""
+                UPDATE legal_ingest_jobs
+                SET status = %s, stage = %s, counts = %s, timings_ms = %s, error = %s,
+                    finished_at = to_timestamp(%s)
+                WHERE job_id = %s
+            """, (self.status, self.stage, json.dumps(self.counts), json.dumps(self.timings_ms), self.error,
+                  self.finished_at, self.job_id))
+
+    def finish(self):
+        """Save the final state and release the ingest lock."""
+        try:
+            self.save()
+        except Exception as e:
+            logger.error(f"Could not save legal ingest {self.job_id}: {e}")
+        finally:
+            self.conn.close()
 
-        with open(csv_path, "r", encoding="utf-8") as f:
-            reader = csv.DictReader(f)
-            rows = list(reader)
 
-        conn = get_db_connection()
-        cur = conn.cursor()
+def _claim_legal_ingest() -> Optional[LegalIngestJob]:
+    """A new queued job holding the legal_ingest lock, or None if another ingest holds it."""
+    conn = get_db_connection()
+    conn.autocommit = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(f"SELECT pg_try_advisory_lock({LEGAL_INGEST_LOCK})")
+            if not cur.fetchone()[0]:
+                conn.close()
+                return None
+            cur.execute(LEGAL_INGEST_JOBS_TABLE)
+            # Nobody else holds the lock, so jobs still marked active died with their worker
+            cur.execute("""
+                UPDATE legal_ingest_jobs SET status = 'failed', error = 'interrupted: worker exited', finished_at = NOW()
+                WHERE status IN ('queued', 'running')
+            """)
+            job = LegalIngestJob(conn)
+            cur.execute("""
+                INSERT INTO legal_ingest_jobs (job_id, status, created_at) VALUES (%s, %s, to_timestamp(%s))
+            """, (job.job_id, job.status, job.created_at))
+            cur.execute("""
+                DELETE FROM legal_ingest_jobs
+                WHERE job_id NOT IN (SELECT job_id FROM legal_ingest_jobs ORDER BY created_at DESC LIMIT %s)
+            """, (LEGAL_INGEST_JOBS_KEPT,))
+        return job
+    except Exception:
+        conn.close()
+        raise
+
 
-        # Drop and recreate table to ensure correct 768-dim columns
-        cur.execute("DROP TABLE IF EXISTS legal_documents CASCADE;")
+def _legal_ingest_job(job_id: Optional[str] = None) -> Optional[dict]:
+    """A job's status from legal_ingest_jobs; without job_id, the most recent active job."""
+    where = "job_id = %s" if job_id else "status IN ('queued', 'running')"
+    try:
+        row = _db_query(f"""
+            SELECT job_id, status, stage, extract(epoch FROM created_at)::float AS created_at,
+                   extract(epoch FROM finished_at)::float AS finished_at, counts, timings_ms, error
+            FROM legal_ingest_jobs WHERE {where}
+            ORDER BY created_at DESC LIMIT 1
+        """, (job_id,) if job_id else None, fetch="one", cursor_factory=RealDictCursor)
+    except psycopg2.errors.UndefinedTable:
+        return None
+    return dict(row) if row else None
+
+
+def _legal_content_hash(row: dict) -> str:
+    """Hash of every ingested field plus the embedding model, so a model change re-embeds."""
+    fields = [LEGAL_EMBED_MODEL_ID] + [row.get(c) or "" for c in LEGAL_DOCUMENT_COLUMNS[:11]]
+    return hashlib.sha256("\x1f".join(fields).encode("utf-8")).hexdigest()
+
+
+def _read_legal_csv(csv_path: str) -> List[dict]:
+    import csv
+
+    with open(csv_path, "r", encoding="utf-8") as f:
+        rows = list(csv.DictReader(f))
+    for row in rows:
+        row["date_decided"] = row.get("date_decided") or None
+        row["status"] = row.get("status", "good_law")
+        row["content_hash"] = _legal_content_hash(row)
+    return rows
+
+
+def _prepare_legal_table() -> dict:
+    """Create legal_documents if missing and return {doc_id: content_hash} for existing rows."""
+    with get_db_cursor(commit=True) as cur:
         cur.execute("""
-            CREATE TABLE legal_documents (
+            CREATE TABLE IF NOT EXISTS legal_documents (
                 id SERIAL PRIMARY KEY,
                 doc_id VARCHAR(50) UNIQUE NOT NULL,
                 doc_type VARCHAR(50) NOT NULL,
@@ -1005,89 +5051,173 @@ async def ingest_legal_documents():
                 title_embedding vector(768),
                 content_embedding vector(768),
                 headnote_embedding vector(768),
+                content_hash VARCHAR(64),
                 created_at TIMESTAMP DEFAULT NOW(),
                 updated_at TIMESTAMP DEFAULT NOW(),
                 title_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(title, ''))) STORED,
                 content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(content, ''))) STORED
             );
         """)
-        conn.commit()
-
-        ingested = 0
-        skipped = 0
-
-        for row in rows:
-            # Generate embeddings using legal-domain ModernBERT model (768-dim)
-            title_emb = get_legal_embedding(row["title"])
-            content_emb = get_legal_embedding(row["content"])
-            headnote_text = row.get("headnotes") or row["title"]
-            headnote_emb = get_legal_embedding(headnote_text)
-
-            # Parse date
-            date_val = row.get("date_decided") or None
-            if date_val == "":
-                date_val = None
+        cur.execute("ALTER TABLE legal_documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)")
+        cur.execute("""
+            SELECT atttypmod FROM pg_attribute
+            WHERE attrelid = 'legal_documents'::regclass AND attname = 'content_embedding'
+        """)
+        dims = cur.fetchone()[0]
+        if dims != 768:
+            raise RuntimeError(f"legal_documents.content_embedding is vector({dims}), expected vector(768); run migrate_schema.py")
+
+        cur.execute("SELECT doc_id, content_hash FROM legal_documents")
+        existing = dict(cur.fetchall())
+
+        # An empty table is not serving anything yet, so bulk-load it without
+        # HNSW indexes (of either precision) and build them afterwards (much
+        # faster than inserting into the graphs row by row)
+        if not existing:
+            for index_name in [n for names in LEGAL_HNSW_INDEX_NAMES.values() for n in names.values()]:
+                cur.execute(f"DROP INDEX IF EXISTS {index_name}")
+    return existing
+
+
+def _upsert_legal_documents(rows: List[dict], keep_doc_ids: List[str]) -> int:
+    """COPY rows into a staging table, then upsert and prune in one transaction.
+
+    Searches see either the old or the new corpus, never a partial load.
+    Returns the number of documents deleted because they left the CSV.
+    """
+    columns = ", ".join(LEGAL_DOCUMENT_COLUMNS)
+    updates = ", ".join(f"{c} = EXCLUDED.{c}" for c in LEGAL_DOCUMENT_COLUMNS[1:])
+    with get_db_cursor(commit=True) as cur:
+        cur.execute(f"""
+            CREATE TEMP TABLE legal_documents_staging ON COMMIT DROP AS
+            SELECT {columns} FROM legal_documents WITH NO DATA
+        """)
+        copy_binary(cur, "legal_documents_staging", LEGAL_DOCUMENT_COLUMNS, LEGAL_DOCUMENT_COPY_TYPES,
+                    (tuple(row.get(c) for c in LEGAL_DOCUMENT_COLUMNS) for row in rows))
+        cur.execute(f"""
+            INSERT INTO legal_documents ({columns})
+            SELECT {columns} FROM legal_documents_staging
+            ON CONFLICT (doc_id) DO UPDATE SET {updates}, updated_at = NOW()
+        """)
+        cur.execute("DELETE FROM legal_documents WHERE NOT (doc_id = ANY(%s))", (keep_doc_ids,))
+        return cur.rowcount
 
-            cur.execute(
-                """
-                INSERT INTO legal_documents
-                    (doc_id, doc_type, title, citation, jurisdiction, date_decided,
-                     court, content, headnotes, practice_area, status,
-                     title_embedding, content_embedding, headnote_embedding)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                """,
-                (
-                    row["doc_id"], row["doc_type"], row["title"], row.get("citation"),
-                    row.get("jurisdiction"), date_val, row.get("court"),
-                    row["content"], row.get("headnotes"), row.get("practice_area"),
-                    row.get("status", "good_law"),
-                    title_emb, content_emb, headnote_emb
-                )
-            )
-            ingested += 1
 
-            if ingested % 10 == 0:
-                conn.commit()
-                logger.info(f"Ingested {ingested} legal documents...")
-
-        conn.commit()
-
-        # Create indexes if they don't exist
-        index_statements = [
-            "CREATE INDEX IF NOT EXISTS idx_legal_title_hnsw ON legal_documents USING hnsw (title_embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_content_hnsw ON legal_documents USING hnsw (content_embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_headnote_hnsw ON legal_documents USING hnsw (headnote_embedding vector_cosine_ops) WITH (m = 16, ef_construction = 64)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_title_fts ON legal_documents USING gin(title_tsv)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_content_fts ON legal_documents USING gin(content_tsv)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_jurisdiction ON legal_documents(jurisdiction)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_doc_type ON legal_documents(doc_type)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_practice_area ON legal_documents(practice_area)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_status ON legal_documents(status)",
-            "CREATE INDEX IF NOT EXISTS idx_legal_date ON legal_documents(date_decided)",
-        ]
-        for stmt in index_statements:
+def _build_legal_indexes(maintenance_workers: int, maintenance_work_mem: str):
+    """Create any missing legal_documents indexes using parallel maintenance workers."""
+    with db_pool.connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SET max_parallel_maintenance_workers = %s", (maintenance_workers,))
+        cur.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+        for stmt in LEGAL_INDEX_STATEMENTS:
             try:
                 cur.execute(stmt)
                 conn.commit()
             except Exception as idx_err:
                 logger.warning(f"Index creation warning: {idx_err}")
                 conn.rollback()
-
         cur.close()
-        conn.close()
 
-        return {
-            "message": f"Ingested {ingested} legal documents, skipped {skipped} (already exist)",
+
+async def _run_legal_ingest(job: LegalIngestJob, csv_path: str):
+    job.status = "running"
+    try:
+        await job.start_stage("read")
+        rows = await run_in_threadpool(_read_legal_csv, csv_path)
+        if not rows:
+            raise RuntimeError("legal-documents.csv has no rows; refusing to prune every document")
+        existing = await run_in_threadpool(_prepare_legal_table)
+
+        await job.start_stage("diff")
+        changed = [r for r in rows if existing.get(r["doc_id"]) != r["content_hash"]]
+        csv_doc_ids = [r["doc_id"] for r in rows]
+        job.counts = {
             "total_in_csv": len(rows),
-            "ingested": ingested,
-            "skipped": skipped
+            "new": sum(1 for r in changed if r["doc_id"] not in existing),
+            "changed": sum(1 for r in changed if r["doc_id"] in existing),
+            "unchanged": len(rows) - len(changed),
+            "deleted": 0,
         }
 
-    except HTTPException:
-        raise
+        # Titles, contents and headnotes of every changed row share one list,
+        # embedded in large batches; each batch is a separate job on the legal
+        # embedder so query embeddings keep flowing during ingestion
+        await job.start_stage("embed")
+        texts = []
+        for r in changed:
+            texts += [r["title"], r["content"], r.get("headnotes") or r["title"]]
+        batch_size = int(os.getenv("LEGAL_INGEST_EMBED_BATCH_SIZE", "64"))
+        vectors = []
+        for b in range(0, len(texts), batch_size):
+            vectors.extend(await legal_embedder_executor.run(get_legal_embeddings, texts[b:b + batch_size]))
+            job.counts["embedded_texts"] = len(vectors)
+            await run_in_threadpool(job.save)
+        for n, r in enumerate(changed):
+            r["title_embedding"], r["content_embedding"], r["headnote_embedding"] = vectors[3 * n:3 * n + 3]
+
+        await job.start_stage("load")
+        job.counts["deleted"] = await run_in_threadpool(_upsert_legal_documents, changed, csv_doc_ids)
+        if (changed or job.counts["deleted"]) and legal_answer_cache is not None:
+            legal_answer_cache.invalidate("legal ingest")
+
+        await job.start_stage("index")
+        await run_in_threadpool(
+            _build_legal_indexes,
+            int(os.getenv("LEGAL_INGEST_MAINTENANCE_WORKERS", "4")),
+            os.getenv("LEGAL_INGEST_MAINTENANCE_WORK_MEM", "512MB"),
+        )
+        job.end_stage()
+        job.status = "completed"
     except Exception as e:
+        job.end_stage()
         logger.error(f"Legal ingestion error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        job.status = "failed"
+        job.error = str(e)
+    finally:
+        job.finished_at = time.time()
+        await run_in_threadpool(job.finish)
+        legal_ingest_tasks.pop(job.job_id, None)
+
+
+@app.post("/legal/ingest", status_code=202, tags=["Legal Documents"], summary="Ingest legal documents",
+    description="""Start a background ingestion of legal-documents.csv into the legal_documents table.
+
+Returns immediately with a `job_id`; poll `GET /legal/ingest/{job_id}` for progress. Ingestion is incremental and never drops the live table:
+- Each row is hashed; only **new or changed** rows (and rows after an embedding model change) are re-embedded
+- Generates **triple embeddings** (content, title, headnote) using ModernBERT (768-dim) in large batched encode calls
+- Bulk-loads changed rows with `COPY` into a staging table, then upserts them and deletes documents no longer in the CSV in one transaction
+- Creates any missing HNSW (m=16, ef_construction=64; on `halfvec` casts with `LEGAL_VECTOR_PRECISION=half`), GIN and B-tree indexes afterwards with parallel maintenance workers
+
+Only one ingestion runs at a time across all workers (409 if one is in progress); job status is stored in the `legal_ingest_jobs` table, so any worker can answer the status poll.""",
+    response_description="Ingestion job id and status")
+async def ingest_legal_documents():
+    """Start a background ingestion of legal-documents.csv."""
+    require_models("legal_embedder")
+
+    csv_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "legal-documents.csv")
+    if not os.path.exists(csv_path):
+        raise HTTPException(status_code=404, detail="legal-documents.csv not found. Run generate_legal_data.py first.")
+
+    job = await run_in_threadpool(_claim_legal_ingest)
+    if job is None:
+        running = await run_in_threadpool(_legal_ingest_job)
+        job_id = running["job_id"] if running else "in another worker"
+        raise HTTPException(status_code=409, detail=f"Legal ingestion {job_id} is already in progress")
+
+    legal_ingest_tasks[job.job_id] = asyncio.create_task(_run_legal_ingest(job, csv_path))
+
+    return {**job.to_dict(), "status_url": f"/legal/ingest/{job.job_id}"}
+
+
+@app.get("/legal/ingest/{job_id}", tags=["Legal Documents"], summary="Get legal ingestion status",
+    description="Returns the status, current stage, row counts (new, changed, unchanged, deleted) and per-stage timings of a legal ingestion job.",
+    response_description="Ingestion job status")
+async def get_legal_ingest_status(job_id: str):
+    """Get the status of a legal ingestion job."""
+    job = await run_in_threadpool(_legal_ingest_job, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Ingestion job '{job_id}' not found")
+    return job
 
 
 def _build_legal_filters(request):
@@ -1117,6 +5247,222 @@ def _build_legal_filters(request):
     return where_clause, params
 
 
+LEGAL_VECTOR_FIELDS = {"content": "content_embedding", "title": "title_embedding", "headnotes": "headnote_embedding"}
+
+
+def _legal_predicates(request: LegalSearchOptions):
+    """The request's equality / exclusion filters as SearchRouter predicates."""
+    predicates = [(column, "=", getattr(request, column))
+                  for column in ("jurisdiction", "doc_type", "practice_area") if getattr(request, column)]
+    if request.status_filter == "exclude_overruled":
+        predicates.append(("status", "!=", "overruled"))
+    return predicates
+
+
+def _legal_search_sql(request: LegalSearchOptions, keyword_ids: bool = False):
+    """(sql, params, weights, route) for a legal_documents search; the caller adds query_vec and query_text.
+
+    weights is set for multi search (see multi_vector_search_sql), else
+    None; route is the SearchRoute already applied to sql. Only the
+    columns behind request.fields are selected. With keyword_ids, hybrid
+    search takes its keyword ranks from %(keyword_ids)s (KeywordTable.top
+    ids, best first) instead of ts_rank, which the caller adds too.
+    """
+    fields = result_fields(request.fields, LegalSearchResult)
+    filter_clause, filter_params = _build_legal_filters(request)
+
+    weights = None
+    if request.search_field == "multi":
+        # MULTI-VECTOR SEARCH: every embedding column in one statement, fused
+        weights = _multi_vector_weights(request.field_weights, LEGAL_VECTOR_FIELDS)
+        sql, multi_params = multi_vector_search_sql(
+            "legal_documents", select_list(fields, LEGAL_RESULT_COLUMNS, "d"),
+            LEGAL_VECTOR_FIELDS, weights, filter_clause, request.fusion, request.candidates,
+        )
+        filter_params.update(multi_params, top_k=request.top_k)
+    elif request.search_field == "hybrid":
+        # HYBRID SEARCH: semantic + keyword with Reciprocal Rank Fusion
+        filter_params["top_k"] = request.top_k
+        columns = select_list(fields, LEGAL_RESULT_COLUMNS)
+        merged = ",\n                ".join(
+            f"COALESCE(s.{field}, k.{field}) as {field}" for field in projected_columns(fields, LEGAL_RESULT_COLUMNS)
+        )
+        if keyword_ids:
+            # Ranked in process by BM25: fetch the rows by primary key, rechecking the filters
+            keyword = f"""
+                SELECT {columns}, k.kw_rank
+                FROM unnest(%(keyword_ids)s::int[]) WITH ORDINALITY AS k(id, kw_rank)
+                JOIN legal_documents USING (id)
+                WHERE {filter_clause}
+            """
+        else:
+            keyword = f"""
+                SELECT {columns},
+                       ts_rank(content_tsv, plainto_tsquery('english', %(query_text)s)) AS kw_score,
+                       ROW_NUMBER() OVER (
+                           ORDER BY ts_rank(content_tsv, plainto_tsquery('english', %(query_text)s)) DESC
+                       ) AS kw_rank
+                FROM legal_documents
+                WHERE content_tsv @@ plainto_tsquery('english', %(query_text)s)
+                  AND {filter_clause}
+                LIMIT {HYBRID_CANDIDATES}
+            """
+
+        sql = f"""
+            WITH semantic AS (
+                SELECT {", ".join(projected_columns(fields, LEGAL_RESULT_COLUMNS))},
+                       1 - distance AS similarity,
+                       ROW_NUMBER() OVER (ORDER BY distance) AS sem_rank
+                FROM ({nearest_sql("legal_documents", "content_embedding", columns, filter_clause, HYBRID_CANDIDATES)}
+                ) nearest
+            ),
+            keyword AS ({keyword})
+            SELECT
+                {merged},
+                COALESCE(s.similarity, 0) as similarity,
+                COALESCE(1.0/({HYBRID_RRF_K} + s.sem_rank), 0) + COALESCE(1.0/({HYBRID_RRF_K} + k.kw_rank), 0) AS rrf_score,
+                CASE
+                    WHEN s.id IS NOT NULL AND k.id IS NOT NULL THEN 'hybrid'
+                    WHEN s.id IS NOT NULL THEN 'semantic'
+                    ELSE 'keyword'
+                END as search_method
+            FROM semantic s
+            FULL OUTER JOIN keyword k ON s.id = k.id
+            ORDER BY {HYBRID_RANK_ORDER}
+            LIMIT %(top_k)s
+        """
+    else:
+        # SEMANTIC SEARCH on specified field
+        filter_params["top_k"] = request.top_k
+
+        embedding_col = {
+            "title": "title_embedding",
+            "headnotes": "headnote_embedding",
+        }.get(request.search_field, "content_embedding")
+
+        sql = f"""
+            SELECT {", ".join(projected_columns(fields, LEGAL_RESULT_COLUMNS))},
+                   1 - distance AS similarity,
+                   'semantic' as search_method
+            FROM ({nearest_sql("legal_documents", embedding_col, select_list(fields, LEGAL_RESULT_COLUMNS),
+                               filter_clause, "%(top_k)s")}
+            ) nearest
+            ORDER BY {SEARCH_RANK_ORDER}
+        """
+
+    if weights:
+        route = route_search("legal_documents", [LEGAL_VECTOR_FIELDS[f] for f in weights],
+                             _legal_predicates(request), request.candidates)
+    else:
+        # Hybrid searches content with a fixed HYBRID_CANDIDATES semantic leg
+        route = route_search("legal_documents", [LEGAL_VECTOR_FIELDS.get(request.search_field, "content_embedding")],
+                             _legal_predicates(request),
+                             HYBRID_CANDIDATES if request.search_field == "hybrid" else request.top_k)
+    return route.setup + sql, filter_params, weights, route
+
+
+def _legal_result(r, weights: Optional[Dict[str, float]], fields: List[str]) -> dict:
+    """A LegalSearchResult as a dict holding only the projected fields."""
+    result = {}
+    for field in fields:
+        if field == "similarity":
+            result[field] = float(r.get("similarity", 0))
+        elif field == "search_method":
+            result[field] = r.get("search_method", "semantic")
+        elif field == "field_scores":
+            result[field] = _field_scores(r, weights) if weights else None
+        elif field == "content_snippet":
+            result[field] = r.get("content_snippet", "")
+        else:
+            result[field] = r.get(field)
+    return result
+
+
+def _legal_keyword_ids(keywords: KeywordTable, request: LegalSearchOptions, queries: List[str]) -> List[List[int]]:
+    """Ids of the top HYBRID_CANDIDATES BM25 matches per query, best first, within the request's filters."""
+    with timed_stage("keyword_search"):
+        mask = keywords.mask(_legal_predicates(request), request.date_from, request.date_to)
+        return [keywords.top(query, mask, HYBRID_CANDIDATES) for query in queries]
+
+
+def _memory_legal_search(table: MemoryTable, request: LegalSearchOptions, query_vecs: np.ndarray,
+                         keyword_ids: Optional[List[List[int]]]):
+    """(groups, weights) for a legal_documents search on the in-memory index; hybrid needs keyword_ids."""
+    with timed_stage("memory_search"):
+        mask = table.mask(_legal_predicates(request), request.date_from, request.date_to)
+        if request.search_field == "hybrid":
+            return table.hybrid("content_embedding", mask, query_vecs, keyword_ids, request.top_k), None
+        if request.search_field == "multi":
+            weights = _multi_vector_weights(request.field_weights, LEGAL_VECTOR_FIELDS)
+            return table.multi(LEGAL_VECTOR_FIELDS, weights, mask, query_vecs,
+                               request.fusion, request.candidates, request.top_k), weights
+        column = LEGAL_VECTOR_FIELDS.get(request.search_field, "content_embedding")
+        return table.semantic(column, mask, query_vecs, request.top_k), None
+
+
+async def legal_search_rows(request: LegalSearchOptions, query_vecs, queries: List[str]):
+    """(groups, weights, path): ranked rows for each query.
+
+    Hybrid search ranks its keyword side with the in-memory BM25 index
+    whenever that holds legal_documents. Every mode is then served from
+    the in-memory vector index when it holds legal_documents; otherwise
+    the search runs as one SQL statement (batch_search_sql for several
+    queries), with the BM25 ids passed in. path is the X-Search-Path value.
+    """
+    keyword_ids = None
+    keywords = keyword_table("legal_documents") if request.search_field == "hybrid" else None
+    if keywords is not None:
+        keyword_ids = await run_in_threadpool(_legal_keyword_ids, keywords, request, queries)
+
+    table = memory_table("legal_documents")
+    if table is not None and (request.search_field != "hybrid" or keyword_ids is not None):
+        groups, weights = await run_in_threadpool(_memory_legal_search, table, request, _unit_rows(query_vecs),
+                                                  keyword_ids)
+        count_search_path("legal_documents", "memory")
+        return groups, weights, f"memory; rows={len(table)}"
+
+    sql, params, weights, route = _legal_search_sql(request, keyword_ids=keyword_ids is not None)
+    if len(query_vecs) == 1:
+        params.update(query_vec=query_vecs[0], query_text=queries[0])
+        if keyword_ids is not None:
+            params["keyword_ids"] = keyword_ids[0]
+        groups = [await db_fetchall(sql, params, cursor_factory=RealDictCursor)]
+    else:
+        params.update(query_vecs=list(query_vecs), query_texts=queries)
+        if keyword_ids is not None:
+            params["keyword_id_lists"] = ["{" + ",".join(map(str, ids)) + "}" for ids in keyword_ids]
+        rank_order = HYBRID_RANK_ORDER if request.search_field == "hybrid" else SEARCH_RANK_ORDER
+        rows = await db_fetchall(batch_search_sql(sql, rank_order), params, cursor_factory=RealDictCursor)
+        groups = group_batch_rows(rows, len(queries))
+    return groups, weights, route.header + ("; keywords=bm25" if keyword_ids is not None else "")
+
+
+async def run_legal_search(request: LegalSearchRequest, query_embedding: Optional[np.ndarray] = None):
+    """Search legal documents with semantic, keyword, or hybrid search and metadata filters.
+
+    Pass query_embedding if the caller has already embedded request.query.
+    Returns (results, path): result dicts projected to request.fields,
+    and the X-Search-Path value.
+    """
+    require_models("legal_embedder")
+    set_metric_label("search_field", request.search_field)
+
+    try:
+        if query_embedding is None:
+            query_embedding = await embed_legal_query(request.query)
+
+        groups, weights, path = await legal_search_rows(request, [query_embedding], [request.query])
+
+        fields = result_fields(request.fields, LegalSearchResult)
+        return [_legal_result(r, weights, fields) for r in groups[0]], path
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Legal search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+
 @app.post("/legal/search", response_model=List[LegalSearchResult], tags=["Legal Search"],
     summary="Search legal documents",
     description="""Search 58 legal documents using semantic, keyword, or hybrid search.
@@ -1125,132 +5471,80 @@ def _build_legal_filters(request):
 - `content` — Cosine similarity on 768-dim content embeddings (HNSW index)
 - `title` — Cosine similarity on 768-dim title embeddings
 - `headnotes` — Cosine similarity on 768-dim headnote embeddings
-- `hybrid` — **Reciprocal Rank Fusion** combining semantic (content) + full-text keyword search (GIN index)
+- `hybrid` — **Reciprocal Rank Fusion** combining semantic (content) + full-text keyword search (in-process BM25, kept in sync through `LISTEN`/`NOTIFY`; `ts_rank` on the GIN-indexed `content_tsv` with `KEYWORD_INDEX_ENABLED=false` or until the BM25 index has loaded)
+- `multi` — Searches the content, title and headnote embeddings in one query (a bounded HNSW scan per column, `candidates` each) and fuses them with per-request `field_weights`, by weighted RRF (`fusion: "rrf"`) or weighted cosine similarity (`fusion: "score"`)
+
+With `LEGAL_VECTOR_PRECISION=half` the HNSW scans use half-precision (`halfvec`) indexes and fetch `HALFVEC_RESCORE_FACTOR` times as many candidates, which are re-ranked by full-precision cosine similarity; similarities are always full precision.
 
 **Filters**:
 - `jurisdiction` — e.g., CA, NY, US_Supreme_Court, Federal_9th_Circuit
 - `doc_type` — case_law, statute, regulation, practice_guide
 - `practice_area` — employment, constitutional_law, criminal
 - `status_filter` — Set to `exclude_overruled` for Shepard's-style filtering
-- `date_from` / `date_to` — Date range filtering""",
+- `date_from` / `date_to` — Date range filtering
+
+Set `fields` to return only some result fields, e.g. `["doc_id", "title", "citation", "similarity"]`: the other columns (notably the content snippet) are left out of the SQL select list and the response.""",
     response_description="Ranked list of matching legal documents with similarity scores and search method")
 async def search_legal_documents(request: LegalSearchRequest):
     """Search legal documents with semantic, keyword, or hybrid search and metadata filters."""
-    if legal_embedder is None:
-        raise HTTPException(status_code=503, detail="Legal embedding model not loaded")
+    results, path = await run_legal_search(request)
+    return FastJSONResponse(results, headers={"X-Search-Path": path})
+
+
+@app.post("/legal/search/batch", response_model=List[List[LegalSearchResult]], tags=["Legal Search"],
+    summary="Search legal documents for many queries",
+    description=f"""Runs `/legal/search` for up to {BATCH_QUERY_MAX} queries (`BATCH_QUERY_MAX`) in one call, with the same search mode and filters applied to every query.
+
+All queries are embedded in one forward pass, and every search mode (including `hybrid` and `multi`) runs as one SQL statement, a `LATERAL` join over the arrays of query vectors and query texts, so each query still gets its own index scans (with the in-memory index, all modes skip SQL). Returns one result list per query, in the order of `queries`.""",
+    response_description="One ranked result list per query")
+async def search_legal_documents_batch(request: LegalBatchSearchRequest):
+    """Search legal documents for several queries at once."""
+    require_models("legal_embedder")
+    set_metric_label("search_field", request.search_field)
+    queries = _batch_queries(request.queries)
 
     try:
-        filter_clause, filter_params = _build_legal_filters(request)
+        query_embeddings = await embed_legal_queries(queries)
+        groups, weights, path = await legal_search_rows(request, query_embeddings, queries)
 
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
+        fields = result_fields(request.fields, LegalSearchResult)
+        return FastJSONResponse([[_legal_result(r, weights, fields) for r in group] for group in groups],
+                                headers={"X-Search-Path": path})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Batch legal search error: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
 
-        if request.search_field == "hybrid":
-            # HYBRID SEARCH: semantic + keyword with Reciprocal Rank Fusion
-            query_embedding = get_legal_embedding(request.query)
-            filter_params["query_vec"] = query_embedding
-            filter_params["query_text"] = request.query
-            filter_params["top_k"] = request.top_k
-
-            sql = f"""
-                WITH semantic AS (
-                    SELECT id, doc_id, doc_type, title, citation, jurisdiction, court,
-                           practice_area, status, LEFT(content, 300) as content_snippet,
-                           1 - (content_embedding <=> %(query_vec)s::vector) AS similarity,
-                           ROW_NUMBER() OVER (ORDER BY content_embedding <=> %(query_vec)s::vector) AS sem_rank
-                    FROM legal_documents
-                    WHERE {filter_clause}
-                      AND content_embedding IS NOT NULL
-                    LIMIT 20
-                ),
-                keyword AS (
-                    SELECT id, doc_id, doc_type, title, citation, jurisdiction, court,
-                           practice_area, status, LEFT(content, 300) as content_snippet,
-                           ts_rank(content_tsv, plainto_tsquery('english', %(query_text)s)) AS kw_score,
-                           ROW_NUMBER() OVER (
-                               ORDER BY ts_rank(content_tsv, plainto_tsquery('english', %(query_text)s)) DESC
-                           ) AS kw_rank
-                    FROM legal_documents
-                    WHERE content_tsv @@ plainto_tsquery('english', %(query_text)s)
-                      AND {filter_clause}
-                    LIMIT 20
-                )
-                SELECT
-                    COALESCE(s.id, k.id) as id,
-                    COALESCE(s.doc_id, k.doc_id) as doc_id,
-                    COALESCE(s.doc_type, k.doc_type) as doc_type,
-                    COALESCE(s.title, k.title) as title,
-                    COALESCE(s.citation, k.citation) as citation,
-                    COALESCE(s.jurisdiction, k.jurisdiction) as jurisdiction,
-                    COALESCE(s.court, k.court) as court,
-                    COALESCE(s.practice_area, k.practice_area) as practice_area,
-                    COALESCE(s.status, k.status) as status,
-                    COALESCE(s.content_snippet, k.content_snippet) as content_snippet,
-                    COALESCE(s.similarity, 0) as similarity,
-                    COALESCE(1.0/(60 + s.sem_rank), 0) + COALESCE(1.0/(60 + k.kw_rank), 0) AS rrf_score,
-                    CASE
-                        WHEN s.id IS NOT NULL AND k.id IS NOT NULL THEN 'hybrid'
-                        WHEN s.id IS NOT NULL THEN 'semantic'
-                        ELSE 'keyword'
-                    END as search_method
-                FROM semantic s
-                FULL OUTER JOIN keyword k ON s.id = k.id
-                ORDER BY rrf_score DESC
-                LIMIT %(top_k)s
-            """
 
-            cur.execute(sql, filter_params)
+def _check_legal_citations(answer: str, results: List[LegalSearchResult]):
+    """Map bracketed [n] references in an answer to source citations.
 
-        else:
-            # SEMANTIC SEARCH on specified field
-            query_embedding = get_legal_embedding(request.query)
-            filter_params["query_vec"] = query_embedding
-            filter_params["top_k"] = request.top_k
-
-            embedding_col = {
-                "title": "title_embedding",
-                "headnotes": "headnote_embedding",
-            }.get(request.search_field, "content_embedding")
-
-            sql = f"""
-                SELECT id, doc_id, doc_type, title, citation, jurisdiction, court,
-                       practice_area, status, LEFT(content, 300) as content_snippet,
-                       1 - ({embedding_col} <=> %(query_vec)s::vector) AS similarity,
-                       'semantic' as search_method
-                FROM legal_documents
-                WHERE {filter_clause}
-                  AND {embedding_col} IS NOT NULL
-                ORDER BY {embedding_col} <=> %(query_vec)s::vector
-                LIMIT %(top_k)s
-            """
+    Returns (citations_used, faithfulness_note).
+    """
+    citation_refs = re.findall(r'\[(\d+)\]', answer)
+    citations_used = []
+    for ref in set(citation_refs):
+        idx = int(ref) - 1
+        if 0 <= idx < len(results) and results[idx].citation:
+            citations_used.append(results[idx].citation)
 
-            cur.execute(sql, filter_params)
+    if not citation_refs:
+        faithfulness_note = "WARNING: No source citations found in generated answer. Claims may not be grounded."
+    elif len(results) == 0:
+        faithfulness_note = "WARNING: No source documents retrieved. Answer may not be grounded."
+    else:
+        faithfulness_note = f"Answer references {len(set(citation_refs))} source(s) out of {len(results)} retrieved."
 
-        results = cur.fetchall()
-        cur.close()
-        conn.close()
+    return citations_used, faithfulness_note
 
-        return [
-            LegalSearchResult(
-                id=r["id"],
-                doc_id=r["doc_id"],
-                doc_type=r["doc_type"],
-                title=r["title"],
-                citation=r.get("citation"),
-                jurisdiction=r.get("jurisdiction"),
-                court=r.get("court"),
-                practice_area=r.get("practice_area"),
-                status=r.get("status"),
-                content_snippet=r.get("content_snippet", ""),
-                similarity=float(r.get("similarity", 0)),
-                search_method=r.get("search_method", "semantic")
-            )
-            for r in results
-        ]
 
-    except Exception as e:
-        logger.error(f"Legal search error: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+async def _legal_document_content(ids: List[int]) -> Dict[int, str]:
+    """Full content of the given legal_documents rows, keyed by id."""
+    if not ids:
+        return {}
+    rows = await db_fetchall("SELECT id, content FROM legal_documents WHERE id = ANY(%s)", (ids,))
+    return {row[0]: row[1] for row in rows}
 
 
 @app.post("/legal/rag", response_model=LegalRAGResponse, tags=["Legal RAG"],
@@ -1259,19 +5553,47 @@ async def search_legal_documents(request: LegalSearchRequest):
 
 **Pipeline**:
 1. Hybrid search retrieves the top-k most relevant legal authorities
-2. Assembles numbered context with citations, jurisdiction, and document type
+2. Packs numbered sources (citation, jurisdiction, document type and full text) into a `RAG_CONTEXT_TOKENS` prompt budget in rank order, trimming at sentence boundaries; `context` reports the tokens used per source
 3. Phi-3.5 Mini generates an answer using a **legal publisher system prompt** requiring bracketed citations
 4. Extracts citation references from the answer and maps them to source documents
 5. Returns faithfulness assessment (how many sources were actually cited)
 
-**Quality controls**: Overruled authorities excluded by default. System prompt requires `[NEEDS REVIEW]` prefix for uncertain interpretations and `Insufficient sources` when context is inadequate.""",
+**Quality controls**: Overruled authorities excluded by default. System prompt requires `[NEEDS REVIEW]` prefix for uncertain interpretations and `Insufficient sources` when context is inadequate.
+
+**Streaming**: Set `stream: true` to receive a `sources` server-sent event first, then `token` events as the answer is generated, then a `done` event carrying `citations_used` and `faithfulness_note`.
+
+**Caching**: A near-identical question (cosine similarity above `ANSWER_CACHE_THRESHOLD`) with the same filters and `top_k` is answered from cache with `cached: true`. The cache is cleared when a `/legal/ingest` job starts or finishes (within 5 seconds on the other workers).""",
     response_description="Generated legal answer with citations, source documents, and faithfulness assessment")
-async def legal_rag_query(request: LegalRAGRequest):
+async def legal_rag_query(request: LegalRAGRequest, http_request: Request):
     """Legal RAG: retrieve relevant authorities then generate a cited answer."""
-    if llm is None or legal_embedder is None:
-        raise HTTPException(status_code=503, detail="Models not loaded")
+    require_models("generator", "legal_embedder")
 
     try:
+        query_embedding = await embed_legal_query(request.query)
+
+        # Near-identical questions with the same filters reuse a cached answer
+        cache_filters = (request.jurisdiction, request.practice_area, request.exclude_overruled, request.top_k)
+        cached = None
+        if legal_answer_cache is not None:
+            await legal_answer_cache.check_version()
+            cached = legal_answer_cache.lookup(query_embedding, cache_filters)
+        if cached is not None:
+            response = LegalRAGResponse(**cached, query=request.query, cached=True)
+            if request.stream:
+                async def cached_events():
+                    yield sse_event("sources", {"query": request.query, "sources": [r.model_dump() for r in response.sources]})
+                    yield sse_event("token", {"text": response.answer})
+                    yield sse_event("done", {
+                        "answer": response.answer,
+                        "citations_used": response.citations_used,
+                        "faithfulness_note": response.faithfulness_note,
+                        "generation": None,
+                        "cached": True,
+                    })
+
+                return sse_response(cached_events())
+            return response
+
         # Step 1: Search for relevant legal documents using hybrid search
         search_request = LegalSearchRequest(
             query=request.query,
@@ -1281,30 +5603,23 @@ async def legal_rag_query(request: LegalRAGRequest):
             practice_area=request.practice_area,
             status_filter="exclude_overruled" if request.exclude_overruled else None
         )
-        results = await search_legal_documents(search_request)
+        results, _ = await run_legal_search(search_request, query_embedding)
+        results = [LegalSearchResult(**r) for r in results]
 
-        # Step 2: Build context with citation information
-        context_parts = []
-        for i, result in enumerate(results, 1):
+        # Step 2: Pack full document text, with citation information, into the context token budget
+        full_content = await _legal_document_content([r.id for r in results])
+        sources = []
+        for result in results:
             citation_str = f" ({result.citation})" if result.citation else ""
             status_str = f" [STATUS: {result.status}]" if result.status and result.status != "good_law" else ""
-            context_parts.append(
-                f"[{i}] {result.title}{citation_str}{status_str}\n"
-                f"Type: {result.doc_type} | Jurisdiction: {result.jurisdiction}\n"
-                f"{result.content_snippet}"
-            )
-        context = "\n\n".join(context_parts)
+            sources.append((
+                f"{result.title}{citation_str}{status_str}\n"
+                f"Type: {result.doc_type} | Jurisdiction: {result.jurisdiction}\n",
+                full_content.get(result.id, result.content_snippet),
+            ))
+        context, context_stats = await run_in_threadpool(pack_context, sources)
 
         # Step 3: Generate answer using Phi-3.5 Mini with legal-specific system prompt
-        system_prompt = """You are a legal content editor at a major legal publisher.
-
-RULES:
-1. ONLY use information from the provided source documents. Do not add facts from training data.
-2. Every factual claim must include a citation in [brackets] referencing the source number.
-3. If uncertain about any legal interpretation, prefix with [NEEDS REVIEW].
-4. If sources are insufficient to answer the question, say "Insufficient sources" rather than guessing.
-5. Note if any cited authority has been overruled or questioned."""
-
         user_prompt = f"""SOURCES:
 {context}
 
@@ -1313,42 +5628,75 @@ QUESTION: {request.query}
 Provide your answer with citations:"""
 
         # Step 4: Generate answer using Phi-3.5 Mini chat completion
-        output = llm.create_chat_completion(
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
+        messages = [
+            {"role": "system", "content": LEGAL_RAG_SYSTEM_PROMPT},
+            {"role": "user", "content": user_prompt}
+        ]
+
+        if request.stream:
+            token_stream = TokenStream("legal_rag", prefix_key="legal_rag", messages=messages,
+                                       max_tokens=150, temperature=0.3)
+
+            async def events():
+                yield sse_event("sources", {"query": request.query, "sources": [r.model_dump() for r in results]})
+                parts = []
+                async for event in token_stream.sse_tokens(parts):
+                    yield event
+                if token_stream.error is None:
+                    answer = "".join(parts)
+                    citations_used, faithfulness_note = _check_legal_citations(answer, results)
+                    yield sse_event("done", {
+                        "answer": answer,
+                        "citations_used": citations_used,
+                        "faithfulness_note": faithfulness_note,
+                        "generation": token_stream.generation,
+                        "context": context_stats,
+                        "cached": False,
+                    })
+                    if legal_answer_cache is not None:
+                        legal_answer_cache.store(query_embedding, cache_filters, {
+                            "answer": answer,
+                            "sources": [r.model_dump() for r in results],
+                            "citations_used": citations_used,
+                            "faithfulness_note": faithfulness_note,
+                        })
+
+            return sse_response(events())
+
+        output, generation = await run_generation(
+            "legal_rag",
+            prefix_key="legal_rag",
+            request=http_request,
+            messages=messages,
             max_tokens=150,
             temperature=0.3,
         )
 
         answer = output["choices"][0]["message"]["content"]
 
-        # Step 5: Extract citations used from the answer
-        import re
-        citation_refs = re.findall(r'\[(\d+)\]', answer)
-        citations_used = []
-        for ref in set(citation_refs):
-            idx = int(ref) - 1
-            if 0 <= idx < len(results) and results[idx].citation:
-                citations_used.append(results[idx].citation)
-
-        # Step 6: Faithfulness note
-        if not citation_refs:
-            faithfulness_note = "WARNING: No source citations found in generated answer. Claims may not be grounded."
-        elif len(results) == 0:
-            faithfulness_note = "WARNING: No source documents retrieved. Answer may not be grounded."
-        else:
-            faithfulness_note = f"Answer references {len(set(citation_refs))} source(s) out of {len(results)} retrieved."
+        # Step 5: Extract citations used from the answer and assess faithfulness
+        citations_used, faithfulness_note = _check_legal_citations(answer, results)
+
+        if legal_answer_cache is not None:
+            legal_answer_cache.store(query_embedding, cache_filters, {
+                "answer": answer,
+                "sources": [r.model_dump() for r in results],
+                "citations_used": citations_used,
+                "faithfulness_note": faithfulness_note,
+            })
 
         return LegalRAGResponse(
             query=request.query,
             answer=answer,
             sources=results,
             citations_used=citations_used,
-            faithfulness_note=faithfulness_note
+            faithfulness_note=faithfulness_note,
+            generation=generation,
+            context=context_stats
         )
 
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Legal RAG error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -1357,25 +5705,20 @@ Provide your answer with citations:"""
 @app.get("/legal/documents/count", tags=["Legal Documents"], summary="Get legal document count",
     description="Returns the total number of legal documents, grouped by document type (case_law, statute, regulation, practice_guide).",
     response_description="Total count and breakdown by document type")
-async def get_legal_document_count():
+def get_legal_document_count():
     """Get total count of legal documents, grouped by type."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute("""
-            SELECT doc_type, COUNT(*) as count
-            FROM legal_documents
-            GROUP BY doc_type
-            ORDER BY count DESC
-        """)
-        by_type = {r["doc_type"]: r["count"] for r in cur.fetchall()}
-
-        cur.execute("SELECT COUNT(*) as total FROM legal_documents")
-        total = cur.fetchone()["total"]
+        with get_db_cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute("""
+                SELECT doc_type, COUNT(*) as count
+                FROM legal_documents
+                GROUP BY doc_type
+                ORDER BY count DESC
+            """)
+            by_type = {r["doc_type"]: r["count"] for r in cur.fetchall()}
 
-        cur.close()
-        conn.close()
+            cur.execute("SELECT COUNT(*) as total FROM legal_documents")
+            total = cur.fetchone()["total"]
 
         return {"total": total, "by_type": by_type}
 
@@ -1387,26 +5730,22 @@ async def get_legal_document_count():
 @app.get("/legal/documents/{doc_id}", tags=["Legal Documents"], summary="Get legal document by ID",
     description="Retrieve a specific legal document by its doc_id (e.g., 'case-001'). Returns full document including content, citation, jurisdiction, and status.",
     response_description="Full legal document record")
-async def get_legal_document(doc_id: str):
+def get_legal_document(doc_id: str):
     """Get a specific legal document by doc_id."""
     try:
-        conn = get_db_connection()
-        cur = conn.cursor(cursor_factory=RealDictCursor)
-
-        cur.execute(
-            """
-            SELECT id, doc_id, doc_type, title, citation, jurisdiction,
-                   date_decided, court, content, headnotes, practice_area, status,
-                   created_at
-            FROM legal_documents
-            WHERE doc_id = %s
-            """,
-            (doc_id,)
-        )
+        with get_db_cursor(cursor_factory=RealDictCursor) as cur:
+            cur.execute(
+                """
+                SELECT id, doc_id, doc_type, title, citation, jurisdiction,
+                       date_decided, court, content, headnotes, practice_area, status,
+                       created_at
+                FROM legal_documents
+                WHERE doc_id = %s
+                """,
+                (doc_id,)
+            )
 
-        result = cur.fetchone()
-        cur.close()
-        conn.close()
+            result = cur.fetchone()
 
         if result is None:
             raise HTTPException(status_code=404, detail=f"Legal document '{doc_id}' not found")
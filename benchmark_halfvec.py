@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""Benchmark: vector(768) vs halfvec HNSW indexes on legal_documents.
+
+Runs the same nearest-neighbour queries directly against the database
+and reports, per case, recall@k against an exact full-precision scan
+and the p50/p95 query latency (after --warmup queries):
+
+  - exact:              sequential scan, full precision (the ground truth)
+  - vector_hnsw:        the vector(768) HNSW index (LEGAL_VECTOR_PRECISION=full)
+  - halfvec_hnsw:       the halfvec HNSW index, ranked by halfvec distance only
+  - halfvec_rescore_N:  the halfvec HNSW index fetching N * k rows, re-ranked by
+                        full-precision distance (LEGAL_VECTOR_PRECISION=half with
+                        HALFVEC_RESCORE_FACTOR=N)
+
+plus the on-disk size of each HNSW index (what has to stay in shared
+buffers for fast scans). Queries are midpoints of two random stored
+embeddings, so no query is its own nearest neighbour. Cases whose index
+does not exist are reported as skipped; build the halfvec indexes with
+migrate_halfvec.py first.
+
+Usage::
+
+    python benchmark_halfvec.py [--column content_embedding] [--k 10] [--queries 200]
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+import numpy as np
+import psycopg2
+
+from migrate_halfvec import DIMENSIONS, LEGAL_HNSW_INDEXES
+from migrate_schema import get_db_credentials
+
+HNSW_DEFAULT_EF_SEARCH = 40
+
+
+def parse_vector(text):
+    return np.array(text.strip("[]").split(","), dtype=np.float32)
+
+
+def format_vector(vector):
+    return "[" + ",".join(f"{x:.7g}" for x in vector) + "]"
+
+
+def case_sql(column, halfvec, rescore):
+    """ORDER BY ... LIMIT statement returning doc ids, in the shape app.py's nearest_sql uses."""
+    if not halfvec:
+        return f"""
+            SELECT id FROM legal_documents WHERE {column} IS NOT NULL
+            ORDER BY {column} <=> %(query_vec)s::vector LIMIT %(k)s
+        """
+    order = f"{column}::halfvec({DIMENSIONS}) <=> %(query_vec)s::halfvec({DIMENSIONS})"
+    if not rescore:
+        return f"SELECT id FROM legal_documents WHERE {column} IS NOT NULL ORDER BY {order} LIMIT %(k)s"
+    return f"""
+        SELECT id FROM (
+            SELECT id, {column} <=> %(query_vec)s::vector AS distance
+            FROM legal_documents WHERE {column} IS NOT NULL
+            ORDER BY {order} LIMIT {rescore} * %(k)s
+        ) rescored
+        ORDER BY distance LIMIT %(k)s
+    """
+
+
+def run_case(cur, sql, queries, k, warmup, ef_search=None, exact=False):
+    """(ids per query, latencies in ms); each query runs in its own transaction like the API's."""
+    results, timings = [], []
+    for n, query in enumerate(queries[:warmup] + queries):
+        start = time.perf_counter()
+        if exact:
+            cur.execute("SET LOCAL enable_indexscan = off")
+        if ef_search:
+            cur.execute(f"SET LOCAL hnsw.ef_search = {ef_search}")
+        cur.execute(sql, {"query_vec": query, "k": k})
+        ids = [row[0] for row in cur.fetchall()]
+        cur.connection.commit()
+        if n >= warmup:
+            timings.append((time.perf_counter() - start) * 1000)
+            results.append(ids)
+    return results, timings
+
+
+def index_sizes(cur):
+    cur.execute("""
+        SELECT c.relname, pg_relation_size(c.oid)
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE i.indrelid = 'legal_documents'::regclass AND i.indisvalid
+    """)
+    return dict(cur.fetchall())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--column", default="content_embedding", choices=list(LEGAL_HNSW_INDEXES))
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--rescore-factors", type=int, nargs="*", default=[1, 2, 4, 8])
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    creds = get_db_credentials()
+    conn = psycopg2.connect(host=creds['host'], database=creds['database'], user=creds['username'],
+                            password=creds['password'], port=creds['port'])
+    cur = conn.cursor()
+
+    cur.execute(f"SELECT {args.column}::text FROM legal_documents WHERE {args.column} IS NOT NULL")
+    vectors = [parse_vector(row[0]) for row in cur.fetchall()]
+    conn.commit()
+    if len(vectors) < 2:
+        raise SystemExit(f"legal_documents has {len(vectors)} rows with {args.column}; ingest documents first")
+    rng = random.Random(args.seed)
+    queries = [format_vector((a + b) / 2) for a, b in (rng.sample(vectors, 2) for _ in range(args.queries))]
+
+    vector_index, halfvec_index = LEGAL_HNSW_INDEXES[args.column]
+    sizes = index_sizes(cur)
+    conn.commit()
+    cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    pgvector_version = cur.fetchone()[0]
+    conn.commit()
+
+    report = {
+        "column": args.column, "rows": len(vectors), "k": args.k, "queries": args.queries,
+        "pgvector": pgvector_version, "cases": {},
+        "index_bytes": {name: sizes.get(name) for name in (vector_index, halfvec_index)},
+    }
+
+    truth, timings = run_case(cur, case_sql(args.column, False, None), queries, args.k, args.warmup, exact=True)
+
+    def record(name, results, timings):
+        recall = statistics.mean(len(set(got) & set(want)) / max(len(want), 1) for got, want in zip(results, truth))
+        report["cases"][name] = {
+            "recall_at_k": round(recall, 4),
+            "p50_ms": round(statistics.median(timings), 3),
+            "p95_ms": round(np.percentile(timings, 95), 3),
+        }
+
+    record("exact", truth, timings)
+    ef = max(HNSW_DEFAULT_EF_SEARCH, args.k)
+    if vector_index in sizes:
+        record("vector_hnsw", *run_case(cur, case_sql(args.column, False, None), queries, args.k, args.warmup, ef))
+    else:
+        report["cases"]["vector_hnsw"] = {"skipped": f"{vector_index} does not exist"}
+    if halfvec_index in sizes:
+        record("halfvec_hnsw", *run_case(cur, case_sql(args.column, True, None), queries, args.k, args.warmup, ef))
+        for factor in args.rescore_factors:
+            # As SearchRouter does, ef_search covers every row the scan has to yield
+            record(f"halfvec_rescore_{factor}",
+                   *run_case(cur, case_sql(args.column, True, factor), queries, args.k, args.warmup,
+                             max(HNSW_DEFAULT_EF_SEARCH, factor * args.k)))
+    else:
+        report["cases"]["halfvec_hnsw"] = {"skipped": f"{halfvec_index} does not exist (run migrate_halfvec.py)"}
+
+    if sizes.get(vector_index) and sizes.get(halfvec_index):
+        report["index_size_ratio"] = round(sizes[halfvec_index] / sizes[vector_index], 3)
+    cur.close()
+    conn.close()
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
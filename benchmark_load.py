@@ -0,0 +1,601 @@
+#!/usr/bin/env python3
+"""Load test: app.py with stub models against a local Postgres + pgvector.
+
+Measures the serving overhead of app.py (pooling, batching, queueing,
+SQL, serialization) without the GGUF and Hugging Face weights or RDS:
+
+  - The models are replaced by deterministic, fast stubs: StubLlama
+    (installed as the llama_cpp module, so PrefixCachingLlama and the
+    pool run unchanged on top of it), and bag-of-words hashing
+    embedders for MiniLM (tokenizer + model) and the legal
+    SentenceTransformer. --token-ms and --embed-ms add a fixed model
+    time per generated token / embedding batch (default 0).
+  - --seed runs migrate_schema.py and inserts benchmark rows (source
+    'benchmark' / doc_id 'bench-*', replacing earlier benchmark rows
+    only) with stub embeddings, so searches return real results.
+  - The app runs under uvicorn in a subprocess. Each endpoint is driven
+    at every --concurrency level by that many threads with keep-alive
+    connections, --requests requests per level after --warmup.
+
+The report (stdout, or --output) gives p50/p95/p99/mean latency,
+throughput and error rate per endpoint and concurrency as JSON.
+--baseline compares it with a saved report and exits 1 if any endpoint
+got slower than --tolerance allows or started failing;
+benchmark_load_baseline.json is the checked-in baseline
+(--write-baseline replaces it). Latencies depend on the machine, so
+compare runs from the same host; its "config" records the settings and
+CPU count it was taken with.
+
+Not driven: /legal/ingest (a background rebuild from the CSV),
+DELETE /documents/{id} and /debug/*.
+
+Usage::
+
+    DB_HOST=localhost DB_PORT=5433 DB_NAME=llmdb python benchmark_load.py --seed \\
+        [--concurrency 1 8 32] [--requests 200] [--endpoints legal_search rag] \\
+        [--baseline benchmark_load_baseline.json]
+"""
+
+import argparse
+import functools
+import http.client
+import itertools
+import json
+import os
+import platform
+import re
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import types
+import zlib
+
+import numpy as np
+
+BENCH_SOURCE = "benchmark"
+STUB_VOCAB = 4096
+STUB_ANSWER = "According to [1], the sources show that the answer depends on the facts. "
+
+WORDS = (
+    "wireless headphones running shoes blender coffee maker yoga mat laptop stand desk lamp toy robot puzzle "
+    "backpack water bottle kitchen knife office chair phone case garden hose camera tripod"
+).split()
+LEGAL_WORDS = (
+    "employment discrimination reasonable accommodation wrongful termination retaliation whistleblower "
+    "contract breach damages search seizure warrant miranda custody speech due process wage overtime "
+    "harassment hostile environment qualified immunity negligence liability statute regulation appeal"
+).split()
+CATEGORIES = ["Electronics", "Home", "Sports", "Toys", "Office"]
+JURISDICTIONS = ["CA", "NY", "TX", "US_Supreme_Court", "Federal_9th_Circuit"]
+PRACTICE_AREAS = ["employment", "constitutional_law", "criminal", "contracts"]
+DOC_TYPES = ["case_law", "statute", "regulation", "practice_guide"]
+STATUSES = ["good_law", "good_law", "good_law", "questioned", "overruled"]
+
+
+# ============================================================
+# Stub Models
+# ============================================================
+
+def _model_delay(env: str, units: int = 1):
+    seconds = float(os.getenv(env, "0")) * units / 1000
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def _word_ids(text: str, limit: int = 512) -> list:
+    """Stable token ids for the words of text (crc32, so the same across processes)."""
+    return [zlib.crc32(w.encode()) % STUB_VOCAB for w in re.findall(r"\w+", text.lower())[:limit]] or [0]
+
+
+@functools.lru_cache(maxsize=None)
+def _word_table(dims: int) -> np.ndarray:
+    return np.random.default_rng(dims).standard_normal((STUB_VOCAB, dims)).astype(np.float32)
+
+
+def stub_embeddings(texts, dims: int) -> np.ndarray:
+    """Unit mean of per-word random vectors: texts sharing words get similar embeddings."""
+    table = _word_table(dims)
+    vectors = np.stack([table[_word_ids(text)].mean(axis=0) for text in texts])
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+class StubTokenizer:
+    """AutoTokenizer stand-in: word ids, padded, with an attention mask."""
+
+    def __call__(self, texts, padding=True, truncation=True, max_length=512, return_tensors="pt"):
+        import torch
+        ids = [_word_ids(text, max_length) for text in ([texts] if isinstance(texts, str) else texts)]
+        width = max(len(row) for row in ids)
+        input_ids = torch.zeros((len(ids), width), dtype=torch.long)
+        attention_mask = torch.zeros((len(ids), width), dtype=torch.long)
+        for i, row in enumerate(ids):
+            input_ids[i, :len(row)] = torch.tensor(row)
+            attention_mask[i, :len(row)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+
+class StubAutoModel:
+    """MiniLM stand-in: token embeddings looked up from a fixed 384-dim table."""
+
+    def __init__(self):
+        import torch
+        self.table = torch.from_numpy(_word_table(384))
+
+    def eval(self):
+        return self
+
+    def __call__(self, input_ids=None, attention_mask=None, **kwargs):
+        _model_delay("BENCH_STUB_EMBED_MS")
+        return (self.table[input_ids],)
+
+
+class StubSentenceTransformer:
+    """Legal SentenceTransformer stand-in (768-dim)."""
+
+    def __init__(self, *args, **kwargs):
+        pass
+
+    def encode(self, sentences, batch_size=32, normalize_embeddings=False, **kwargs):
+        _model_delay("BENCH_STUB_EMBED_MS")
+        if isinstance(sentences, str):
+            return stub_embeddings([sentences], 768)[0]
+        return stub_embeddings(sentences, 768)
+
+
+class StubLlamaState:
+    def __init__(self, input_ids, n_tokens):
+        self.input_ids = input_ids
+        self.n_tokens = n_tokens
+        self.llama_state_size = n_tokens * 4
+
+
+class StubLlama:
+    """llama_cpp.Llama stand-in: 4-byte tokens, a fixed answer, BENCH_STUB_TOKEN_MS per sampled token.
+
+    Tokens are 4-byte pieces of the UTF-8 text, about the length of real
+    Phi-3.5 tokens, so prompt lengths and the RAG context budget behave
+    realistically. Keeps the KV-cache bookkeeping (n_tokens, _input_ids, prefix reuse in
+    generate, save/load_state) that PrefixCachingLlama relies on, and
+    runs both completion APIs through generate() like llama.cpp does.
+    """
+
+    _pieces = {}     # 4-byte piece -> token id, shared by all instances
+    _by_id = [b"", b""]
+    _pieces_lock = threading.Lock()
+
+    def __init__(self, *args, **kwargs):
+        self.input_ids = np.zeros(0, dtype=np.intc)
+        self.n_tokens = 0
+        self.draft_model = None
+
+    @classmethod
+    def from_pretrained(cls, repo_id=None, filename=None, **kwargs):
+        return cls(**kwargs)
+
+    @property
+    def _input_ids(self):
+        return self.input_ids[:self.n_tokens]
+
+    @staticmethod
+    def longest_token_prefix(a, b):
+        n = 0
+        for x, y in zip(a, b):
+            if x != y:
+                break
+            n += 1
+        return n
+
+    def tokenize(self, text: bytes, add_bos: bool = True, special: bool = False):
+        tokens = [1] if add_bos else []
+        for i in range(0, len(text), 4):
+            piece = text[i:i + 4]
+            token = self._pieces.get(piece)
+            if token is None:
+                with self._pieces_lock:
+                    token = self._pieces.setdefault(piece, len(self._by_id))
+                    if token == len(self._by_id):
+                        self._by_id.append(piece)
+            tokens.append(token)
+        return tokens
+
+    def detokenize(self, tokens) -> bytes:
+        return b"".join(self._by_id[t] for t in tokens)
+
+    def reset(self):
+        self.n_tokens = 0
+
+    def eval(self, tokens):
+        self.input_ids = np.concatenate([self.input_ids[:self.n_tokens], np.asarray(tokens, dtype=np.intc)])
+        self.n_tokens = len(self.input_ids)
+
+    def save_state(self):
+        return StubLlamaState(self.input_ids[:self.n_tokens].copy(), self.n_tokens)
+
+    def load_state(self, state):
+        self.input_ids = state.input_ids.copy()
+        self.n_tokens = state.n_tokens
+
+    def generate(self, tokens, reset: bool = True, **kwargs):
+        tokens = list(tokens)
+        if reset:
+            # Keep the cached prefix shared with the new prompt, as llama.cpp does
+            prefix = self.longest_token_prefix(self._input_ids, tokens[:-1])
+            self.n_tokens = prefix
+            tokens = tokens[prefix:]
+        self.eval(tokens)
+        for token in itertools.cycle(self.tokenize(STUB_ANSWER.encode(), add_bos=False)):
+            if self.draft_model is not None:
+                self.draft_model(self._input_ids)
+            _model_delay("BENCH_STUB_TOKEN_MS")
+            self.eval([token])
+            yield token
+
+    def _sample(self, prompt: str, max_tokens: int):
+        tokens = self.generate(self.tokenize(prompt.encode("utf-8")))
+        for _, token in zip(range(max_tokens), tokens):
+            yield self.detokenize([token]).decode("utf-8", errors="ignore")
+
+    def create_completion(self, prompt, max_tokens=16, stream=False, **kwargs):
+        pieces = self._sample(prompt, max_tokens or 16)
+        if not stream:
+            return {"choices": [{"text": "".join(pieces), "finish_reason": "length"}]}
+        return itertools.chain(
+            ({"choices": [{"text": piece, "finish_reason": None}]} for piece in pieces),
+            [{"choices": [{"text": "", "finish_reason": "length"}]}],
+        )
+
+    def create_chat_completion(self, messages, max_tokens=16, stream=False, **kwargs):
+        prompt = "".join(f"<|{m['role']}|>\n{m['content']}<|end|>\n" for m in messages) + "<|assistant|>\n"
+        pieces = self._sample(prompt, max_tokens or 16)
+        if not stream:
+            return {"choices": [{"message": {"role": "assistant", "content": "".join(pieces)}, "finish_reason": "length"}]}
+        return itertools.chain(
+            [{"choices": [{"delta": {"role": "assistant"}, "finish_reason": None}]}],
+            ({"choices": [{"delta": {"content": piece}, "finish_reason": None}]} for piece in pieces),
+            [{"choices": [{"delta": {}, "finish_reason": "length"}]}],
+        )
+
+
+class StubPromptLookupDecoding:
+    """llama_cpp.llama_speculative.LlamaPromptLookupDecoding stand-in that never drafts."""
+
+    def __init__(self, max_ngram_size: int = 2, num_pred_tokens: int = 10):
+        self.max_ngram_size = max_ngram_size
+        self.num_pred_tokens = num_pred_tokens
+
+    def __call__(self, input_ids, /, **kwargs):
+        return np.empty(0, dtype=np.intc)
+
+
+def import_app_with_stubs():
+    """Import app.py with llama_cpp and the embedding model loaders replaced by the stubs."""
+    llama_cpp = types.ModuleType("llama_cpp")
+    llama_cpp.Llama = StubLlama
+    speculative = types.ModuleType("llama_cpp.llama_speculative")
+    speculative.LlamaPromptLookupDecoding = StubPromptLookupDecoding
+    llama_cpp.llama_speculative = speculative
+    sys.modules["llama_cpp"] = llama_cpp
+    sys.modules["llama_cpp.llama_speculative"] = speculative
+
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app
+    app.AutoTokenizer = types.SimpleNamespace(from_pretrained=lambda *args, **kwargs: StubTokenizer())
+    app.AutoModel = types.SimpleNamespace(from_pretrained=lambda *args, **kwargs: StubAutoModel())
+    app.SentenceTransformer = StubSentenceTransformer
+    return app
+
+
+def serve(port: int):
+    import uvicorn
+    app = import_app_with_stubs()
+    uvicorn.run(app.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ============================================================
+# Benchmark Data
+# ============================================================
+
+def _vector(vec) -> str:
+    return "[" + ",".join(f"{x:.7g}" for x in vec) + "]"
+
+
+def _phrase(words, i: int, n: int) -> str:
+    """The i-th n-word phrase over words; deterministic and rarely repeated."""
+    rng = np.random.default_rng(i)
+    return " ".join(rng.choice(words, size=n, replace=False))
+
+
+def seed_database(products: int, legal_docs: int, documents: int):
+    """Create the schema and replace the benchmark rows."""
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import migrate_schema
+    import psycopg2
+    from psycopg2.extras import Json, execute_values
+
+    migrate_schema.run_migration()
+    creds = migrate_schema.get_db_credentials()
+    conn = psycopg2.connect(host=creds["host"], port=creds["port"], dbname=creds["database"],
+                            user=creds["username"], password=creds["password"])
+    with conn, conn.cursor() as cur:
+        cur.execute("DELETE FROM ingested_records WHERE source_file = %s", (BENCH_SOURCE,))
+        cur.execute("DELETE FROM legal_documents WHERE doc_id LIKE 'bench-%%'")
+        cur.execute("DELETE FROM documents WHERE metadata->>'source' = %s", (BENCH_SOURCE,))
+
+        rows = []
+        for i in range(products):
+            title = _phrase(WORDS, i, 3).title()
+            description = f"A {_phrase(WORDS, i + products, 6)} for everyday use."
+            rows.append((BENCH_SOURCE, i, Json({"title": title, "price": i % 200}), title, description,
+                         CATEGORIES[i % len(CATEGORIES)], ["benchmark"], f"{title} {description}",
+                         _vector(stub_embeddings([description], 384)[0]), _vector(stub_embeddings([title], 384)[0])))
+        execute_values(cur, """
+            INSERT INTO ingested_records (source_file, row_number, raw_data, title, description, category, tags,
+                                          searchable_content, content_embedding, title_embedding)
+            VALUES %s""", rows)
+
+        rows = []
+        for i in range(legal_docs):
+            title = f"Benchmark {i}: {_phrase(LEGAL_WORDS, i, 3)}"
+            content = " ".join(_phrase(LEGAL_WORDS, i * 16 + j, 10).capitalize() + "." for j in range(16))
+            headnotes = _phrase(LEGAL_WORDS, i + legal_docs, 12)
+            rows.append((f"bench-{i:04d}", DOC_TYPES[i % len(DOC_TYPES)], title, f"{i} Bench. {i * 7} ({1950 + i % 70})",
+                         JURISDICTIONS[i % len(JURISDICTIONS)], f"{1950 + i % 70}-06-01", "Benchmark Court", content,
+                         headnotes, PRACTICE_AREAS[i % len(PRACTICE_AREAS)], STATUSES[i % len(STATUSES)],
+                         *(_vector(v) for v in stub_embeddings([title, content, headnotes], 768))))
+        execute_values(cur, """
+            INSERT INTO legal_documents (doc_id, doc_type, title, citation, jurisdiction, date_decided, court, content,
+                                         headnotes, practice_area, status,
+                                         title_embedding, content_embedding, headnote_embedding)
+            VALUES %s""", rows)
+
+        rows = []
+        for i in range(documents):
+            content = f"{_phrase(WORDS, i + 2 * products, 8)}."
+            rows.append((content, Json({"source": BENCH_SOURCE}), _vector(stub_embeddings([content], 384)[0])))
+        execute_values(cur, "INSERT INTO documents (content, metadata, embedding) VALUES %s", rows)
+    conn.close()
+
+
+# ============================================================
+# Load Driver
+# ============================================================
+
+def _product_query(i):
+    return _phrase(WORDS, 10_000 + i, 3)
+
+
+def _legal_query(i):
+    return _phrase(LEGAL_WORDS, 10_000 + i, 4)
+
+
+# name -> (method, path, body for the i-th request or None)
+ENDPOINTS = {
+    "root": ("GET", "/", None),
+    "health": ("GET", "/health", None),
+    "ready": ("GET", "/ready", None),
+    "metrics": ("GET", "/metrics", None),
+    "embed": ("POST", "/embed", lambda i: {"text": _product_query(i)}),
+    "embed_batch": ("POST", "/embed/batch", lambda i: {"texts": [_product_query(i * 8 + j) for j in range(8)]}),
+    "generate": ("POST", "/generate", lambda i: {"prompt": _product_query(i), "max_new_tokens": 32}),
+    "generate_stream": ("POST", "/generate", lambda i: {"prompt": _product_query(i), "max_new_tokens": 32, "stream": True}),
+    "documents_add": ("POST", "/documents",
+                      lambda i: {"content": _product_query(i), "metadata": {"source": BENCH_SOURCE}}),
+    "documents_count": ("GET", "/documents/count", None),
+    "search": ("POST", "/search", lambda i: {"query": _product_query(i), "top_k": 5}),
+    "rag": ("POST", "/rag", lambda i: {"query": _product_query(i), "top_k": 3, "max_new_tokens": 32}),
+    "rag_stream": ("POST", "/rag", lambda i: {"query": _product_query(i), "top_k": 3, "max_new_tokens": 32, "stream": True}),
+    "search_records": ("POST", "/search/records", lambda i: {"query": _product_query(i), "top_k": 10}),
+    "search_records_multi": ("POST", "/search/records",
+                             lambda i: {"query": _product_query(i), "top_k": 10, "search_field": "multi"}),
+    "search_records_batch": ("POST", "/search/records/batch",
+                             lambda i: {"queries": [_product_query(i * 8 + j) for j in range(8)], "top_k": 10}),
+    "search_routing": ("GET", "/search/routing", None),
+    "ingestion_jobs": ("GET", "/ingestion/jobs", None),
+    "ingestion_stats": ("GET", "/ingestion/stats", None),
+    "ingestion_count": ("GET", "/ingestion/records/count", None),
+    "legal_search": ("POST", "/legal/search", lambda i: {"query": _legal_query(i), "top_k": 10}),
+    "legal_search_filtered": ("POST", "/legal/search",
+                              lambda i: {"query": _legal_query(i), "top_k": 10, "jurisdiction": "CA",
+                                         "status_filter": "exclude_overruled"}),
+    "legal_search_hybrid": ("POST", "/legal/search",
+                            lambda i: {"query": _legal_query(i), "top_k": 10, "search_field": "hybrid"}),
+    "legal_search_multi": ("POST", "/legal/search",
+                           lambda i: {"query": _legal_query(i), "top_k": 10, "search_field": "multi"}),
+    "legal_search_batch": ("POST", "/legal/search/batch",
+                           lambda i: {"queries": [_legal_query(i * 8 + j) for j in range(8)], "top_k": 10}),
+    "legal_rag": ("POST", "/legal/rag", lambda i: {"query": _legal_query(i), "top_k": 3}),
+    "legal_rag_stream": ("POST", "/legal/rag", lambda i: {"query": _legal_query(i), "top_k": 3, "stream": True}),
+    "legal_count": ("GET", "/legal/documents/count", None),
+    "legal_document": ("GET", "/legal/documents/bench-0001", None),
+}
+
+
+def _percentile(sorted_values, pct):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def run_level(port: int, endpoint: str, concurrency: int, n_requests: int, warmup: int, first: int = 0) -> dict:
+    """Send n_requests (after warmup) from concurrency threads; latency and error stats.
+
+    Request bodies are numbered from first; main numbers every level of
+    every endpoint apart, so none sends queries the embedding and answer
+    caches have already seen.
+    """
+    method, path, body = ENDPOINTS[endpoint]
+    counter = itertools.count(first)
+    lock = threading.Lock()
+    timings, errors, statuses = [], [], {}
+
+    def worker(total):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+        while True:
+            i = next(counter)
+            if i >= first + total:
+                break
+            payload = json.dumps(body(i)).encode() if body else None
+            headers = {"Content-Type": "application/json"} if payload else {}
+            start = time.perf_counter()
+            try:
+                conn.request(method, path, body=payload, headers=headers)
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection("127.0.0.1", port, timeout=120)
+                status = "connection_error"
+            elapsed = (time.perf_counter() - start) * 1000
+            if i < first + warmup:
+                continue
+            with lock:
+                statuses[str(status)] = statuses.get(str(status), 0) + 1
+                (timings if status in (200, 202) else errors).append(elapsed)
+        conn.close()
+
+    threads = [threading.Thread(target=worker, args=(warmup + n_requests,)) for _ in range(concurrency)]
+    wall_start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - wall_start
+
+    timings.sort()
+    return {
+        "requests": n_requests,
+        "errors": len(errors),
+        "error_rate": round(len(errors) / n_requests, 4),
+        "statuses": statuses,
+        "throughput_rps": round(n_requests / wall, 1),
+        "p50_ms": round(_percentile(timings, 50), 2) if timings else None,
+        "p95_ms": round(_percentile(timings, 95), 2) if timings else None,
+        "p99_ms": round(_percentile(timings, 99), 2) if timings else None,
+        "mean_ms": round(statistics.mean(timings), 2) if timings else None,
+        "max_ms": round(timings[-1], 2) if timings else None,
+    }
+
+
+def start_server(port: int, env: dict, ready_timeout: float) -> subprocess.Popen:
+    process = subprocess.Popen([sys.executable, os.path.abspath(__file__), "serve", "--port", str(port)], env=env)
+    deadline = time.time() + ready_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"server exited with code {process.returncode}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            conn.request("GET", "/ready")
+            if conn.getresponse().status == 200:
+                return process
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError(f"server not ready after {ready_timeout:.0f}s")
+
+
+def compare(report: dict, baseline: dict, tolerance: float, slack_ms: float) -> list:
+    """Regressions of report against baseline: a p50 or p95 above baseline * (1 + tolerance) + slack_ms,
+    or an error rate more than one point above the baseline's."""
+    regressions = []
+    for endpoint, levels in report["results"].items():
+        for level, stats in levels.items():
+            before = baseline.get("results", {}).get(endpoint, {}).get(level)
+            if before is None:
+                continue
+            for metric in ("p50_ms", "p95_ms"):
+                if stats[metric] is not None and before[metric] is not None:
+                    limit = before[metric] * (1 + tolerance) + slack_ms
+                    if stats[metric] > limit:
+                        regressions.append(f"{endpoint} c={level} {metric} {stats[metric]} > {limit:.2f} "
+                                           f"(baseline {before[metric]})")
+            if stats["error_rate"] > before["error_rate"] + 0.01:
+                regressions.append(f"{endpoint} c={level} error_rate {stats['error_rate']} "
+                                   f"(baseline {before['error_rate']})")
+    return regressions
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "serve":
+        parser = argparse.ArgumentParser()
+        parser.add_argument("command")
+        parser.add_argument("--port", type=int, required=True)
+        serve(parser.parse_args().port)
+        return
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per endpoint and concurrency")
+    parser.add_argument("--warmup", type=int, default=10)
+    parser.add_argument("--endpoints", nargs="*", default=list(ENDPOINTS), choices=list(ENDPOINTS))
+    parser.add_argument("--token-ms", type=float, default=0.0, help="stub model time per generated token")
+    parser.add_argument("--embed-ms", type=float, default=0.0, help="stub model time per embedding batch")
+    parser.add_argument("--seed", action="store_true", help="create the schema and (re)insert benchmark rows first")
+    parser.add_argument("--products", type=int, default=2000)
+    parser.add_argument("--legal-docs", type=int, default=500)
+    parser.add_argument("--documents", type=int, default=500)
+    parser.add_argument("--ready-timeout", type=float, default=120)
+    parser.add_argument("--output", help="also write the report to this file")
+    parser.add_argument("--baseline", help="compare with this report; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed relative p50/p95 increase")
+    parser.add_argument("--slack-ms", type=float, default=2.0, help="allowed absolute p50/p95 increase on top")
+    parser.add_argument("--write-baseline", help="write the report as the new baseline file")
+    args = parser.parse_args()
+
+    if args.seed:
+        seed_database(args.products, args.legal_docs, args.documents)
+
+    env = {**os.environ, "BENCH_STUB_TOKEN_MS": str(args.token_ms), "BENCH_STUB_EMBED_MS": str(args.embed_ms)}
+    server = start_server(args.port, env, args.ready_timeout)
+    try:
+        results = {}
+        first = 0
+        for endpoint in args.endpoints:
+            results[endpoint] = {}
+            for concurrency in args.concurrency:
+                stats = run_level(args.port, endpoint, concurrency, args.requests, args.warmup, first)
+                first += args.warmup + args.requests
+                results[endpoint][str(concurrency)] = stats
+                print(f"{endpoint:24} c={concurrency:<3} p50={stats['p50_ms']}ms p95={stats['p95_ms']}ms "
+                      f"p99={stats['p99_ms']}ms {stats['throughput_rps']} req/s errors={stats['errors']}",
+                      file=sys.stderr)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+    report = {
+        "config": {
+            "concurrency": args.concurrency,
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "token_ms": args.token_ms,
+            "embed_ms": args.embed_ms,
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "env": {k: v for k, v in os.environ.items()
+                    if k.startswith(("LLM_", "EMBED_", "GEN_", "DB_POOL", "SEARCH_", "MEMORY_INDEX", "BATCH_"))},
+        },
+        "results": results,
+    }
+    print(json.dumps(report, indent=2))
+    for path in filter(None, (args.output, args.write_baseline)):
+        with open(path, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(report, json.load(f), args.tolerance, args.slack_ms)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
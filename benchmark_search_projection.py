@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""Benchmark: full search responses vs `fields` projections.
+
+Sends the same query to a running API with and without a `fields` list
+and reports, per case, the response size and client-side latency
+(median and mean over --requests calls, after --warmup calls):
+
+  - records:        POST /search/records, top_k=50, full vs id/title/similarity
+  - records_multi:  the same with search_field=multi
+  - legal:          POST /legal/search, top_k=50, full vs doc_id/title/citation/similarity
+  - legal_hybrid:   the same with search_field=hybrid
+
+Query embeddings are cached server-side after the first call, so the
+difference is the SQL fetch, result building and JSON encoding.
+
+Usage::
+
+    python benchmark_search_projection.py [--url http://localhost:8000] [--requests 50]
+"""
+
+import argparse
+import json
+import os
+import statistics
+import time
+import urllib.request
+
+CASES = {
+    "records": ("/search/records",
+                {"query": "comfortable running shoes", "top_k": 50},
+                ["id", "title", "similarity"]),
+    "records_multi": ("/search/records",
+                      {"query": "comfortable running shoes", "top_k": 50, "search_field": "multi"},
+                      ["id", "title", "similarity"]),
+    "legal": ("/legal/search",
+              {"query": "wrongful termination retaliation", "top_k": 50},
+              ["doc_id", "title", "citation", "similarity"]),
+    "legal_hybrid": ("/legal/search",
+                     {"query": "wrongful termination retaliation", "top_k": 50, "search_field": "hybrid"},
+                     ["doc_id", "title", "citation", "similarity"]),
+}
+
+
+def post(url, payload):
+    """POST JSON; returns (response bytes, seconds)."""
+    request = urllib.request.Request(url, data=json.dumps(payload).encode(),
+                                     headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=60) as response:
+        body = response.read()
+    return body, time.perf_counter() - start
+
+
+def measure(url, payload, n_requests, warmup):
+    for _ in range(warmup):
+        post(url, payload)
+    timings, size = [], 0
+    for _ in range(n_requests):
+        body, seconds = post(url, payload)
+        timings.append(seconds * 1000)
+        size = len(body)
+    return {"bytes": size, "p50_ms": round(statistics.median(timings), 2), "mean_ms": round(statistics.mean(timings), 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default=os.getenv("ALB_URL", "http://localhost:8000"))
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--cases", nargs="*", default=list(CASES), choices=list(CASES))
+    args = parser.parse_args()
+
+    report = {"url": args.url, "requests": args.requests, "cases": {}}
+    for name in args.cases:
+        path, payload, fields = CASES[name]
+        full = measure(args.url + path, payload, args.requests, args.warmup)
+        projected = measure(args.url + path, {**payload, "fields": fields}, args.requests, args.warmup)
+        report["cases"][name] = {
+            "fields": fields,
+            "full": full,
+            "projected": projected,
+            "bytes_saved_pct": round(100 * (1 - projected["bytes"] / max(full["bytes"], 1)), 1),
+            "p50_saved_ms": round(full["p50_ms"] - projected["p50_ms"], 2),
+        }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""Micro-benchmark: float-list/text vector serialization vs the numpy codec.
+
+Client side, it times how long it takes to turn N embeddings into what
+goes over the wire:
+  - list_adapt:     psycopg2 adapting a Python float list (old query params)
+  - list_literal:   "[" + ",".join(map(str, list)) + "]" (old batch inserts / COPY)
+  - vector_text:    %.9g text literal from a float32 array (new query params)
+  - vector_binary:  pgvector binary format from a float32 array (new COPY)
+
+With --db it also loads the rows into a temp table with execute_values +
+text literals and with binary COPY, which includes the server-side parse
+cost (connection settings come from Config / PG* env vars).
+
+The same codec is used by app.py and the ingestion worker.
+
+Usage::
+
+    python benchmark_vector_codec.py [--rows 5000] [--dim 768] [--db]
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+import psycopg2
+from psycopg2.extras import execute_values
+
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from claude_rag.config import Config
+from claude_rag.db.vector import copy_binary, vector_binary, vector_text
+
+
+def timed(fn, repeat=3):
+    """Best-of-repeat wall time in ms."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def client_benchmark(vectors):
+    lists = [v.tolist() for v in vectors]
+    results = {
+        "list_adapt": timed(lambda: [psycopg2.extensions.adapt(l).getquoted() for l in lists]),
+        "list_literal": timed(lambda: ["[" + ",".join(map(str, l)) + "]" for l in lists]),
+        "vector_text": timed(lambda: [vector_text(v) for v in vectors]),
+        "vector_binary": timed(lambda: [vector_binary(v) for v in vectors]),
+    }
+    sizes = {
+        "list_adapt": len(psycopg2.extensions.adapt(lists[0]).getquoted()),
+        "list_literal": len("[" + ",".join(map(str, lists[0])) + "]"),
+        "vector_text": len(vector_text(vectors[0])),
+        "vector_binary": len(vector_binary(vectors[0])),
+    }
+    return {name: {"total_ms": round(ms, 1), "us_per_vector": round(ms * 1000 / len(vectors), 2),
+                   "bytes_per_vector": sizes[name]} for name, ms in results.items()}
+
+
+def db_benchmark(vectors, dim):
+    config = Config()
+    conn = psycopg2.connect(
+        host=config.PGHOST,
+        port=config.PGPORT,
+        database=config.PGDATABASE,
+        user=config.PGUSER,
+        password=config.PGPASSWORD,
+    )
+    cur = conn.cursor()
+    cur.execute(f"CREATE TEMP TABLE codec_bench (id int, embedding vector({dim}))")
+
+    def text_insert():
+        rows = [(i, "[" + ",".join(map(str, v.tolist())) + "]") for i, v in enumerate(vectors)]
+        execute_values(cur, "INSERT INTO codec_bench (id, embedding) VALUES %s", rows,
+                       template="(%s, %s::vector)", page_size=1000)
+        cur.execute("TRUNCATE codec_bench")
+
+    def binary_copy():
+        copy_binary(cur, "codec_bench", ["id", "embedding"], ["int4", "vector"], enumerate(vectors))
+        cur.execute("TRUNCATE codec_bench")
+
+    results = {"execute_values_text": timed(text_insert), "copy_binary": timed(binary_copy)}
+    conn.rollback()
+    conn.close()
+    return {name: {"total_ms": round(ms, 1), "us_per_row": round(ms * 1000 / len(vectors), 2)}
+            for name, ms in results.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--db", action="store_true", help="also time inserts against PostgreSQL")
+    args = parser.parse_args()
+
+    vectors = np.random.default_rng(0).standard_normal((args.rows, args.dim)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+
+    report = {"rows": args.rows, "dim": args.dim, "serialization": client_benchmark(vectors)}
+    if args.db:
+        report["insert"] = db_benchmark(vectors, args.dim)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
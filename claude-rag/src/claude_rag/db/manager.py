@@ -12,10 +12,12 @@ from dataclasses import dataclass, field
 from datetime import datetime
 from typing import Optional
 
+import numpy as np
 import psycopg2
-from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.extras import RealDictCursor
 
 from claude_rag.config import Config
+from claude_rag.db.vector import copy_binary
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +45,7 @@ class ChunkRecord:
     content: str
     block_type: Optional[str] = None
     metadata: dict = field(default_factory=dict)
-    embedding: Optional[list[float]] = None
+    embedding: Optional[list[float] | np.ndarray] = None
 
 
 class DatabaseManager:
@@ -144,8 +146,9 @@ class DatabaseManager:
     def upsert_chunks(self, source_id: int, chunks: list[ChunkRecord]) -> int:
         """Replace all chunks for a source with the given list.
 
-        Deletes existing chunks for the source then bulk-inserts the new ones.
-        Updates the source's chunk_count.
+        Deletes existing chunks for the source then bulk-inserts the new ones
+        with a binary COPY (embeddings go over the wire as float4, see
+        :mod:`claude_rag.db.vector`). Updates the source's chunk_count.
         """
         conn = self._get_connection()
         cur = conn.cursor()
@@ -163,7 +166,7 @@ class DatabaseManager:
             conn.close()
             return 0
 
-        values = [
+        values = (
             (
                 source_id,
                 c.chunk_index,
@@ -173,17 +176,14 @@ class DatabaseManager:
                 c.embedding,
             )
             for c in chunks
-        ]
+        )
 
-        execute_values(
+        copy_binary(
             cur,
-            """
-            INSERT INTO memory_chunks
-                (source_id, chunk_index, content, block_type, metadata, embedding)
-            VALUES %s
-            """,
+            "memory_chunks",
+            ["source_id", "chunk_index", "content", "block_type", "metadata", "embedding"],
+            ["int4", "int4", "text", "text", "jsonb", "vector"],
             values,
-            template="(%s, %s, %s, %s, %s::jsonb, %s::vector)",
         )
 
         cur.execute(
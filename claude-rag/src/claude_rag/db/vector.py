@@ -0,0 +1,150 @@
+"""NumPy-native pgvector codec.
+
+Embeddings stay float32 numpy arrays on their way into PostgreSQL instead
+of being turned into Python float lists and ``str``-formatted:
+
+* Bulk writes use ``COPY ... WITH (FORMAT BINARY)``, sending each vector in
+  pgvector's binary wire format (int16 dimension, int16 unused, big-endian
+  float4 values) so neither side formats or parses decimal text.
+* Query parameters, which psycopg2 can only send as text, are rendered with
+  ``%.9g`` — the shortest fixed precision that round-trips float32 exactly —
+  from a per-dimension format string, several times faster than adapting a
+  Python list.
+
+Importing this module registers a psycopg2 adapter so ``numpy.ndarray``
+values passed as query parameters become vector literals.
+"""
+
+from __future__ import annotations
+
+import datetime
+import io
+import json
+import struct
+from typing import Any, Iterable, Sequence
+
+import numpy as np
+from psycopg2.extensions import AsIs, register_adapter
+
+_TEXT_FORMATS: dict[int, str] = {}
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_PGCOPY_TRAILER = struct.pack(">h", -1)
+_NULL = struct.pack(">i", -1)
+_PG_DATE_EPOCH = datetime.date(2000, 1, 1).toordinal()
+_PG_TEXT_OID = 25
+
+COPY_TYPES = ("text", "int4", "int8", "jsonb", "date", "text[]", "vector")
+
+
+def vector_text(vec: Sequence[float] | np.ndarray) -> str:
+    """Return the pgvector text literal (``[x,y,...]``) for a 1-d vector.
+
+    Args:
+        vec: A float list or numpy array.
+
+    Returns:
+        The literal, exact for float32 values.
+    """
+    values = np.asarray(vec, dtype=np.float32).ravel().tolist()
+    fmt = _TEXT_FORMATS.get(len(values))
+    if fmt is None:
+        fmt = _TEXT_FORMATS[len(values)] = "[" + ",".join(["%.9g"] * len(values)) + "]"
+    return fmt % tuple(values)
+
+
+def vector_binary(vec: Sequence[float] | np.ndarray) -> bytes:
+    """Return a vector in pgvector's binary send/recv format.
+
+    Args:
+        vec: A float list or numpy array.
+
+    Returns:
+        ``int16 dim, int16 unused, float4[dim]``, all big-endian.
+    """
+    values = np.asarray(vec, dtype=">f4").ravel()
+    return struct.pack(">HH", values.shape[0], 0) + values.tobytes()
+
+
+def _adapt_ndarray(vec: np.ndarray) -> AsIs:
+    return AsIs("'" + vector_text(vec) + "'")
+
+
+register_adapter(np.ndarray, _adapt_ndarray)
+
+
+def _encode_field(value: Any, pg_type: str) -> bytes:
+    """Encode one COPY field as a length-prefixed binary value."""
+    if value is None:
+        return _NULL
+    if pg_type == "vector":
+        data = vector_binary(value)
+    elif pg_type == "text":
+        data = str(value).encode("utf-8")
+    elif pg_type == "int4":
+        data = struct.pack(">i", value)
+    elif pg_type == "int8":
+        data = struct.pack(">q", value)
+    elif pg_type == "jsonb":
+        text = value if isinstance(value, str) else json.dumps(value, default=str)
+        data = b"\x01" + text.encode("utf-8")
+    elif pg_type == "date":
+        if isinstance(value, str):
+            if not value:
+                return _NULL
+            value = datetime.date.fromisoformat(value)
+        data = struct.pack(">i", value.toordinal() - _PG_DATE_EPOCH)
+    elif pg_type == "text[]":
+        items = [str(v).encode("utf-8") for v in value]
+        data = struct.pack(">iiiii", 1, 0, _PG_TEXT_OID, len(items), 1) + b"".join(
+            struct.pack(">i", len(item)) + item for item in items
+        )
+    else:
+        raise ValueError(f"Unsupported binary COPY type: {pg_type}")
+    return struct.pack(">i", len(data)) + data
+
+
+def encode_copy_binary(types: Sequence[str], rows: Iterable[Sequence[Any]]) -> io.BytesIO:
+    """Build a ``COPY ... FROM STDIN WITH (FORMAT BINARY)`` stream.
+
+    Args:
+        types: Wire type of each column, one of :data:`COPY_TYPES`
+            (``text`` also covers ``varchar``).
+        rows: Tuples of values ordered like *types*; ``None`` is NULL.
+
+    Returns:
+        A buffer positioned at the start of the stream.
+    """
+    buffer = io.BytesIO()
+    buffer.write(_PGCOPY_HEADER)
+    field_count = struct.pack(">h", len(types))
+    for row in rows:
+        buffer.write(field_count)
+        for value, pg_type in zip(row, types):
+            buffer.write(_encode_field(value, pg_type))
+    buffer.write(_PGCOPY_TRAILER)
+    buffer.seek(0)
+    return buffer
+
+
+def copy_binary(
+    cur: Any,
+    table: str,
+    columns: Sequence[str],
+    types: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+) -> None:
+    """COPY *rows* into *table* using the binary format.
+
+    Binary COPY needs each value in the column's exact type, so *types* must
+    match the table definition (copy into a staging table with known types
+    when the target's are not fixed).
+
+    Args:
+        cur: An open psycopg2 cursor.
+        table: Target table name.
+        columns: Target column names.
+        types: Wire type of each column (see :func:`encode_copy_binary`).
+        rows: Tuples of values ordered like *columns*.
+    """
+    buffer = encode_copy_binary(types, rows)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT BINARY)", buffer)
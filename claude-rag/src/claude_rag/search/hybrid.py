@@ -16,6 +16,7 @@ import logging
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from claude_rag.db.vector import vector_text
 from claude_rag.search.semantic import SearchResult
 
 logger = logging.getLogger(__name__)
@@ -128,7 +129,7 @@ def hybrid_search(
     rrf_max = 2.0 / (rrf_k + 1)
 
     params: dict = {
-        "query_vec": query_embedding,
+        "query_vec": vector_text(query_embedding),
         "query_text": query_text,
         "top_k": top_k,
         "rrf_k": rrf_k,
@@ -12,6 +12,8 @@ from dataclasses import dataclass, field
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from claude_rag.db.vector import vector_text
+
 logger = logging.getLogger(__name__)
 
 
@@ -61,7 +63,7 @@ def semantic_search(
         A list of :class:`SearchResult` objects ordered by descending
         cosine similarity.
     """
-    params: dict = {"query_vec": query_embedding, "top_k": top_k}
+    params: dict = {"query_vec": vector_text(query_embedding), "top_k": top_k}
     if filter_params:
         params.update(filter_params)
 
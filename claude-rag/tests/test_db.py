@@ -247,3 +247,46 @@ class TestDeleteCascade:
         assert total_after <= total_before, (
             "Chunk count should not increase after source deletion"
         )
+
+
+class TestChunkEmbeddings:
+    """Verify embeddings survive the binary COPY exactly."""
+
+    def test_upsert_chunks_embeddings_round_trip(
+        self,
+        db_manager: DatabaseManager,
+        _clean_test_source: str,
+    ) -> None:
+        import numpy as np
+
+        test_path = _clean_test_source
+        source_id = db_manager.upsert_source(
+            file_path=test_path,
+            file_hash="embedding_hash",
+            file_type="claude_md",
+        )
+
+        rng = np.random.default_rng(0)
+        array_embedding = rng.standard_normal(384).astype(np.float32)
+        list_embedding = rng.standard_normal(384).astype(np.float32).tolist()
+        chunks = [
+            ChunkRecord(chunk_index=0, content="ndarray", block_type="text", embedding=array_embedding),
+            ChunkRecord(chunk_index=1, content="list", block_type="text", embedding=list_embedding),
+            ChunkRecord(chunk_index=2, content="none", block_type="text"),
+        ]
+        assert db_manager.upsert_chunks(source_id, chunks) == 3
+
+        conn = db_manager._get_connection()
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT embedding::text FROM memory_chunks WHERE source_id = %s ORDER BY chunk_index",
+            (source_id,),
+        )
+        stored = [row[0] for row in cur.fetchall()]
+        cur.close()
+        conn.close()
+
+        assert stored[2] is None
+        for text, expected in zip(stored[:2], (array_embedding, list_embedding)):
+            values = np.array(text.strip("[]").split(","), dtype=np.float32)
+            np.testing.assert_array_equal(values, np.asarray(expected, dtype=np.float32))
@@ -0,0 +1,96 @@
+"""Tests for the pgvector codec (claude_rag.db.vector)."""
+
+from __future__ import annotations
+
+import datetime
+import struct
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+from psycopg2.extensions import adapt
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from claude_rag.db.vector import copy_binary, encode_copy_binary, vector_binary, vector_text
+
+
+class _RecordingCursor:
+    """Stand-in cursor that captures what copy_expert receives."""
+
+    def __init__(self) -> None:
+        self.sql: str | None = None
+        self.data: bytes | None = None
+
+    def copy_expert(self, sql: str, file) -> None:
+        self.sql = sql
+        self.data = file.read()
+
+
+class TestVectorText:
+    """vector_text renders exact pgvector literals."""
+
+    def test_round_trips_float32(self) -> None:
+        vec = np.random.default_rng(0).standard_normal(768).astype(np.float32)
+        text = vector_text(vec)
+        assert text.startswith("[") and text.endswith("]")
+        parsed = np.array(text[1:-1].split(","), dtype=np.float32)
+        np.testing.assert_array_equal(parsed, vec)
+
+    def test_accepts_lists(self) -> None:
+        assert vector_text([1.0, -0.5, 0.25]) == "[1,-0.5,0.25]"
+
+    def test_ndarray_is_adapted_as_literal(self) -> None:
+        quoted = adapt(np.array([1.0, 2.0], dtype=np.float32)).getquoted()
+        assert quoted == b"'[1,2]'"
+
+
+class TestVectorBinary:
+    """vector_binary matches pgvector's send format."""
+
+    def test_layout(self) -> None:
+        data = vector_binary(np.array([1.0, -2.0, 0.5], dtype=np.float32))
+        assert data[:4] == struct.pack(">HH", 3, 0)
+        assert struct.unpack(">3f", data[4:]) == (1.0, -2.0, 0.5)
+
+
+class TestCopyBinary:
+    """encode_copy_binary produces a valid PGCOPY stream."""
+
+    def test_stream_framing(self) -> None:
+        data = encode_copy_binary(["int4", "text"], [(7, "hi"), (None, "")]).read()
+        assert data.startswith(b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0))
+        body = data[19:]
+        row1 = struct.pack(">h", 2) + struct.pack(">ii", 4, 7) + struct.pack(">i", 2) + b"hi"
+        row2 = struct.pack(">h", 2) + struct.pack(">i", -1) + struct.pack(">i", 0)
+        assert body == row1 + row2 + struct.pack(">h", -1)
+
+    def test_field_encodings(self) -> None:
+        data = encode_copy_binary(
+            ["jsonb", "date", "text[]", "int8"],
+            [({"a": 1}, datetime.date(2000, 1, 2), ["x", "yz"], 2**40)],
+        ).read()
+        body = data[19 + 2:]
+        assert body.startswith(struct.pack(">i", 9) + b'\x01{"a": 1}')
+        body = body[4 + 9:]
+        assert body.startswith(struct.pack(">ii", 4, 1))
+        body = body[8:]
+        array = struct.pack(">iiiii", 1, 0, 25, 2, 1) + struct.pack(">i", 1) + b"x" + struct.pack(">i", 2) + b"yz"
+        assert body.startswith(struct.pack(">i", len(array)) + array)
+        body = body[4 + len(array):]
+        assert body == struct.pack(">iq", 8, 2**40) + struct.pack(">h", -1)
+
+    def test_empty_date_string_is_null(self) -> None:
+        data = encode_copy_binary(["date"], [("",)]).read()
+        assert data[19:] == struct.pack(">h", 1) + struct.pack(">i", -1) + struct.pack(">h", -1)
+
+    def test_unknown_type_raises(self) -> None:
+        with pytest.raises(ValueError, match="Unsupported"):
+            encode_copy_binary(["money"], [(1,)])
+
+    def test_copy_binary_statement(self) -> None:
+        cur = _RecordingCursor()
+        copy_binary(cur, "memory_chunks", ["chunk_index", "embedding"], ["int4", "vector"], [(0, [1.0, 2.0])])
+        assert cur.sql == "COPY memory_chunks (chunk_index, embedding) FROM STDIN WITH (FORMAT BINARY)"
+        assert vector_binary([1.0, 2.0]) in cur.data
@@ -2,8 +2,9 @@
 """
 07_compare_search_results.py - Test legal search against live API
 
-Calls the live /legal/search endpoint with test queries to measure actual
-end-to-end search quality. Tests both semantic and hybrid search modes.
+Calls the live /legal/search/batch endpoint with test queries to measure actual
+end-to-end search quality. Tests both semantic and hybrid search modes, one
+request per mode.
 """
 
 import json
@@ -16,17 +17,17 @@ sys.path.insert(0, os.path.dirname(__file__))
 from config import ALB_URL, DATA_DIR
 
 
-def search_legal_api(base_url, query, search_field="content", top_k=5):
-    """Call the /legal/search API endpoint."""
-    url = f"{base_url}/legal/search"
+def search_legal_api(base_url, queries, search_field="content", top_k=5):
+    """Call the /legal/search/batch API endpoint; returns one result list per query."""
+    url = f"{base_url}/legal/search/batch"
     payload = {
-        "query": query,
+        "queries": queries,
         "search_field": search_field,
         "top_k": top_k,
     }
 
     try:
-        response = requests.post(url, json=payload, timeout=15)
+        response = requests.post(url, json=payload, timeout=60)
         if response.status_code == 200:
             return response.json()
     except Exception as e:
@@ -65,16 +66,12 @@ def main():
         print(f"LIVE LEGAL SEARCH RESULTS - {search_mode.upper()} MODE")
         print("="*80)
 
-        for query in test_queries:
-            api_result = search_legal_api(base_url, query, search_field=search_mode)
-
-            if "error" in api_result:
-                print(f'\nQuery: "{query}"')
-                print(f"  ERROR: {api_result['error']}")
-                continue
-
-            items = api_result.get("results", [])
+        api_result = search_legal_api(base_url, test_queries, search_field=search_mode)
+        if isinstance(api_result, dict):
+            print(f"  ERROR: {api_result['error']}")
+            continue
 
+        for query, items in zip(test_queries, api_result):
             query_result = {
                 "query": query,
                 "search_field": search_mode,
@@ -4,7 +4,9 @@
 
 Calls the live search API with test queries to measure the actual
 end-to-end search quality. Can compare results before and after
-re-embedding with the fine-tuned model.
+re-embedding with the fine-tuned model. The Python API gets all queries
+in one /search/records/batch request; the Java /api/search endpoint has
+no batch form and is called once per query.
 """
 
 import json
@@ -15,24 +17,27 @@ import requests
 from config import DATA_DIR
 
 
-def search_api(alb_dns, query, top_k=5):
-    """Call the search API and return results."""
-    # Try Java endpoint first
+def search_api(alb_dns, queries, top_k=5):
+    """Call the search API for every query; returns (one result per query, endpoint)."""
+    # Try Java endpoint first (one query per call)
     java_url = f"http://{alb_dns}/api/search"
-    python_url = f"http://{alb_dns}/search/records"
-
-    payload = {"query": query, "top_k": top_k}
+    python_url = f"http://{alb_dns}/search/records/batch"
 
     try:
-        response = requests.post(java_url, json=payload, timeout=10)
-        if response.status_code == 200:
-            return response.json(), "java"
+        results = []
+        for query in queries:
+            response = requests.post(java_url, json={"query": query, "top_k": top_k}, timeout=10)
+            if response.status_code != 200:
+                break
+            results.append(response.json())
+        else:
+            return results, "java"
     except:
         pass
 
-    # Fall back to Python endpoint
+    # Fall back to Python endpoint, all queries in one request
     try:
-        response = requests.post(python_url, json=payload, timeout=10)
+        response = requests.post(python_url, json={"queries": queries, "top_k": top_k}, timeout=60)
         if response.status_code == 200:
             return response.json(), "python"
     except Exception as e:
@@ -70,16 +75,16 @@ def main():
     print("LIVE SEARCH RESULTS")
     print("="*70)
 
-    for query in test_queries:
-        api_result, endpoint = search_api(alb_dns, query)
-
-        if api_result is None:
-            print(f'\nQuery: "{query}"')
-            print(f"  ERROR: {endpoint}")
-            continue
+    api_results, endpoint = search_api(alb_dns, test_queries)
+    if api_results is None:
+        print(f"\n  ERROR: {endpoint}")
+        api_results = []
 
+    for query, api_result in zip(test_queries, api_results):
         # Parse results - handle different response formats
-        if "results" in api_result:
+        if isinstance(api_result, list):
+            items = api_result
+        elif "results" in api_result:
             items = api_result["results"]
         elif "records" in api_result:
             items = api_result["records"]
@@ -0,0 +1,70 @@
+"""Gunicorn config: N uvicorn workers forked from a master that preloads the model weights.
+
+The master imports app.py once with PRELOAD_MODELS=true, loading the
+embedders' torch weights and fetching the GGUF before forking, so the
+workers share one copy of the weights (copy-on-write tensors, mmapped
+GGUF pages). Each worker then builds its own llama.cpp contexts, ONNX
+sessions, DB pool and caches in the app lifespan. /health reports RSS
+and PSS per process to confirm the sharing.
+
+Workers publish metric snapshots to METRICS_DIR, so whichever worker
+answers a /metrics scrape reports the totals for the whole task.
+
+Settings (environment):
+    WEB_CONCURRENCY   number of workers (default 4)
+    LLM_THREADS       llama.cpp threads per worker (default CPUs / workers)
+    TORCH_THREADS     torch intra-op threads per worker (default CPUs / workers)
+    DB_POOL_MAX_SIZE  connections per worker (default 16 / workers)
+    METRICS_DIR       where workers publish metric snapshots (default: a new temp dir)
+"""
+
+import gc
+import os
+import tempfile
+
+workers = int(os.getenv("WEB_CONCURRENCY", "4"))
+worker_class = "uvicorn.workers.UvicornWorker"
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+preload_app = True
+
+# Models load in the background after fork, so workers boot quickly; the
+# timeout only has to cover a blocked event loop, not model loading
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+# Longer than the ALB idle timeout (60s) so the ALB closes idle connections first
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "75"))
+
+# Split the CPUs between workers instead of every worker using all of them
+_cpus = os.cpu_count() or 1
+os.environ.setdefault("PRELOAD_MODELS", "true")
+os.environ.setdefault("LLM_THREADS", str(max(1, _cpus // workers)))
+os.environ.setdefault("TORCH_THREADS", str(max(1, _cpus // workers)))
+os.environ.setdefault("DB_POOL_MAX_SIZE", str(max(2, 16 // workers)))
+os.environ.setdefault("TOKENIZERS_PARALLELISM", "false")
+if not os.getenv("METRICS_DIR"):
+    os.environ["METRICS_DIR"] = tempfile.mkdtemp(prefix="inference-metrics-")
+
+
+def _remove_metrics_snapshot(name):
+    try:
+        os.remove(os.path.join(os.environ["METRICS_DIR"], name))
+    except OSError:
+        pass
+
+
+def on_starting(server):
+    # Snapshots left by an earlier server's workers would be added to ours
+    os.makedirs(os.environ["METRICS_DIR"], exist_ok=True)
+    for name in os.listdir(os.environ["METRICS_DIR"]):
+        _remove_metrics_snapshot(name)
+
+
+def when_ready(server):
+    # Move everything loaded so far out of the GC's reach, so collections in
+    # the workers do not write to (and un-share) the preloaded objects' pages
+    gc.freeze()
+
+
+def child_exit(server, worker):
+    # An exited worker's gauges must stop counting towards the task's totals
+    _remove_metrics_snapshot(f"{worker.pid}.json")
@@ -1,5 +1,5 @@
 import psycopg2
-from psycopg2.extras import execute_values, RealDictCursor
+from psycopg2.extras import RealDictCursor
 import json
 import boto3
 import os
@@ -8,6 +8,8 @@ import logging
 from typing import List, Dict, Optional
 from datetime import datetime
 
+from app.vector import copy_binary
+
 logger = logging.getLogger(__name__)
 
 
@@ -98,7 +100,11 @@ class DatabaseManager:
         conn.close()
 
     def bulk_insert(self, records: List[Dict]) -> int:
-        """Bulk insert records into ingested_records table."""
+        """Bulk insert records into ingested_records table.
+
+        Rows are binary-COPYed into a staging table with fixed column types
+        (embeddings as float4 vectors), then moved with one INSERT ... SELECT.
+        """
         if not records:
             return 0
 
@@ -121,16 +127,30 @@ class DatabaseManager:
                 json.dumps(r.get('metadata', {}))
             ))
 
-        execute_values(
-            cur,
+        columns = [
+            'source_file', 'row_number', 'raw_data', 'title', 'description', 'category',
+            'tags', 'searchable_content', 'content_embedding', 'title_embedding', 'metadata'
+        ]
+        cur.execute(
+            """
+            CREATE TEMP TABLE ingested_records_staging (
+                source_file text, row_number int, raw_data jsonb, title text,
+                description text, category text, tags text[], searchable_content text,
+                content_embedding vector, title_embedding vector, metadata jsonb
+            ) ON COMMIT DROP
+            """
+        )
+        copy_binary(
+            cur, 'ingested_records_staging', columns,
+            ['text', 'int4', 'jsonb', 'text', 'text', 'text',
+             'text[]', 'text', 'vector', 'vector', 'jsonb'],
+            values
+        )
+        cur.execute(
+            f"""
+            INSERT INTO ingested_records ({', '.join(columns)})
+            SELECT {', '.join(columns)} FROM ingested_records_staging
             """
-            INSERT INTO ingested_records
-            (source_file, row_number, raw_data, title, description, category,
-             tags, searchable_content, content_embedding, title_embedding, metadata)
-            VALUES %s
-            """,
-            values,
-            template="(%s, %s, %s, %s, %s, %s, %s, %s, %s::vector, %s::vector, %s)"
         )
 
         inserted = len(values)
@@ -1,6 +1,7 @@
+import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModel
-from typing import List
+from typing import List, Optional
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,13 @@ class EmbeddingGenerator:
 
     def generate_batch(self, texts: List[str], batch_size: int = 32) -> List[List[float]]:
         """Generate embeddings for a batch of texts."""
+        return [
+            None if embedding is None else embedding.tolist()
+            for embedding in self.generate_batch_arrays(texts, batch_size)
+        ]
+
+    def generate_batch_arrays(self, texts: List[str], batch_size: int = 32) -> List[Optional[np.ndarray]]:
+        """Generate float32 embeddings for a batch of texts, without converting to lists."""
         all_embeddings = []
 
         # Filter out empty texts
@@ -51,7 +59,7 @@ class EmbeddingGenerator:
             embeddings = self._mean_pooling(outputs, encoded['attention_mask'])
             embeddings = torch.nn.functional.normalize(embeddings, p=2, dim=1)
 
-            all_embeddings.extend(embeddings.tolist())
+            all_embeddings.extend(embeddings.numpy().astype(np.float32, copy=False))
 
         # Map back to original indices (None for empty texts)
         result = [None] * len(texts)
@@ -129,13 +129,13 @@ class CSVProcessor:
 
         # Generate content embeddings in batch
         contents = [r['searchable_content'] for r in records]
-        content_embeddings = self.embedder.generate_batch(
+        content_embeddings = self.embedder.generate_batch_arrays(
             contents, batch_size=self.embedding_batch_size
         )
 
         # Generate title embeddings in batch
         titles = [r.get('title') or '' for r in records]
-        title_embeddings = self.embedder.generate_batch(
+        title_embeddings = self.embedder.generate_batch_arrays(
             titles, batch_size=self.embedding_batch_size
         )
 
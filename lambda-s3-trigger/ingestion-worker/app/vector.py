@@ -0,0 +1,92 @@
+"""NumPy-native pgvector codec.
+
+Embeddings stay float32 arrays on their way into PostgreSQL. Bulk inserts
+COPY them in pgvector's binary format (int16 dim, int16 unused, big-endian
+float4 values), so there is no float -> str -> parse round trip on either
+side. Query parameters, which psycopg2 can only send as text, use %.9g,
+which round-trips float32 exactly.
+"""
+import datetime
+import io
+import json
+import struct
+from typing import Any, Iterable, List, Sequence
+
+import numpy as np
+from psycopg2.extensions import AsIs, register_adapter
+
+_TEXT_FORMATS = {}
+_PGCOPY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack(">ii", 0, 0)
+_NULL = struct.pack(">i", -1)
+_PG_DATE_EPOCH = datetime.date(2000, 1, 1).toordinal()
+_PG_TEXT_OID = 25
+
+
+def vector_text(vec) -> str:
+    """pgvector text literal ("[x,y,...]") for a 1-d vector."""
+    values = np.asarray(vec, dtype=np.float32).ravel().tolist()
+    fmt = _TEXT_FORMATS.get(len(values))
+    if fmt is None:
+        fmt = _TEXT_FORMATS[len(values)] = "[" + ",".join(["%.9g"] * len(values)) + "]"
+    return fmt % tuple(values)
+
+
+def vector_binary(vec) -> bytes:
+    """pgvector binary send format for a 1-d vector."""
+    values = np.asarray(vec, dtype=">f4").ravel()
+    return struct.pack(">HH", values.shape[0], 0) + values.tobytes()
+
+
+def _adapt_ndarray(vec):
+    return AsIs("'" + vector_text(vec) + "'")
+
+
+# numpy arrays passed as query parameters become vector literals
+register_adapter(np.ndarray, _adapt_ndarray)
+
+
+def _encode_field(value: Any, pg_type: str) -> bytes:
+    if value is None:
+        return _NULL
+    if pg_type == "vector":
+        data = vector_binary(value)
+    elif pg_type == "text":
+        data = str(value).encode("utf-8")
+    elif pg_type == "int4":
+        data = struct.pack(">i", value)
+    elif pg_type == "int8":
+        data = struct.pack(">q", value)
+    elif pg_type == "jsonb":
+        data = b"\x01" + (value if isinstance(value, str) else json.dumps(value, default=str)).encode("utf-8")
+    elif pg_type == "date":
+        if isinstance(value, str):
+            if not value:
+                return _NULL
+            value = datetime.date.fromisoformat(value)
+        data = struct.pack(">i", value.toordinal() - _PG_DATE_EPOCH)
+    elif pg_type == "text[]":
+        items = [str(v).encode("utf-8") for v in value]
+        data = struct.pack(">iiiii", 1, 0, _PG_TEXT_OID, len(items), 1) + b"".join(
+            struct.pack(">i", len(item)) + item for item in items
+        )
+    else:
+        raise ValueError(f"Unsupported binary COPY type: {pg_type}")
+    return struct.pack(">i", len(data)) + data
+
+
+def copy_binary(cur, table: str, columns: List[str], types: List[str], rows: Iterable[Sequence[Any]]):
+    """COPY rows (tuples ordered like columns) into table in the binary format.
+
+    types gives each column's wire type (text, int4, int8, jsonb, date,
+    text[] or vector) and must match the table's column types exactly.
+    """
+    buffer = io.BytesIO()
+    buffer.write(_PGCOPY_HEADER)
+    field_count = struct.pack(">h", len(columns))
+    for row in rows:
+        buffer.write(field_count)
+        for value, pg_type in zip(row, types):
+            buffer.write(_encode_field(value, pg_type))
+    buffer.write(struct.pack(">h", -1))
+    buffer.seek(0)
+    cur.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT BINARY)", buffer)
@@ -0,0 +1,207 @@
+"""Migrate the legal_documents HNSW indexes to half precision (pgvector halfvec).
+
+Builds an HNSW index on a halfvec(768) cast of each legal embedding column
+next to the existing vector(768) indexes, without locking the table
+(CREATE INDEX CONCURRENTLY). The embedding columns themselves are not
+changed: the API re-scores halfvec candidates against them.
+
+Rollout:
+    1. python migrate_halfvec.py                          # build the halfvec indexes
+    2. deploy the API with LEGAL_VECTOR_PRECISION=half
+    3. python benchmark_halfvec.py                        # recall / latency / size report
+    4. python migrate_halfvec.py --drop-vector-indexes    # reclaim the vector(768) indexes
+
+Rollback: deploy with LEGAL_VECTOR_PRECISION=full, then
+    python migrate_halfvec.py --rollback                  # rebuild vector indexes, drop halfvec ones
+
+Requires pgvector >= 0.7.0 (the script runs ALTER EXTENSION vector UPDATE
+if the installed extension is older).
+"""
+
+import argparse
+import sys
+
+import psycopg2
+
+from migrate_schema import get_db_credentials
+
+DIMENSIONS = 768
+INDEX_OPTIONS = "WITH (m = 16, ef_construction = 64)"
+
+# column -> (vector index, halfvec index); the names app.py uses in LEGAL_HNSW_INDEX_NAMES
+LEGAL_HNSW_INDEXES = {
+    "title_embedding": ("idx_legal_title_hnsw", "idx_legal_title_halfvec"),
+    "content_embedding": ("idx_legal_content_hnsw", "idx_legal_content_halfvec"),
+    "headnote_embedding": ("idx_legal_headnote_hnsw", "idx_legal_headnote_halfvec"),
+}
+
+
+def vector_index_sql(name, column):
+    return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON legal_documents "
+            f"USING hnsw ({column} vector_cosine_ops) {INDEX_OPTIONS}")
+
+
+def halfvec_index_sql(name, column):
+    return (f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON legal_documents "
+            f"USING hnsw (({column}::halfvec({DIMENSIONS})) halfvec_cosine_ops) {INDEX_OPTIONS}")
+
+
+def version_tuple(version):
+    return tuple(int(part) for part in version.split(".")[:3])
+
+
+def ensure_pgvector_halfvec(cur):
+    """Update the vector extension to >= 0.7.0 if possible; returns the installed version."""
+    cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+    row = cur.fetchone()
+    if row is None:
+        raise RuntimeError("pgvector is not installed; run migrate_schema.py first")
+    if version_tuple(row[0]) < (0, 7, 0):
+        print(f"  pgvector {row[0]} has no halfvec type, trying ALTER EXTENSION vector UPDATE...")
+        try:
+            cur.execute("ALTER EXTENSION vector UPDATE")
+        except psycopg2.Error as e:
+            raise RuntimeError(f"could not update pgvector: {e}".strip())
+        cur.execute("SELECT extversion FROM pg_extension WHERE extname = 'vector'")
+        row = cur.fetchone()
+        if version_tuple(row[0]) < (0, 7, 0):
+            raise RuntimeError(f"pgvector {row[0]} is installed on the server; halfvec needs 0.7.0 or later")
+    return row[0]
+
+
+def index_state(cur, name):
+    """None if the index does not exist, else whether it is valid."""
+    cur.execute("""
+        SELECT i.indisvalid FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname = %s
+    """, (name,))
+    row = cur.fetchone()
+    return None if row is None else row[0]
+
+
+def build_index(cur, name, create_sql):
+    """Build one index concurrently; a leftover invalid build is dropped and retried."""
+    if index_state(cur, name) is False:
+        print(f"  - {name} is invalid (interrupted build), rebuilding")
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+    cur.execute(create_sql)
+    if not index_state(cur, name):
+        raise RuntimeError(f"{name} was not built")
+    print(f"  ✓ {name}")
+
+
+def drop_indexes(cur, names):
+    for name in names:
+        cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        print(f"  ✓ {name} dropped")
+
+
+def partial_indexes(cur, precision):
+    """Router-built partial legal_documents indexes (see SearchRouter) of one precision."""
+    cur.execute("""
+        SELECT c.relname, obj_description(c.oid, 'pg_class')::jsonb ->> 'precision'
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE c.relname LIKE 'idx\\_partial\\_legal\\_documents\\_%'
+    """)
+    return [name for name, meta_precision in cur.fetchall() if (meta_precision or "full") == precision]
+
+
+def print_index_sizes(cur):
+    cur.execute("""
+        SELECT c.relname, pg_size_pretty(pg_relation_size(c.oid)), i.indisvalid
+        FROM pg_class c JOIN pg_index i ON i.indexrelid = c.oid
+        WHERE i.indrelid = 'legal_documents'::regclass
+          AND c.relam = (SELECT oid FROM pg_am WHERE amname = 'hnsw')
+        ORDER BY c.relname
+    """)
+    print("  HNSW indexes on legal_documents:")
+    for name, size, valid in cur.fetchall():
+        print(f"    - {name}: {size}{'' if valid else ' (INVALID)'}")
+
+
+def run_migration(drop_vector_indexes=False, rollback=False, maintenance_work_mem="512MB", workers=4):
+    creds = get_db_credentials()
+
+    conn = psycopg2.connect(
+        host=creds['host'],
+        database=creds['database'],
+        user=creds['username'],
+        password=creds['password'],
+        port=creds['port']
+    )
+    conn.autocommit = True
+    cur = conn.cursor()
+
+    print("=" * 60)
+    print("Rolling back halfvec indexes..." if rollback else "Migrating legal HNSW indexes to halfvec...")
+    print("=" * 60)
+
+    cur.execute("SET maintenance_work_mem = %s", (maintenance_work_mem,))
+    cur.execute("SET max_parallel_maintenance_workers = %s", (workers,))
+
+    if rollback:
+        print("\n[1/3] Rebuilding vector(768) HNSW indexes...")
+        for column, (vector_index, _) in LEGAL_HNSW_INDEXES.items():
+            build_index(cur, vector_index, vector_index_sql(vector_index, column))
+
+        print("\n[2/3] Dropping halfvec HNSW indexes...")
+        drop_indexes(cur, [halfvec_index for _, halfvec_index in LEGAL_HNSW_INDEXES.values()])
+        drop_indexes(cur, partial_indexes(cur, "half"))
+
+        print("\n[3/3] Verifying...")
+        print_index_sizes(cur)
+        cur.close()
+        conn.close()
+        return
+
+    print("\n[1/4] Checking pgvector version...")
+    version = ensure_pgvector_halfvec(cur)
+    print(f"  ✓ pgvector {version}")
+
+    print("\n[2/4] Checking legal_documents embedding columns...")
+    cur.execute("""
+        SELECT attname, atttypmod FROM pg_attribute
+        WHERE attrelid = 'legal_documents'::regclass AND attname = ANY(%s)
+    """, (list(LEGAL_HNSW_INDEXES),))
+    columns = dict(cur.fetchall())
+    for column in LEGAL_HNSW_INDEXES:
+        if columns.get(column) != DIMENSIONS:
+            raise RuntimeError(f"legal_documents.{column} is not vector({DIMENSIONS}); run migrate_schema.py")
+    print(f"  ✓ {len(columns)} vector({DIMENSIONS}) columns")
+
+    print("\n[3/4] Creating halfvec HNSW indexes (CONCURRENTLY)...")
+    for column, (_, halfvec_index) in LEGAL_HNSW_INDEXES.items():
+        build_index(cur, halfvec_index, halfvec_index_sql(halfvec_index, column))
+
+    if drop_vector_indexes:
+        print("\n  Dropping vector(768) HNSW indexes (every halfvec index is valid)...")
+        drop_indexes(cur, [vector_index for vector_index, _ in LEGAL_HNSW_INDEXES.values()])
+        drop_indexes(cur, partial_indexes(cur, "full"))
+
+    print("\n[4/4] Verifying...")
+    print_index_sizes(cur)
+
+    print("\n" + "=" * 60)
+    print("Migration completed successfully!")
+    if not drop_vector_indexes:
+        print("Set LEGAL_VECTOR_PRECISION=half on the API, then rerun with --drop-vector-indexes")
+    print("=" * 60)
+
+    cur.close()
+    conn.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--drop-vector-indexes", action="store_true",
+                        help="drop the vector(768) HNSW indexes once the halfvec ones are built")
+    parser.add_argument("--rollback", action="store_true",
+                        help="rebuild the vector(768) HNSW indexes and drop the halfvec ones")
+    parser.add_argument("--maintenance-work-mem", default="512MB")
+    parser.add_argument("--workers", type=int, default=4, help="max_parallel_maintenance_workers")
+    args = parser.parse_args()
+    try:
+        run_migration(args.drop_vector_indexes, args.rollback, args.maintenance_work_mem, args.workers)
+    except Exception as e:
+        print(f"\n❌ Migration failed: {e}")
+        sys.exit(1)
@@ -248,6 +248,7 @@ def run_migration():
             table_exists = False
         else:
             print("  ⚠ Table already exists with correct dimensions, skipping creation")
+            cur.execute("ALTER TABLE legal_documents ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64);")
 
     if not table_exists:
         cur.execute("""
@@ -267,6 +268,7 @@ def run_migration():
                 title_embedding vector(768),
                 content_embedding vector(768),
                 headnote_embedding vector(768),
+                content_hash VARCHAR(64),
                 created_at TIMESTAMP DEFAULT NOW(),
                 updated_at TIMESTAMP DEFAULT NOW(),
                 title_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', coalesce(title, ''))) STORED,
@@ -328,9 +330,43 @@ def run_migration():
             print(f"  ⚠ {index_name} already exists")
 
     # --------------------------------------------------
-    # Step 10: Verify migration
+    # Step 10: Create change-notification triggers
     # --------------------------------------------------
-    print("\n[10/10] Verifying migration...")
+    print("\n[10/11] Creating search index change-notification triggers...")
+
+    # The app's in-memory vector and keyword indexes LISTEN on
+    # search_index; payloads are '<table>:<id>', or '<table>:*' after TRUNCATE
+    cur.execute("""
+        CREATE OR REPLACE FUNCTION notify_search_index() RETURNS trigger AS $$
+        BEGIN
+            IF TG_LEVEL = 'STATEMENT' THEN
+                PERFORM pg_notify('search_index', TG_TABLE_NAME || ':*');
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('search_index', TG_TABLE_NAME || ':' || OLD.id);
+            ELSE
+                PERFORM pg_notify('search_index', TG_TABLE_NAME || ':' || NEW.id);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    for table in ("ingested_records", "legal_documents"):
+        cur.execute(f"""
+            DROP TRIGGER IF EXISTS notify_search_index ON {table};
+            CREATE TRIGGER notify_search_index
+                AFTER INSERT OR UPDATE OR DELETE ON {table}
+                FOR EACH ROW EXECUTE FUNCTION notify_search_index();
+            DROP TRIGGER IF EXISTS notify_search_index_truncate ON {table};
+            CREATE TRIGGER notify_search_index_truncate
+                AFTER TRUNCATE ON {table}
+                FOR EACH STATEMENT EXECUTE FUNCTION notify_search_index();
+        """)
+        print(f"  ✓ notify_search_index triggers on {table}")
+
+    # --------------------------------------------------
+    # Step 11: Verify migration
+    # --------------------------------------------------
+    print("\n[11/11] Verifying migration...")
 
     # Check all tables exist
     cur.execute("""
@@ -26,6 +26,9 @@ CREATE TABLE IF NOT EXISTS legal_documents (
     content_embedding vector(768),
     headnote_embedding vector(768),          -- Separate embedding for headnotes
 
+    -- sha256 of the ingested fields + embedding model; /legal/ingest re-embeds only rows whose hash changed
+    content_hash VARCHAR(64),
+
     -- Metadata
     created_at TIMESTAMP DEFAULT NOW(),
     updated_at TIMESTAMP DEFAULT NOW(),
@@ -52,4 +55,39 @@ CREATE INDEX IF NOT EXISTS idx_legal_jurisdiction ON legal_documents(jurisdictio
 CREATE INDEX IF NOT EXISTS idx_legal_doc_type ON legal_documents(doc_type);
 CREATE INDEX IF NOT EXISTS idx_legal_practice_area ON legal_documents(practice_area);
 CREATE INDEX IF NOT EXISTS idx_legal_status ON legal_documents(status);
-CREATE INDEX IF NOT EXISTS idx_legal_date ON legal_documents(date_decided);
\ No newline at end of file
+CREATE INDEX IF NOT EXISTS idx_legal_date ON legal_documents(date_decided);
+-- Change notifications for the API's in-memory vector and keyword indexes;
+-- payloads on channel search_index are '<table>:<id>', or '<table>:*' after TRUNCATE
+CREATE OR REPLACE FUNCTION notify_search_index() RETURNS trigger AS $$
+BEGIN
+    IF TG_LEVEL = 'STATEMENT' THEN
+        PERFORM pg_notify('search_index', TG_TABLE_NAME || ':*');
+    ELSIF TG_OP = 'DELETE' THEN
+        PERFORM pg_notify('search_index', TG_TABLE_NAME || ':' || OLD.id);
+    ELSE
+        PERFORM pg_notify('search_index', TG_TABLE_NAME || ':' || NEW.id);
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS notify_search_index ON legal_documents;
+CREATE TRIGGER notify_search_index
+    AFTER INSERT OR UPDATE OR DELETE ON legal_documents
+    FOR EACH ROW EXECUTE FUNCTION notify_search_index();
+DROP TRIGGER IF EXISTS notify_search_index_truncate ON legal_documents;
+CREATE TRIGGER notify_search_index_truncate
+    AFTER TRUNCATE ON legal_documents
+    FOR EACH STATEMENT EXECUTE FUNCTION notify_search_index();
+
+-- /legal/ingest job status, shared by every API worker (the API also creates it on first ingest)
+CREATE TABLE IF NOT EXISTS legal_ingest_jobs (
+    job_id VARCHAR(64) PRIMARY KEY,
+    status VARCHAR(20) NOT NULL,             -- queued, running, completed, failed
+    stage VARCHAR(20),                       -- read, diff, embed, load, index
+    counts JSONB NOT NULL DEFAULT '{}',
+    timings_ms JSONB NOT NULL DEFAULT '{}',
+    error TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    finished_at TIMESTAMPTZ
+);